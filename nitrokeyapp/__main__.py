@@ -10,10 +10,13 @@ from PySide6.QtCore import QEvent, QObject, Qt, QTimer
 from PySide6.QtGui import QFont
 
 from nitrokeyapp import __version__
+from nitrokeyapp.batch import batch
 from nitrokeyapp.gui import GUI
 from nitrokeyapp.logger import init_logging, log_environment
+from nitrokeyapp.memory_profile import get_memory_profiler
 from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
 from nitrokeyapp.utils import forced_color_scheme, resolved_color_scheme
+from nitrokeyapp.watchdog import get_watchdog
 
 CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"], "ignore_unknown_options": True}
 
@@ -899,6 +902,11 @@ def run_gui(argv: list[str]) -> None:
     with init_logging() as log_file:
         log_environment()
 
+        # start tracing before the GUI is built so that the baseline is empty
+        profiler = get_memory_profiler()
+        if profiler:
+            profiler.start()
+
         window = GUI(app, log_file)
         gui.append(window)
 
@@ -910,20 +918,46 @@ def run_gui(argv: list[str]) -> None:
             apply_theme()
 
         QTimer.singleShot(0, refresh_theme)
+
+        watchdog = get_watchdog()
+        if watchdog:
+            watchdog.start()
         with exception_handler(window.trigger_handle_exception.emit):
             app.exec()
+        if watchdog:
+            watchdog.stop()
+        if profiler:
+            profiler.stop()
+
+
+class MainGroup(click.Group):
+    """Starts the GUI unless the first argument is a subcommand."""
 
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and args[0] in self.commands:
+            return super().parse_args(ctx, args)
+        # leave the remaining arguments for Qt instead of resolving a subcommand
+        return click.Command.parse_args(self, ctx, args)
 
-@click.command(context_settings=CONTEXT_SETTINGS)
+
+@click.group(
+    cls=MainGroup,
+    invoke_without_command=True,
+    context_settings={**CONTEXT_SETTINGS, "allow_extra_args": True},
+)
 @click.version_option(__version__, "-V", "--version")
-@click.argument("qt_args", nargs=-1, type=click.UNPROCESSED)
-def main(qt_args: tuple[str, ...]) -> None:
+@click.pass_context
+def main(ctx: click.Context) -> None:
     """Graphical application to manage Nitrokey devices.
 
     Without arguments the graphical user interface is started. Any additional
     arguments are passed on to Qt, for example: -platform offscreen
     """
-    run_gui([sys.argv[0], *qt_args])
+    if ctx.invoked_subcommand is None:
+        run_gui([sys.argv[0], *ctx.args])
+
+
+main.add_command(batch)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,461 @@
+"""Headless batch mode.
+
+`nitrokey-app2 batch <operation>` runs the jobs of the tabs on all connected
+devices, or on the devices selected with `--device`, without creating any
+widgets.  Every device is processed on its own worker thread, so several
+devices are handled in parallel, except for firmware updates.  PIN and
+confirmation prompts are answered from command line options or, if stdin is
+a terminal, interactively on stderr.  The results are written to stdout as
+JSON.
+"""
+
+import json
+import logging
+import shutil
+import sys
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from time import monotonic
+from typing import Any
+
+import click
+from PySide6.QtCore import QCoreApplication, QObject, Qt, QThread, Signal, SignalInstance, Slot
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.logger import init_logging, log_environment
+from nitrokeyapp.overview_tab.worker import UpdateDevice
+from nitrokeyapp.pin_cache import PinCache
+from nitrokeyapp.secrets_tab.data import Credential
+from nitrokeyapp.secrets_tab.ui import PinUi
+from nitrokeyapp.secrets_tab.worker import AddCredentialJob, ListCredentialsJob
+from nitrokeyapp.settings_tab.worker import ResetPasswords, SaveFidoPinJob
+from nitrokeyapp.update import UpdateResult, UpdateStatus
+from nitrokeyapp.worker import Job, Worker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchOptions:
+    devices: tuple[str, ...] = ()
+    jobs: int = 0
+    pin: str | None = None
+    new_pin: str | None = None
+    assume_yes: bool = False
+    interactive: bool = False
+
+
+@dataclass
+class Operation:
+    """A batch operation, i.e. a job that is run on every device.
+
+    `create` is called on the worker thread of the device and returns the job
+    and its result signal.  `result` converts the arguments of the result
+    signal into a success flag and a JSON-serializable value.  `sequential`
+    operations are run on one device after the other, regardless of `--jobs`.
+    """
+
+    name: str
+    create: Callable[[CommonUi, PinUi, DeviceData], tuple[Job, SignalInstance]]
+    result: Callable[..., tuple[bool, Any]] = lambda *_args: (True, None)
+    sequential: bool = False
+
+
+@dataclass
+class DeviceResult:
+    device: str
+    name: str
+    success: bool = False
+    result: Any = None
+    errors: list[str] = field(default_factory=list)
+    messages: list[str] = field(default_factory=list)
+    duration: float = 0.0
+
+
+class BatchPrompts(QObject):
+    """Answers prompts of all devices on the main thread."""
+
+    def __init__(self, options: BatchOptions) -> None:
+        super().__init__()
+        self.options = options
+
+    def query_pin(self, device: str, attempts: int) -> str | None:
+        if self.options.pin:
+            return self.options.pin
+        if not self.options.interactive:
+            logger.info(f"No Passwords PIN available for {device}")
+            return None
+        return click.prompt(
+            f"Passwords PIN for {device} ({attempts} attempts remaining)", hide_input=True, err=True
+        )
+
+    def choose_pin(self, device: str) -> str | None:
+        if self.options.new_pin:
+            return self.options.new_pin
+        if not self.options.interactive:
+            logger.info(f"No new Passwords PIN available for {device}")
+            return None
+        return click.prompt(
+            f"New Passwords PIN for {device}", hide_input=True, confirmation_prompt=True, err=True
+        )
+
+    def confirm(self, device: str, title: str, desc: str) -> bool:
+        if self.options.assume_yes:
+            return True
+        if not self.options.interactive:
+            logger.info(f"Declining confirmation for {device}: {title}")
+            return False
+        click.echo(f"{device}: {title}", err=True)
+        return click.confirm(desc, err=True)
+
+
+class BatchPinUi(PinUi):
+    def __init__(self, prompts: BatchPrompts, device: str) -> None:
+        # there is no widget to parent the dialogs of PinUi to
+        QObject.__init__(self)
+
+        self.prompts = prompts
+        self.device = device
+
+    @Slot(int)
+    def query(self, attempts: int) -> None:
+        pin = self.prompts.query_pin(self.device, attempts)
+        if pin:
+            self.queried.emit(pin)
+        else:
+            self.cancelled.emit()
+
+    @Slot()
+    def choose(self) -> None:
+        pin = self.prompts.choose_pin(self.device)
+        if pin:
+            self.chosen.emit(pin)
+        else:
+            self.cancelled.emit()
+
+
+class BatchWorker(Worker):
+    start = Signal()
+    job_result = Signal(tuple)
+    job_finished = Signal()
+
+    def __init__(
+        self, common_ui: CommonUi, pin_ui: PinUi, data: DeviceData, operation: Operation
+    ) -> None:
+        super().__init__(common_ui)
+
+        self.pin_ui = pin_ui
+        self.data = data
+        self.operation = operation
+
+        self.start.connect(self.run_operation)
+
+    @Slot()
+    def run_operation(self) -> None:
+        job, result = self.operation.create(self.common_ui, self.pin_ui, self.data)
+        result.connect(lambda *args: self.job_result.emit(args))
+        # jobs emit finished from their result signal before the connection
+        # above is called, so only pass finished on once that emission is done
+        job.finished.connect(self.job_done, Qt.ConnectionType.QueuedConnection)
+        self.run(job)
+
+    @Slot()
+    def job_done(self) -> None:
+        self.job_finished.emit()
+
+
+class DeviceRun(QObject):
+    """Runs an operation on a single device on its own worker thread."""
+
+    done = Signal(QObject)
+
+    def __init__(self, data: DeviceData, operation: Operation, prompts: BatchPrompts) -> None:
+        super().__init__()
+
+        self.operation = operation
+        self.prompts = prompts
+        self.result = DeviceResult(device=str(data.uuid or data.path), name=data.name)
+        self.succeeded: bool | None = None
+        self.started = 0.0
+
+        self.common_ui = CommonUi()
+        self.common_ui.info.error.connect(self.error)
+        self.common_ui.info.info.connect(self.info)
+        self.common_ui.touch.start.connect(self.touch)
+        self.common_ui.prompt.confirm.connect(self.confirm)
+        self.pin_ui = BatchPinUi(prompts, data.name)
+
+        self.worker_thread = QThread()
+        self.worker = BatchWorker(self.common_ui, self.pin_ui, data, operation)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker.job_result.connect(self.job_result)
+        self.worker.job_finished.connect(self.job_finished)
+
+    def start(self) -> None:
+        logger.info(f"Running {self.operation.name} on {self.result.name}")
+        self.started = monotonic()
+        self.worker_thread.start()
+        self.worker.start.emit()
+
+    @Slot(str)
+    def error(self, msg: str) -> None:
+        self.result.errors.append(msg)
+
+    @Slot(str)
+    def info(self, msg: str) -> None:
+        self.result.messages.append(msg)
+
+    @Slot()
+    def touch(self) -> None:
+        click.echo(f"{self.result.name}: touch the device to confirm", err=True)
+
+    @Slot(str, str)
+    def confirm(self, title: str, desc: str) -> None:
+        confirmed = self.prompts.confirm(self.result.name, title, desc)
+        self.common_ui.prompt.confirmed.emit(confirmed)
+
+    @Slot(tuple)
+    def job_result(self, args: tuple[Any, ...]) -> None:
+        self.succeeded, self.result.result = self.operation.result(*args)
+
+    @Slot()
+    def job_finished(self) -> None:
+        if not self.worker_thread.isRunning():
+            # some jobs emit finished more than once
+            return
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+
+        self.result.success = bool(self.succeeded) and not self.result.errors
+        self.result.duration = round(monotonic() - self.started, 3)
+        self.done.emit(self)
+
+
+class BatchRunner(QObject):
+    """Runs an operation on several devices, at most `jobs` at the same time."""
+
+    def __init__(
+        self,
+        app: QCoreApplication,
+        devices: list[DeviceData],
+        operation: Operation,
+        options: BatchOptions,
+    ) -> None:
+        super().__init__()
+
+        self.app = app
+        self.prompts = BatchPrompts(options)
+        self.pending = [DeviceRun(data, operation, self.prompts) for data in devices]
+        self.running: list[DeviceRun] = []
+        self.results: list[DeviceResult] = []
+        self.jobs = options.jobs or len(self.pending)
+        if operation.sequential:
+            if options.jobs > 1:
+                logger.warning(f"Ignoring --jobs {options.jobs}, {operation.name} is sequential")
+            self.jobs = 1
+
+        for run in self.pending:
+            run.done.connect(self.device_done)
+
+    def start(self) -> None:
+        while self.pending and len(self.running) < self.jobs:
+            run = self.pending.pop(0)
+            self.running.append(run)
+            run.start()
+
+    @Slot(DeviceRun)
+    def device_done(self, run: DeviceRun) -> None:
+        self.running.remove(run)
+        self.results.append(run.result)
+        status = "done" if run.result.success else "failed"
+        click.echo(f"{run.result.name}: {status}", err=True)
+
+        self.start()
+        if not self.running:
+            self.app.quit()
+
+
+def _select_devices(selectors: tuple[str, ...]) -> list[DeviceData]:
+    devices = []
+    for data in DeviceData.list():
+        if data.is_bootloader:
+            click.echo(f"Skipping {data.name}: device is in bootloader mode", err=True)
+            continue
+        uuid = str(data.uuid or "").lower()
+        if selectors and not any(uuid.startswith(s.lower()) for s in selectors):
+            continue
+        devices.append(data)
+    return devices
+
+
+def run_batch(options: BatchOptions, operation: Operation) -> None:
+    app = QCoreApplication.instance() or QCoreApplication([sys.argv[0]])
+    assert isinstance(app, QCoreApplication)
+
+    # stdout is reserved for the JSON results
+    with init_logging(console=sys.stderr):
+        log_environment()
+
+        devices = _select_devices(options.devices)
+        if not devices:
+            raise click.ClickException("No matching Nitrokey devices found")
+
+        runner = BatchRunner(app, devices, operation, options)
+        runner.start()
+        app.exec()
+
+    results = sorted(runner.results, key=lambda result: result.device)
+    click.echo(
+        json.dumps(
+            {"operation": operation.name, "results": [asdict(result) for result in results]},
+            indent=2,
+        )
+    )
+    if not all(result.success for result in results):
+        sys.exit(1)
+
+
+def _credential_json(credential: Credential) -> dict[str, Any]:
+    kind = credential.otp or credential.other
+    return {
+        "name": credential.name,
+        "kind": str(kind) if kind else None,
+        "protected": credential.protected,
+        "touch_required": credential.touch_required,
+    }
+
+
+def _update_result(result: UpdateResult) -> tuple[bool, Any]:
+    return result.status in (UpdateStatus.SUCCESS, UpdateStatus.SKIPPED), {
+        "status": result.status.value,
+        "message": result.message,
+    }
+
+
+@click.group()
+@click.option(
+    "-d",
+    "--device",
+    "devices",
+    multiple=True,
+    help="UUID (or prefix) of a device to process, can be repeated. Default: all devices",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Number of devices processed in parallel. Default: all devices",
+)
+@click.option("--pin", help="Passwords PIN")
+@click.option("--new-passwords-pin", "new_pin", help="Passwords PIN to set if none is set yet")
+@click.option("-y", "--yes", "assume_yes", is_flag=True, help="Confirm all prompts")
+@click.pass_context
+def batch(
+    ctx: click.Context,
+    devices: tuple[str, ...],
+    jobs: int,
+    pin: str | None,
+    new_pin: str | None,
+    assume_yes: bool,
+) -> None:
+    """Run an operation on several devices without the graphical interface.
+
+    The results are written to stdout as JSON. The exit status is non-zero if
+    the operation failed on any device.
+    """
+    ctx.obj = BatchOptions(
+        devices=devices,
+        jobs=jobs,
+        pin=pin,
+        new_pin=new_pin,
+        assume_yes=assume_yes,
+        interactive=sys.stdin.isatty(),
+    )
+
+
+@batch.command("list-credentials")
+@click.pass_obj
+def list_credentials(options: BatchOptions) -> None:
+    """List the credentials of the Passwords app."""
+
+    def create(common_ui: CommonUi, pin_ui: PinUi, data: DeviceData) -> tuple[Job, SignalInstance]:
+        job = ListCredentialsJob(common_ui, PinCache(), pin_ui, data, pin_protected=True)
+        return job, job.credentials_listed
+
+    def result(credentials: list[Credential]) -> tuple[bool, Any]:
+        return True, [_credential_json(credential) for credential in credentials]
+
+    run_batch(options, Operation("list-credentials", create, result))
+
+
+@batch.command("add-uri")
+@click.argument("uri")
+@click.option("--protected", is_flag=True, help="Protect the credential with the PIN")
+@click.option("--touch", is_flag=True, help="Require touch to use the credential")
+@click.pass_obj
+def add_uri(options: BatchOptions, uri: str, protected: bool, touch: bool) -> None:
+    """Add an OTP credential from an otpauth:// URI to the Passwords app."""
+
+    def create(common_ui: CommonUi, pin_ui: PinUi, data: DeviceData) -> tuple[Job, SignalInstance]:
+        credential = Credential(id=b"", uri=uri, protected=protected, touch_required=touch)
+        job = AddCredentialJob(common_ui, PinCache(), pin_ui, data, credential, b"")
+        return job, job.credential_added
+
+    run_batch(options, Operation("add-uri", create))
+
+
+@batch.command("set-fido2-pin")
+@click.option("--old-pin", help="Current FIDO2 PIN, if a PIN is set")
+@click.option("--new-pin", help="New FIDO2 PIN, prompted for if omitted")
+@click.pass_obj
+def set_fido2_pin(options: BatchOptions, old_pin: str | None, new_pin: str | None) -> None:
+    """Set or change the FIDO2 PIN."""
+    if not new_pin:
+        if not options.interactive:
+            raise click.UsageError("--new-pin is required if stdin is not a terminal")
+        new_pin = click.prompt("New FIDO2 PIN", hide_input=True, confirmation_prompt=True, err=True)
+    assert new_pin
+
+    def create(common_ui: CommonUi, pin_ui: PinUi, data: DeviceData) -> tuple[Job, SignalInstance]:
+        job = SaveFidoPinJob(common_ui, data, old_pin or "", new_pin)
+        return job, job.change_pw_fido
+
+    run_batch(options, Operation("set-fido2-pin", create))
+
+
+@batch.command("reset-passwords")
+@click.pass_obj
+def reset_passwords(options: BatchOptions) -> None:
+    """Reset the Passwords app, deleting all credentials."""
+    if not options.assume_yes:
+        click.confirm(
+            "This deletes all credentials in the Passwords app. Continue?", abort=True, err=True
+        )
+
+    def create(common_ui: CommonUi, pin_ui: PinUi, data: DeviceData) -> tuple[Job, SignalInstance]:
+        job = ResetPasswords(common_ui, data)
+        return job, job.reset_passwords
+
+    run_batch(options, Operation("reset-passwords", create))
+
+
+@batch.command("update")
+@click.option(
+    "--image",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Firmware container to install instead of the latest release",
+)
+@click.pass_obj
+def update(options: BatchOptions, image: str | None) -> None:
+    """Update the firmware, one device after the other."""
+    is_qubesos = shutil.which("qubesdb-read") is not None
+
+    def create(common_ui: CommonUi, pin_ui: PinUi, data: DeviceData) -> tuple[Job, SignalInstance]:
+        job = UpdateDevice(common_ui, data, is_qubesos)
+        job.image = image
+        return job, job.device_updated
+
+    # devices that re-enumerate into the bootloader at the same time cannot be told apart
+    run_batch(options, Operation("update", create, _update_result, sequential=True))
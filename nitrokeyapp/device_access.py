@@ -0,0 +1,159 @@
+"""Serialized access to devices across all worker threads.
+
+Every tab runs its jobs on its own worker thread, so several jobs may try to
+open the same device at the same time, which fails for exclusive transports.
+`DeviceData.open` therefore acquires the device from the arbiter first.
+Waiting jobs are served by priority, interactive jobs before background
+checks, and in order of arrival within the same priority.
+
+Access is re-entrant for the thread holding a device, so a job may open the
+device again while it already has it open, e.g. in a spawned job.
+
+Enumerating the devices opens all of them exclusively, so it is arbitrated as
+well, see `DeviceAccessArbiter.enumeration`.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from time import monotonic
+
+from nitrokeyapp import diagnostics
+
+logger = logging.getLogger(__name__)
+
+
+class AccessPriority(IntEnum):
+    Interactive = 0
+    Background = 1
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    seq: int
+    thread: int = field(compare=False)
+
+
+@dataclass
+class _DeviceState:
+    owner: int | None = None
+    depth: int = 0
+    waiters: list[_Request] = field(default_factory=list)
+
+
+class DeviceAccessArbiter:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._devices: dict[str, _DeviceState] = {}
+        self._seq = itertools.count()
+        # thread enumerating the devices
+        self._enumerating: int | None = None
+        self._enumeration_depth = 0
+
+    @contextmanager
+    def access(
+        self, key: str, priority: AccessPriority = AccessPriority.Interactive
+    ) -> Iterator[None]:
+        self.acquire(key, priority)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def acquire(self, key: str, priority: AccessPriority = AccessPriority.Interactive) -> None:
+        thread = threading.get_ident()
+        with self._cond:
+            state = self._devices.setdefault(key, _DeviceState())
+            if state.owner == thread:
+                state.depth += 1
+                return
+
+            request = _Request(priority, next(self._seq), thread)
+            heapq.heappush(state.waiters, request)
+            contended = state.owner is not None or state.waiters[0] is not request
+            if contended:
+                diagnostics.increment("device_access.contended")
+                diagnostics.observe("device_access.queue_depth", len(state.waiters))
+                logger.debug(
+                    f"Waiting for device {key} ({priority.name}, {len(state.waiters)} waiting)"
+                )
+
+            start = monotonic()
+            while (
+                state.owner is not None
+                or state.waiters[0] is not request
+                or self._enumerating not in (None, thread)
+            ):
+                self._cond.wait()
+            heapq.heappop(state.waiters)
+            state.owner = thread
+            state.depth = 1
+
+        diagnostics.increment("device_access.acquired")
+        if contended:
+            diagnostics.observe(f"device_access.wait.{priority.name.lower()}", monotonic() - start)
+
+    def release(self, key: str) -> None:
+        with self._cond:
+            state = self._devices[key]
+            if state.owner != threading.get_ident():
+                raise RuntimeError(f"Device {key} released by a thread that does not hold it")
+            state.depth -= 1
+            if state.depth > 0:
+                return
+
+            state.owner = None
+            if not state.waiters:
+                del self._devices[key]
+            self._cond.notify_all()
+
+    @contextmanager
+    def enumeration(self) -> Iterator[None]:
+        """Exclusive access to all devices, e.g. to enumerate them.
+
+        Enumeration has a lower priority than any device access: it waits
+        until no other thread holds or waits for a device.  While it runs,
+        devices are not handed out to other threads.
+        """
+        thread = threading.get_ident()
+        with self._cond:
+            if self._enumerating == thread:
+                self._enumeration_depth += 1
+            else:
+                start = monotonic()
+                while self._enumerating is not None or self._busy(thread):
+                    self._cond.wait()
+                self._enumerating = thread
+                self._enumeration_depth = 1
+                diagnostics.observe("device_access.wait.enumeration", monotonic() - start)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._enumeration_depth -= 1
+                if self._enumeration_depth == 0:
+                    self._enumerating = None
+                    self._cond.notify_all()
+
+    def _busy(self, thread: int) -> bool:
+        """Whether another thread holds or waits for a device."""
+        return any(
+            state.owner not in (None, thread)
+            or any(request.thread != thread for request in state.waiters)
+            for state in self._devices.values()
+        )
+
+    def queue_depth(self, key: str) -> int:
+        """Number of threads waiting for the device `key`."""
+        with self._cond:
+            state = self._devices.get(key)
+            return len(state.waiters) if state else 0
+
+
+arbiter = DeviceAccessArbiter()
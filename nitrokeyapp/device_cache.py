@@ -0,0 +1,187 @@
+"""On-disk cache of the metadata of known devices.
+
+Enumerating and querying the devices takes a while after the start of the
+application.  To show something meaningful in the meantime, the displayed,
+non-secret metadata of every device (model, firmware version, variant and
+init status) is stored by uuid, together with the devices that were
+connected when the application was used last.  At startup these devices are
+shown from the cache, clearly marked as cached, until the enumeration has
+confirmed or replaced them.
+
+The cache file can be configured with this environment variable:
+
+- NKAPP_DEVICE_CACHE: path of the cache file
+"""
+
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from time import time
+from typing import Any
+
+from nitrokey.trussed import Model
+from nitrokey.trussed.admin_app import InitStatus
+
+from nitrokeyapp.device_data import DeviceSnapshot
+
+NKAPP_DEVICE_CACHE = "NKAPP_DEVICE_CACHE"
+
+CACHE_FILE_NAME = "devices.json"
+MAX_ENTRIES = 16
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedDevice:
+    uuid: str
+    model: str
+    version: str | None
+    variant: str | None
+    init_status: int | None
+    last_seen: float
+
+    def snapshot(self) -> DeviceSnapshot:
+        model = Model[self.model]
+        return DeviceSnapshot(
+            key=self.uuid,
+            path=None,
+            model=model,
+            name=f"{model}: {self.uuid[:5]}",
+            is_bootloader=False,
+            is_too_old=False,
+            uuid=self.uuid,
+            version=self.version,
+            variant=self.variant,
+            init_status=None if self.init_status is None else InitStatus(self.init_status),
+            cached=True,
+        )
+
+    @property
+    def last_seen_str(self) -> str:
+        return datetime.fromtimestamp(self.last_seen).strftime("%Y-%m-%d %H:%M")
+
+
+class DeviceCache:
+    def __init__(self, path: Path, max_entries: int = MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._devices: dict[str, CachedDevice] = {}
+        self._connected: list[str] = []
+        self._load()
+
+    def connected(self) -> list[CachedDevice]:
+        """The devices that were connected when the cache was last updated."""
+        with self._lock:
+            return [self._devices[uuid] for uuid in self._connected if uuid in self._devices]
+
+    def get(self, uuid: str) -> CachedDevice | None:
+        with self._lock:
+            return self._devices.get(uuid)
+
+    def update(self, snapshots: list[DeviceSnapshot]) -> None:
+        """Store the snapshots of the currently connected devices."""
+        now = time()
+        with self._lock:
+            devices = dict(self._devices)
+            for snapshot in snapshots:
+                if snapshot.cached or snapshot.is_bootloader or snapshot.uuid is None:
+                    continue
+                devices[snapshot.uuid] = CachedDevice(
+                    uuid=snapshot.uuid,
+                    model=snapshot.model.name,
+                    version=snapshot.version,
+                    variant=snapshot.variant,
+                    init_status=None if snapshot.init_status is None else int(snapshot.init_status),
+                    last_seen=now,
+                )
+            connected = [
+                snapshot.uuid
+                for snapshot in snapshots
+                if not snapshot.cached and snapshot.uuid is not None
+            ]
+
+            # only keep the most recently seen devices
+            by_age = sorted(devices.values(), key=lambda device: device.last_seen, reverse=True)
+            devices = {device.uuid: device for device in by_age[: self.max_entries]}
+
+            unchanged = (
+                self._connected == connected
+                and devices.keys() == self._devices.keys()
+                and all(
+                    _same_metadata(self._devices.get(uuid), devices[uuid]) for uuid in connected
+                )
+            )
+            self._devices = devices
+            self._connected = connected
+            if unchanged:
+                return
+            self._store()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                content = json.load(f)
+            devices = [CachedDevice(**entry) for entry in content["devices"]]
+            connected = [str(uuid) for uuid in content["connected"]]
+            for device in devices:
+                Model[device.model]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable device cache {self.path}: {e}")
+            return
+        self._devices = {device.uuid: device for device in devices}
+        self._connected = connected
+
+    def _store(self) -> None:
+        content: dict[str, Any] = {
+            "devices": [asdict(device) for device in self._devices.values()],
+            "connected": self._connected,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(content, f, indent=1)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write the device cache {self.path}: {e}")
+
+
+def _same_metadata(old: CachedDevice | None, new: CachedDevice) -> bool:
+    if old is None:
+        return False
+    return (old.model, old.version, old.variant, old.init_status) == (
+        new.model,
+        new.version,
+        new.variant,
+        new.init_status,
+    )
+
+
+def _default_path() -> Path:
+    from PySide6.QtCore import QStandardPaths
+
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    if not location:
+        location = tempfile.gettempdir()
+    return Path(location) / "nitrokey-app2" / CACHE_FILE_NAME
+
+
+@functools.cache
+def get_device_cache() -> DeviceCache:
+    path = os.environ.get(NKAPP_DEVICE_CACHE)
+    return DeviceCache(Path(path) if path else _default_path())
@@ -1,10 +1,13 @@
 import logging
+import threading
 import typing
 from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
 from types import TracebackType
 from typing import Generic, Iterator, TypeVar
 
-from fido2.ctap2.base import Ctap2
+from fido2.ctap import CtapDevice
+from fido2.ctap2.base import Ctap2, Info
 from nitrokey import nk3, nkpk
 from nitrokey.nk3 import NK3
 from nitrokey.nkpk import NKPK
@@ -17,8 +20,13 @@ from nitrokey.trussed import (
     Uuid,
     Version,
 )
-from nitrokey.trussed.admin_app import Status
+from nitrokey.trussed.admin_app import InitStatus, Status
+from PySide6.QtCore import QCoreApplication, QThread
 
+from nitrokeyapp import diagnostics
+from nitrokeyapp.device_access import AccessPriority, arbiter
+from nitrokeyapp.device_health import health_service
+from nitrokeyapp.logger import count_device_open
 from nitrokeyapp.update import UpdateContext, UpdateGUI, UpdateResult, UpdateStatus
 from nitrokeyapp.utils import get_transport
 
@@ -26,6 +34,9 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# operations that were already reported with a stack trace by `_check_thread`
+_reported_operations: set[str] = set()
+
 
 class NoCloseWrapper(Generic[T]):
     def __init__(self, inner: AbstractContextManager[T]) -> None:
@@ -43,6 +54,72 @@ class NoCloseWrapper(Generic[T]):
         pass
 
 
+class _CachedCtap2(Ctap2):
+    """Ctap2 session that uses a known `Info` instead of querying it in the constructor."""
+
+    def __init__(self, device: CtapDevice, info: Info | None) -> None:
+        self._known_info = info
+        super().__init__(device)
+
+    def get_info(self) -> Info:
+        info, self._known_info = self._known_info, None
+        if info is None:
+            info = super().get_info()
+        return info
+
+
+class Ctap2InfoCache:
+    """
+    Authenticator info of the connected devices, keyed by uuid and firmware
+    version.  The info only changes if the device is updated, reset or its
+    FIDO2 PIN is set, so the entry has to be invalidated by these operations.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], Info] = {}
+
+    def get(self, key: tuple[str, str]) -> Info | None:
+        with self._lock:
+            info = self._entries.get(key)
+        diagnostics.increment("ctap2_info.hit" if info else "ctap2_info.miss")
+        return info
+
+    def update(self, key: tuple[str, str], info: Info) -> None:
+        with self._lock:
+            self._entries[key] = info
+
+    def invalidate(self, uuid: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == uuid]:
+                del self._entries[key]
+
+
+ctap2_info_cache = Ctap2InfoCache()
+
+
+@dataclass(frozen=True)
+class DeviceSnapshot:
+    """
+    Immutable copy of the properties of a `DeviceData` that are displayed in
+    the GUI.  It is collected on a worker thread by `DeviceData.snapshot`, so
+    the GUI never has to query the device itself.
+    """
+
+    key: str
+    path: str | None
+    model: Model
+    name: str
+    is_bootloader: bool
+    is_too_old: bool
+    uuid: str | None = None
+    version: str | None = None
+    variant: str | None = None
+    init_status: InitStatus | None = None
+    # read from `device_cache` and not yet confirmed by the device
+    cached: bool = False
+
+
 class DeviceData:
     def __init__(self, device: TrussedBase) -> None:
         self.path = device.path
@@ -55,6 +132,7 @@ class DeviceData:
         self._device = device
 
         if isinstance(self._device, TrussedDevice):
+            self._check_thread("enumerate")
             self._status = self._device.admin.status()
             self._uuid = self._device.uuid()
             self._version = self._device.admin.version()
@@ -75,8 +153,10 @@ class DeviceData:
     def list(cls) -> list["DeviceData"]:
         transport = get_transport()
 
-        nk3_devices = [cls(dev) for dev in nk3.list(transport, exclusive=True)]
-        nkpk_devices = [cls(dev) for dev in nkpk.list(transport, exclusive=True)]
+        # the devices are opened exclusively, so wait for running jobs
+        with arbiter.enumeration():
+            nk3_devices = [cls(dev) for dev in nk3.list(transport, exclusive=True)]
+            nkpk_devices = [cls(dev) for dev in nkpk.list(transport, exclusive=True)]
         return nk3_devices + nkpk_devices
 
     @property
@@ -110,6 +190,7 @@ class DeviceData:
     def status(self) -> Status:
         assert isinstance(self._device, TrussedDevice)
         if not self._status:
+            self._check_thread("status")
             self._status = self._device.admin.status()
         return self._status
 
@@ -117,6 +198,7 @@ class DeviceData:
     def version(self) -> Version:
         assert isinstance(self._device, TrussedDevice)
         if not self._version:
+            self._check_thread("version")
             self._version = self._device.admin.version()
 
         return self._version
@@ -125,6 +207,7 @@ class DeviceData:
     def uuid(self) -> Uuid | None:
         assert isinstance(self._device, TrussedDevice)
         if not self._uuid:
+            self._check_thread("uuid")
             self._uuid = self._device.uuid()
         return self._uuid
 
@@ -137,7 +220,86 @@ class DeviceData:
         assert isinstance(self._device, TrussedDevice)
         return str(self.uuid)[:5]
 
-    def open(self) -> AbstractContextManager[TrussedDevice]:
+    @property
+    def access_key(self) -> str:
+        """key identifying the device for `device_access.arbiter`"""
+        if not self.is_bootloader and self._uuid is not None:
+            return str(self._uuid)
+        return str(self.path)
+
+    def snapshot(self) -> DeviceSnapshot:
+        """Collect the displayed properties, querying the device if necessary."""
+        if self.is_bootloader or self.is_too_old:
+            return DeviceSnapshot(
+                key=self.access_key,
+                path=self.path,
+                model=self.model,
+                name=self.name,
+                is_bootloader=self.is_bootloader,
+                is_too_old=self.is_too_old,
+            )
+
+        status = self.status
+        assert status.variant
+        return DeviceSnapshot(
+            key=self.access_key,
+            path=self.path,
+            model=self.model,
+            name=self.name,
+            is_bootloader=False,
+            is_too_old=False,
+            uuid=str(self.uuid),
+            version=str(self.version),
+            variant=status.variant.name,
+            init_status=status.init_status,
+        )
+
+    def known_snapshot(self) -> DeviceSnapshot | None:
+        """Snapshot of the already known properties, without querying the device."""
+        if self.is_bootloader or not (self._uuid and self._version and self._status):
+            return None
+        if not self._status.variant:
+            return None
+        return DeviceSnapshot(
+            key=self.access_key,
+            path=self.path,
+            model=self.model,
+            name=self.name,
+            is_bootloader=False,
+            is_too_old=False,
+            uuid=str(self._uuid),
+            version=str(self._version),
+            variant=self._status.variant.name,
+            init_status=self._status.init_status,
+        )
+
+    def _check_thread(self, operation: str) -> None:
+        """Log device I/O on the GUI thread, as it blocks the whole window."""
+        app = QCoreApplication.instance()
+        if app is None or QThread.currentThread() != app.thread():
+            return
+        diagnostics.increment("device_data.gui_thread_io")
+        first = operation not in _reported_operations
+        _reported_operations.add(operation)
+        logger.warning(f"Device I/O on the GUI thread: {operation} {self.path}", stack_info=first)
+
+    @property
+    def transport(self) -> str | None:
+        if isinstance(self._device, TrussedDevice):
+            return self._device.transport.name
+        return None
+
+    @contextmanager
+    def open(
+        self, priority: AccessPriority = AccessPriority.Interactive
+    ) -> Iterator[TrussedDevice]:
+        self._check_thread("open")
+        count_device_open()
+        with arbiter.access(self.access_key, priority):
+            with self._open() as device:
+                yield device
+
+    def _open(self) -> AbstractContextManager[TrussedDevice]:
         device: TrussedDevice | None = None
         if not isinstance(self._device, TrussedDevice):
             raise RuntimeError("Trying to open a device that is a bootloader")
@@ -166,14 +328,35 @@ class DeviceData:
             typing.assert_never(transport)
 
     @contextmanager
-    def open_ctap2(self) -> Iterator[Ctap2]:
-        with self.open() as device:
-            ctaphid_device = device.ctaphid_device()
-            if ctaphid_device is None:
-                raise RuntimeError(
-                    f"Failed to access CTAPHID device using transport {device.transport}"
-                )
-            yield Ctap2(ctaphid_device)
+    def open_ctap2(self, priority: AccessPriority = AccessPriority.Interactive) -> Iterator[Ctap2]:
+        with self.open(priority) as device:
+            yield self.ctap2(device)
+
+    def ctap2(self, device: TrussedDevice) -> Ctap2:
+        """Start a CTAP2 session on the opened `device`, using the cached authenticator info."""
+        ctaphid_device = device.ctaphid_device()
+        if ctaphid_device is None:
+            raise RuntimeError(
+                f"Failed to access CTAPHID device using transport {device.transport}"
+            )
+
+        key = self._ctap2_info_key
+        info = ctap2_info_cache.get(key) if key else None
+        ctap2 = _CachedCtap2(ctaphid_device, info)
+        if key and info is None:
+            ctap2_info_cache.update(key, ctap2.info)
+        return ctap2
+
+    @property
+    def _ctap2_info_key(self) -> tuple[str, str] | None:
+        if self.is_bootloader or self.uuid is None:
+            return None
+        return (str(self.uuid), str(self.version))
+
+    def invalidate_ctap2_info(self) -> None:
+        """Drop the cached authenticator info after the device was reset or changed."""
+        if not self.is_bootloader and self._uuid is not None:
+            ctap2_info_cache.invalidate(str(self._uuid))
 
     def update(self, ui: UpdateGUI, image: str | None = None) -> UpdateResult:
         if self.path is None:
@@ -181,8 +364,16 @@ class DeviceData:
                 self.model, UpdateStatus.ERROR, "Administrator rights are required for updating"
             )
 
+        uuid = None if self.is_bootloader else self.uuid
+        current = None if self.is_bootloader else self.version
         self.updating = True
-        result = UpdateContext(self.path, self.model).update(ui, image)
+        # the firmware download does not block other jobs or the enumeration
+        context = UpdateContext(
+            self.path, self.model, uuid, access=lambda: arbiter.access(self.access_key)
+        )
+        result = context.update(ui, image, current)
+        self.invalidate_ctap2_info()
+        health_service.invalidate(self)
         if result.status == UpdateStatus.SUCCESS:
             logger.info(f"{self.model} successfully updated")
         else:
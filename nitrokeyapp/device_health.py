@@ -0,0 +1,164 @@
+"""Health snapshot of a device shared by all tabs.
+
+The tabs check the state of the selected device whenever they are shown: the
+admin status, the FIDO2 authenticator info and PIN retries and the state of
+the Passwords app.  `DeviceHealthService` collects all of them in one device
+session and caches the result for `DEFAULT_TTL` seconds, so switching between
+tabs does not query the device again.  Jobs changing the state of a device,
+e.g. by setting a PIN or resetting an app, invalidate the cached snapshot.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from fido2.ctap2.base import Info
+from fido2.ctap2.pin import ClientPin
+from nitrokey.nk3 import NK3
+from nitrokey.nk3.secrets_app import SecretsApp, SelectResponse
+from nitrokey.trussed import TrussedDevice
+from nitrokey.trussed.admin_app import Status
+
+from nitrokeyapp import diagnostics
+from nitrokeyapp.device_access import AccessPriority
+
+if TYPE_CHECKING:
+    from nitrokeyapp.device_data import DeviceData
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30
+
+# the Passwords app is supported by the app from this version on
+SECRETS_MIN_VERSION = "4.11.0"
+
+
+@dataclass(frozen=True)
+class DeviceHealth:
+    key: str
+    collected: float
+    status: Status | None = None
+    fido2_info: Info | None = None
+    # None if the FIDO2 PIN is not set or the retries could not be queried
+    fido2_pin_retries: int | None = None
+    # None if the device has no Passwords app
+    secrets: SelectResponse | None = None
+    secrets_compatible: bool = False
+
+    @property
+    def fido2_compatible(self) -> bool:
+        """FIDO2 credential management requires credMgmt or credentialMgmtPreview"""
+        opts = self.fido2_info.options if self.fido2_info else {}
+        return bool(opts.get("credMgmt") or opts.get("credentialMgmtPreview"))
+
+    @property
+    def fido2_pin_set(self) -> bool:
+        return bool(self.fido2_info and self.fido2_info.options.get("clientPin"))
+
+    @property
+    def secrets_pin_set(self) -> bool:
+        return self.secrets is not None and self.secrets.pin_attempt_counter is not None
+
+
+class DeviceHealthService:
+    def __init__(self, ttl: float = DEFAULT_TTL) -> None:
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: dict[str, DeviceHealth] = {}
+        # serializes the collection per device so that concurrent requests
+        # share one device session
+        self._collecting: dict[str, threading.Lock] = {}
+
+    def get(
+        self, data: "DeviceData", priority: AccessPriority = AccessPriority.Background
+    ) -> DeviceHealth:
+        key = data.access_key
+        with self._lock:
+            collecting = self._collecting.setdefault(key, threading.Lock())
+
+        with collecting:
+            health = self._cached(key)
+            if health is not None:
+                diagnostics.increment("device_health.hit")
+                return health
+
+            diagnostics.increment("device_health.miss")
+            start = monotonic()
+            health = self._collect(data, priority)
+            diagnostics.observe("device_health.collect", monotonic() - start)
+            with self._lock:
+                self._entries[key] = health
+            return health
+
+    def invalidate(self, data: "DeviceData") -> None:
+        with self._lock:
+            self._entries.pop(data.access_key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _cached(self, key: str) -> DeviceHealth | None:
+        with self._lock:
+            health = self._entries.get(key)
+            if health is not None and monotonic() - health.collected > self.ttl:
+                del self._entries[key]
+                health = None
+            return health
+
+    def _collect(self, data: "DeviceData", priority: AccessPriority) -> DeviceHealth:
+        with data.open(priority) as device:
+            status = device.admin.status()
+            fido2_info, fido2_pin_retries = self._collect_fido2(data, device)
+            secrets, secrets_compatible = self._collect_secrets(device)
+
+        return DeviceHealth(
+            key=data.access_key,
+            collected=monotonic(),
+            status=status,
+            fido2_info=fido2_info,
+            fido2_pin_retries=fido2_pin_retries,
+            secrets=secrets,
+            secrets_compatible=secrets_compatible,
+        )
+
+    def _collect_fido2(
+        self, data: "DeviceData", device: TrussedDevice
+    ) -> tuple[Info | None, int | None]:
+        try:
+            ctap2 = data.ctap2(device)
+        except Exception as e:
+            logger.info(f"Failed to query FIDO2 info of {data.name}: {e}")
+            return None, None
+
+        if not ctap2.info.options.get("clientPin"):
+            return ctap2.info, None
+        try:
+            return ctap2.info, ClientPin(ctap2).get_pin_retries()[0]
+        except Exception as e:
+            logger.info(f"Failed to query FIDO2 PIN retries of {data.name}: {e}")
+            return ctap2.info, None
+
+    def _collect_secrets(self, device: TrussedDevice) -> tuple[SelectResponse | None, bool]:
+        if not isinstance(device, NK3):
+            return None, False
+
+        secrets = SecretsApp(device)
+        try:
+            select = secrets.select()
+        except Exception as e:
+            logger.info(f"Failed to select the Passwords app: {e}")
+            return None, False
+
+        try:
+            compatible = secrets._semver_equal_or_newer(SECRETS_MIN_VERSION)
+        except Exception:
+            # TODO: catch a more specific exception
+            compatible = False
+        return select, compatible
+
+
+health_service = DeviceHealthService()
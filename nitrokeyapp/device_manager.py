@@ -1,99 +1,186 @@
 import logging
+import threading
 from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from nitrokey.trussed import Uuid
 
 from nitrokeyapp.device_data import DeviceData
 
 logger = logging.getLogger(__name__)
 
 
-def match(lhs: DeviceData, rhs: DeviceData) -> bool:
-    if lhs.path == rhs.path:
-        if lhs.is_bootloader and rhs.is_bootloader:
-            return True
-        if lhs.uuid == rhs.uuid:
-            return True
-    elif lhs.path != rhs.path:
-        if not lhs.is_bootloader and not rhs.is_bootloader:
-            if lhs.uuid == rhs.uuid:
-                return True
-    return False
+@dataclass
+class DeviceDelta:
+    """Changes of the `DeviceManager` contents caused by `add` or `remove`.
+
+    `changed` contains known devices that were re-enumerated with a different
+    path or that left the bootloader.
+    """
+
+    added: list[DeviceData] = field(default_factory=list)
+    removed: list[DeviceData] = field(default_factory=list)
+    changed: list[DeviceData] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def _uuid(data: DeviceData) -> Uuid | None:
+    if data.is_bootloader:
+        return None
+    try:
+        return data.uuid
+    except Exception as e:
+        logger.warning(f"failed to query uuid of {data.path}: {e}")
+        return None
 
 
 class DeviceManager:
+    """Registry of the connected devices.
+
+    Devices in firmware mode are identified by their uuid, bootloader devices
+    and firmware devices whose uuid cannot be queried by their path.  The
+    registry is accessed both from the GUI thread and from the hotplug
+    thread, so all access is guarded by a lock and iteration works on a
+    snapshot.
+    """
+
     def __init__(self) -> None:
+        self._lock = threading.RLock()
         self._devices: list[DeviceData] = []
+        self._by_uuid: dict[Uuid, DeviceData] = {}
+        self._by_path: dict[str, DeviceData] = {}
 
     def __iter__(self) -> Iterator[DeviceData]:
-        for item in self._devices:
-            yield item
+        return iter(self.snapshot())
 
     def __len__(self) -> int:
-        return len(self._devices)
+        with self._lock:
+            return len(self._devices)
 
-    def clear(self) -> None:
-        self._devices = []
+    def snapshot(self) -> list[DeviceData]:
+        with self._lock:
+            return list(self._devices)
 
-    def add(self) -> list[DeviceData]:
+    def is_updating(self) -> bool:
+        with self._lock:
+            return any(dev.updating for dev in self._devices)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._devices = []
+            self._by_uuid = {}
+            self._by_path = {}
+
+    def _index(self, data: DeviceData) -> None:
+        uuid = _uuid(data)
+        if uuid is not None:
+            self._by_uuid[uuid] = data
+        if data.path is not None:
+            self._by_path[data.path] = data
+
+    def _unindex(self, data: DeviceData) -> None:
+        uuid = _uuid(data)
+        if uuid is not None and self._by_uuid.get(uuid) is data:
+            del self._by_uuid[uuid]
+        if data.path is not None and self._by_path.get(data.path) is data:
+            del self._by_path[data.path]
+
+    def _lookup(self, candidate: DeviceData) -> DeviceData | None:
+        if candidate.is_bootloader:
+            if candidate.path is None:
+                return None
+            known = self._by_path.get(candidate.path)
+            return known if known is not None and known.is_bootloader else None
+
+        uuid = _uuid(candidate)
+        if uuid is not None:
+            return self._by_uuid.get(uuid)
+
+        # without a uuid, a firmware device can only be matched by its path
+        if candidate.path is None:
+            return None
+        known = self._by_path.get(candidate.path)
+        return known if known is not None and not known.is_bootloader else None
+
+    def _replace(self, known: DeviceData, candidate: DeviceData) -> bool:
+        """Update `known` in place, return whether its path or mode changed."""
+        changed = known.path != candidate.path or known.is_bootloader != candidate.is_bootloader
+        self._unindex(known)
+        known.path = candidate.path
+        known._device = candidate._device
+        self._index(known)
+        return changed
+
+    def add(self) -> DeviceDelta:
         try:
             all_devs = DeviceData.list()
         except Exception as e:
             logger.error(f"failed listing nk3 devices: {e}")
-            return []
-
-        new_devices = []
-        for candidate in all_devs:
-            # ignore bootloader device during update
-            if len(self._devices) == 1 and self._devices[0].updating and candidate.is_bootloader:
-                continue
-
-            # handle from bootloader-device updating
-            if (
-                len(self._devices) == 1
-                and self._devices[0].is_bootloader
-                and not candidate.is_bootloader
-            ):
-                self._devices[0].path = candidate.path
-                self._devices[0]._device = candidate._device
-                continue
-
-            # typical case
-            matched = False
-            for my_dev in self._devices:
-                try:
-                    if match(my_dev, candidate):
-                        my_dev.path = candidate.path
-                        my_dev._device = candidate._device
-                        matched = True
-                        break
-                except Exception:
-                    return []
-
-            if matched:
-                continue
-
-            # only actually add the device, if it was not consumed
-            # to update an existing device
-            self._devices.append(candidate)
-            new_devices.append(candidate)
-
-        return new_devices
-
-    def remove(self) -> list[DeviceData]:
+            return DeviceDelta()
+
+        delta = DeviceDelta()
+        with self._lock:
+            updating = any(dev.updating for dev in self._devices)
+            for candidate in all_devs:
+                # ignore bootloader devices during any update, the updated device
+                # is matched again by its uuid once it is back in firmware mode
+                if candidate.is_bootloader and updating:
+                    continue
+
+                # handle from bootloader-device updating
+                if (
+                    len(self._devices) == 1
+                    and self._devices[0].is_bootloader
+                    and not candidate.is_bootloader
+                ):
+                    if self._replace(self._devices[0], candidate):
+                        delta.changed.append(self._devices[0])
+                    continue
+
+                # typical case
+                known = self._lookup(candidate)
+                if known is not None:
+                    if self._replace(known, candidate):
+                        delta.changed.append(known)
+                    continue
+
+                # only actually add the device, if it was not consumed
+                # to update an existing device
+                self._devices.append(candidate)
+                self._index(candidate)
+                delta.added.append(candidate)
+
+        return delta
+
+    def remove(self) -> DeviceDelta:
         try:
             all_devs = DeviceData.list()
         except Exception as e:
             logger.error(f"failed listing nk3 devices: {e}")
-            return []
-
-        out = []
-        for dev in self._devices:
-            # skip any removal during device update
-            if dev.updating:
-                continue
-
-            res = [x for x in all_devs if match(x, dev)]
-            if len(res) == 0:
-                self._devices.remove(dev)
-                out.append(dev)
-
-        return out
+            return DeviceDelta()
+
+        uuids = {_uuid(dev) for dev in all_devs if not dev.is_bootloader}
+        firmware_paths = {dev.path for dev in all_devs if not dev.is_bootloader}
+        bootloader_paths = {dev.path for dev in all_devs if dev.is_bootloader}
+
+        delta = DeviceDelta()
+        with self._lock:
+            for dev in list(self._devices):
+                # skip any removal during device update
+                if dev.updating:
+                    continue
+
+                if dev.is_bootloader:
+                    present = dev.path in bootloader_paths
+                elif (uuid := _uuid(dev)) is not None:
+                    present = uuid in uuids
+                else:
+                    present = dev.path in firmware_paths
+                if not present:
+                    self._devices.remove(dev)
+                    self._unindex(dev)
+                    delta.removed.append(dev)
+
+        return delta
@@ -0,0 +1,74 @@
+"""Process-wide counters for diagnostics.
+
+Counters and observations are identified by a dotted name, e.g.
+`signal.wakeups`, and can be recorded from any thread. They are written to
+the log when the application is closed, so that they end up in saved log
+files.
+"""
+
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Observations:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+_observations: dict[str, Observations] = {}
+
+
+def increment(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def observe(name: str, value: float) -> None:
+    """Record a measurement, e.g. a duration, keeping count, total and maximum."""
+    with _lock:
+        entry = _observations.setdefault(name, Observations())
+        entry.count += 1
+        entry.total += value
+        entry.max = max(entry.max, value)
+
+
+def snapshot() -> dict[str, int]:
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def observations() -> dict[str, Observations]:
+    with _lock:
+        return {
+            name: Observations(o.count, o.total, o.max) for name, o in sorted(_observations.items())
+        }
+
+
+def log_counters() -> None:
+    counters = snapshot()
+    observed = observations()
+    if not counters and not observed:
+        logger.info("Diagnostics: no counters recorded")
+        return
+    logger.info("Diagnostics counters:")
+    for name, value in counters.items():
+        logger.info(f"  {name}: {value}")
+    for name, o in observed.items():
+        logger.info(f"  {name}: count={o.count} mean={o.mean:.3f} max={o.max:.3f}")
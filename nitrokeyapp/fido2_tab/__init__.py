@@ -72,6 +72,7 @@ class Fido2Tab(QtUtilsMixIn, QWidget):
     def _adapt_ui(self) -> None:
         # hide everything not used by the FIDO2 view
         self.ui.btn_add.hide()
+        self.ui.btn_export.hide()
         self.ui.btn_save.hide()
         self.ui.btn_edit.hide()
         self.ui.btn_abort.hide()
@@ -164,7 +165,6 @@ class Fido2Tab(QtUtilsMixIn, QWidget):
         if data == self.data and not force:
             return
         self.data = data
-        self._worker.pin_cache.clear()
         self.reset_ui()
         self.trigger_check_device.emit(self.data)
 
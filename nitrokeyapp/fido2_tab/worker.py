@@ -1,16 +1,16 @@
 import logging
-from dataclasses import dataclass
 
 from fido2.ctap import CtapError
 from fido2.ctap2.credman import CredentialManagement
 from fido2.ctap2.pin import ClientPin
 from fido2.webauthn import PublicKeyCredentialDescriptor, PublicKeyCredentialType
-from nitrokey.trussed import Uuid
-from PySide6.QtCore import QObject, Signal, Slot
+from PySide6.QtCore import Signal, Slot
 from PySide6.QtWidgets import QWidget
 
 from nitrokeyapp.common_ui import CommonUi
 from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_health import health_service
+from nitrokeyapp.pin_cache import PinCache
 from nitrokeyapp.worker import Job, Worker
 
 from .data import Fido2Credential, Fido2ListState
@@ -63,36 +63,6 @@ def build_fido2_list_state(cred_mgmt: CredentialManagement) -> Fido2ListState:
     return state
 
 
-@dataclass
-class PinCache(QObject):
-    uuid: Uuid | None = None
-    pin: str | None = None
-
-    pin_cached = Signal()
-    pin_cleared = Signal()
-
-    def __init__(self) -> None:
-        super().__init__()
-
-    @Slot()
-    def clear(self) -> None:
-        self.uuid = None
-        self.pin = None
-        self.pin_cleared.emit()
-
-    def get(self, data: DeviceData) -> str | None:
-        if data.uuid and self.uuid == data.uuid:
-            return self.pin
-        return None
-
-    def update(self, data: DeviceData, pin: str) -> None:
-        if not data.uuid:
-            return
-        self.uuid = data.uuid
-        self.pin = pin
-        self.pin_cached.emit()
-
-
 class CheckDeviceJob(Job):
     device_checked = Signal(bool)
 
@@ -104,10 +74,7 @@ class CheckDeviceJob(Job):
     def run(self) -> None:
         compatible = False
         try:
-            with self.data.open_ctap2() as ctap2:
-                opts = ctap2.info.options or {}
-                # FIDO2 credential management requires credMgmt or credentialMgmtPreview
-                compatible = bool(opts.get("credMgmt") or opts.get("credentialMgmtPreview"))
+            compatible = health_service.get(self.data).fido2_compatible
         except Exception as e:
             logger.info(f"fido2 check device failed: {e}")
             compatible = False
@@ -168,7 +135,8 @@ class ListCredentialsJob(Job):
         try:
             state = self._enumerate(pin)
         except CtapError as e:
-            self.pin_cache.clear()
+            self.pin_cache.forget(self.data)
+            health_service.invalidate(self.data)
             self.trigger_error(f"FIDO2 PIN authentication failed: {e}")
             return
         except Exception as e:
@@ -257,7 +225,8 @@ class DeleteCredentialJob(Job):
                 )
                 cred_mgmt.delete_cred(descriptor)
         except CtapError as e:
-            self.pin_cache.clear()
+            self.pin_cache.forget(self.data)
+            health_service.invalidate(self.data)
             self.trigger_error(f"FIDO2 delete failed: {e}")
             return
         except Exception as e:
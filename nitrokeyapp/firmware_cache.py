@@ -0,0 +1,247 @@
+"""Local cache for downloaded and imported firmware containers.
+
+Firmware containers are stored content-addressed by their SHA-256 digest. An
+index maps model and version to the digest, so that every update of the same
+release is served from the same file. The digest is checked again whenever a
+cached container is used, and corrupted files are dropped from the cache.
+
+The cache is bounded in size, the least recently used releases are evicted
+first. It can be configured with these environment variables:
+
+- NKAPP_FIRMWARE_CACHE: directory of the cache
+- NKAPP_FIRMWARE_CACHE_SIZE: maximum size in MiB
+- NKAPP_FIRMWARE_OFFLINE: only update from the cache, never access the network
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from time import time
+from typing import Any
+
+from nitrokey.trussed import FirmwareContainer, Model, Version
+
+NKAPP_FIRMWARE_CACHE = "NKAPP_FIRMWARE_CACHE"
+NKAPP_FIRMWARE_CACHE_SIZE = "NKAPP_FIRMWARE_CACHE_SIZE"
+NKAPP_FIRMWARE_OFFLINE = "NKAPP_FIRMWARE_OFFLINE"
+
+DEFAULT_MAX_SIZE_MIB = 64
+INDEX_FILE_NAME = "index.json"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FirmwareImage:
+    model: Model
+    version: Version
+    path: str
+
+
+def is_offline() -> bool:
+    return bool(os.environ.get(NKAPP_FIRMWARE_OFFLINE))
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FirmwareCache:
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / INDEX_FILE_NAME
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.directory / f"{sha256}.zip"
+
+    @staticmethod
+    def _key(model: Model, version: Version) -> str:
+        return f"{model.name}-{version}"
+
+    def _load_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable firmware cache index: {e}")
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _store_index(self, index: dict[str, dict[str, Any]]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp, self._index_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _lookup(
+        self, index: dict[str, dict[str, Any]], model: Model, version: Version
+    ) -> FirmwareImage | None:
+        key = self._key(model, version)
+        entry = index.get(key)
+        if entry is None:
+            return None
+
+        path = self._object_path(entry["sha256"])
+        try:
+            valid = _sha256(path) == entry["sha256"]
+        except OSError:
+            valid = False
+        if not valid:
+            logger.warning(f"Dropping corrupted firmware {key} from cache")
+            del index[key]
+            self._remove_unused(index, entry["sha256"])
+            return None
+
+        entry["last_used"] = time()
+        return FirmwareImage(model=model, version=version, path=str(path))
+
+    def get(self, model: Model, version: Version) -> FirmwareImage | None:
+        """Return the cached and verified container for `version`, if present."""
+        with self._lock:
+            index = self._load_index()
+            original = copy.deepcopy(index)
+            image = self._lookup(index, model, version)
+            if index != original:
+                self._store_index(index)
+        if image:
+            logger.info(f"Using cached {model} firmware {version}")
+        return image
+
+    def latest(self, model: Model) -> FirmwareImage | None:
+        """Return the most recent cached and verified container for `model`."""
+        with self._lock:
+            index = self._load_index()
+            original = copy.deepcopy(index)
+            versions = sorted(
+                (
+                    Version.from_v_str(entry["version"])
+                    for entry in index.values()
+                    if entry["model"] == model.name
+                ),
+                reverse=True,
+            )
+            image = None
+            for version in versions:
+                image = self._lookup(index, model, version)
+                if image:
+                    break
+            if index != original:
+                self._store_index(index)
+        return image
+
+    def add(self, model: Model, version: Version, data: bytes) -> FirmwareImage:
+        """Store a verified container and evict old ones beyond the size limit."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = self._key(model, version)
+
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._object_path(sha256)
+            if not path.exists():
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+
+            index = self._load_index()
+            index[key] = {
+                "model": model.name,
+                "version": str(version),
+                "sha256": sha256,
+                "size": len(data),
+                "last_used": time(),
+            }
+            self._evict(index, keep=key)
+            self._store_index(index)
+
+        logger.info(f"Added {model} firmware {version} to cache ({sha256})")
+        return FirmwareImage(model=model, version=version, path=str(path))
+
+    def import_file(self, filename: str, model: Model) -> FirmwareImage:
+        """Verify a local firmware container and add it to the cache.
+
+        Raises an exception if the file is not a valid container for `model`.
+        """
+        with open(filename, "rb") as f:
+            data = f.read()
+        container = FirmwareContainer.parse(BytesIO(data), model)
+        return self.add(model, container.version, data)
+
+    def _remove_unused(self, index: dict[str, dict[str, Any]], sha256: str) -> None:
+        if any(entry["sha256"] == sha256 for entry in index.values()):
+            return
+        try:
+            self._object_path(sha256).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, index: dict[str, dict[str, Any]], keep: str) -> None:
+        def total_size() -> int:
+            sizes = {entry["sha256"]: entry["size"] for entry in index.values()}
+            return sum(sizes.values())
+
+        by_age = sorted(index, key=lambda key: index[key]["last_used"])
+        while total_size() > self.max_size and by_age:
+            key = by_age.pop(0)
+            if key == keep:
+                continue
+            entry = index.pop(key)
+            logger.info(f"Evicting firmware {key} from cache")
+            self._remove_unused(index, entry["sha256"])
+
+
+def _default_directory() -> Path:
+    from PySide6.QtCore import QStandardPaths
+
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    if not location:
+        location = tempfile.gettempdir()
+    return Path(location) / "nitrokey-app2" / "firmware"
+
+
+@functools.cache
+def get_firmware_cache() -> FirmwareCache:
+    directory = os.environ.get(NKAPP_FIRMWARE_CACHE)
+    max_size_mib = DEFAULT_MAX_SIZE_MIB
+    if value := os.environ.get(NKAPP_FIRMWARE_CACHE_SIZE):
+        try:
+            max_size_mib = int(value)
+        except ValueError:
+            logger.warning(
+                f"{NKAPP_FIRMWARE_CACHE_SIZE} must be a number, got {value!r}; "
+                f"using {DEFAULT_MAX_SIZE_MIB} MiB"
+            )
+
+    cache = FirmwareCache(
+        Path(directory) if directory else _default_directory(), max_size_mib * 1024 * 1024
+    )
+    logger.info(f"Firmware cache: {cache.directory} (max. {max_size_mib} MiB)")
+    return cache
@@ -0,0 +1,297 @@
+import logging
+from enum import Enum
+from time import monotonic
+
+from PySide6.QtCore import QObject, Qt, QThread, Signal, Slot
+from PySide6.QtGui import QBrush, QCloseEvent, QColor
+from PySide6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_health import DeviceHealth
+from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
+
+from .worker import FleetWorker
+
+logger = logging.getLogger(__name__)
+
+
+class Operation(Enum):
+    CheckStatus = "Check Firmware and PIN Status"
+    SetFidoPin = "Set FIDO2 PIN"
+    ResetPasswords = "Reset Passwords"
+
+
+COLUMN_DEVICE = 0
+COLUMN_VERSION = 1
+COLUMN_RESULT = 2
+COLUMN_DURATION = 3
+
+ERROR_COLOR = QColor("#c0392b")
+
+
+class FleetDevice(QObject):
+    """A row of the fleet view, owning the worker and thread for one device.
+
+    Lives in the GUI thread, so the worker results are delivered to its slots
+    as queued calls and can update the table directly.
+    """
+
+    # worker triggers
+    trigger_check_status = Signal(DeviceData)
+    trigger_fido_change_pw = Signal(DeviceData, str, str)
+    trigger_passwords_reset = Signal(DeviceData)
+
+    finished = Signal()
+
+    def __init__(self, data: DeviceData, table: QTableWidget, row: int) -> None:
+        super().__init__()
+
+        self.data = data
+        self.table = table
+        self.row = row
+        self.busy = False
+        self.failed = False
+
+        self.table.setItem(row, COLUMN_DEVICE, QTableWidgetItem(data.name))
+        for column in [COLUMN_VERSION, COLUMN_RESULT, COLUMN_DURATION]:
+            self.table.setItem(row, column, QTableWidgetItem(""))
+
+        self.common_ui = CommonUi()
+        self.worker_thread = QThread()
+        self._worker = FleetWorker(self.common_ui)
+        self._worker.moveToThread(self.worker_thread)
+        self.worker_thread.start()
+
+        self.trigger_check_status.connect(self._worker.check_status)
+        self.trigger_fido_change_pw.connect(self._worker.fido_change_pw)
+        self.trigger_passwords_reset.connect(self._worker.passwords_reset)
+
+        self._worker.version_checked.connect(self.version_checked)
+        self._worker.pin_status.connect(self.handle_pin_status)
+        self._worker.change_pw_fido.connect(self.handle_pin_change)
+        self._worker.reset_passwords.connect(self.handle_reset)
+        self._worker.job_timed.connect(self.handle_job_timed)
+
+        self.common_ui.info.error.connect(self.handle_error)
+        self.common_ui.touch.start.connect(self.handle_touch)
+
+    def set_cell(self, column: int, text: str, error: bool = False) -> None:
+        item = self.table.item(self.row, column)
+        item.setText(text)
+        if error:
+            item.setForeground(QBrush(ERROR_COLOR))
+        else:
+            item.setData(Qt.ItemDataRole.ForegroundRole, None)
+
+    def start(self, operation: Operation, current_pin: str, new_pin: str) -> None:
+        self.busy = True
+        self.failed = False
+        self.set_cell(COLUMN_RESULT, "Running...")
+        self.set_cell(COLUMN_DURATION, "")
+
+        if operation == Operation.CheckStatus:
+            self.trigger_check_status.emit(self.data)
+        elif operation == Operation.SetFidoPin:
+            self.trigger_fido_change_pw.emit(self.data, current_pin, new_pin)
+        elif operation == Operation.ResetPasswords:
+            self.trigger_passwords_reset.emit(self.data)
+
+    def stop(self) -> None:
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+
+    @Slot(str)
+    def version_checked(self, version: str) -> None:
+        self.set_cell(COLUMN_VERSION, version)
+
+    @Slot(DeviceHealth)
+    def handle_pin_status(self, health: DeviceHealth) -> None:
+        results = []
+        if health.fido2_info is None:
+            results.append("FIDO2 PIN unknown")
+        elif not health.fido2_pin_set:
+            results.append("FIDO2 PIN not set")
+        elif health.fido2_pin_retries is None:
+            results.append("FIDO2 PIN set")
+        else:
+            results.append(f"FIDO2 PIN set ({health.fido2_pin_retries} retries)")
+
+        if health.secrets is not None:
+            if health.secrets_pin_set:
+                retries = health.secrets.pin_attempt_counter
+                results.append(f"Passwords PIN set ({retries} retries)")
+            else:
+                results.append("Passwords PIN not set")
+
+        self.set_result(", ".join(results))
+
+    @Slot()
+    def handle_pin_change(self) -> None:
+        self.set_result("FIDO2 PIN set")
+
+    @Slot()
+    def handle_reset(self) -> None:
+        self.set_result("Passwords reset")
+
+    def set_result(self, result: str) -> None:
+        # a failed job might still emit its result signal, keep the error
+        if not self.failed:
+            self.set_cell(COLUMN_RESULT, result)
+
+    @Slot(str)
+    def handle_error(self, msg: str) -> None:
+        self.failed = True
+        self.set_cell(COLUMN_RESULT, msg, error=True)
+
+    @Slot()
+    def handle_touch(self) -> None:
+        self.set_cell(COLUMN_RESULT, "Touch the device to confirm...")
+
+    @Slot(str, float, bool)
+    def handle_job_timed(self, name: str, duration: float, failed: bool) -> None:
+        self.busy = False
+        self.failed = self.failed or failed
+        self.set_cell(COLUMN_DURATION, f"{duration:.2f} s")
+        self.finished.emit()
+
+
+class FleetView(QtUtilsMixIn, QDialog):
+    """Run the same settings operation on all attached devices in parallel."""
+
+    def __init__(self, devices: list[DeviceData], parent: QWidget | None = None) -> None:
+        QDialog.__init__(self, parent)
+        QtUtilsMixIn.__init__(self)
+
+        self.setWindowTitle("Manage All Devices")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(720, 480)
+
+        self.operation = QComboBox(self)
+        for operation in Operation:
+            self.operation.addItem(operation.value, operation)
+        self.operation.currentIndexChanged.connect(self.operation_changed)
+
+        self.current_pin = QLineEdit(self)
+        self.current_pin.setEchoMode(QLineEdit.EchoMode.Password)
+        self.current_pin.setPlaceholderText("only required if a PIN is already set")
+        self.new_pin = QLineEdit(self)
+        self.new_pin.setEchoMode(QLineEdit.EchoMode.Password)
+
+        self.form = QFormLayout()
+        self.form.addRow("Operation:", self.operation)
+        self.form.addRow("Current FIDO2 PIN:", self.current_pin)
+        self.form.addRow("New FIDO2 PIN:", self.new_pin)
+
+        self.table = QTableWidget(0, 4, self)
+        self.table.setHorizontalHeaderLabels(["Device", "Firmware", "Result", "Duration"])
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(COLUMN_RESULT, QHeaderView.ResizeMode.Stretch)
+
+        self.summary = QLabel(self)
+        self.btn_run = QPushButton("Run", self)
+        self.btn_run.pressed.connect(self.run_operation)
+        self.btn_close = QPushButton("Close", self)
+        self.btn_close.pressed.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.summary, 1)
+        buttons.addWidget(self.btn_run)
+        buttons.addWidget(self.btn_close)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(self.form)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        self.devices: list[FleetDevice] = []
+        for data in devices:
+            if data.is_bootloader:
+                continue
+            self.add_device(data)
+
+        self.started_at: float | None = None
+        self.operation_changed()
+
+    def add_device(self, data: DeviceData) -> None:
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        device = FleetDevice(data, self.table, row)
+        device.finished.connect(self.device_finished)
+        self.devices.append(device)
+
+    @Slot()
+    def operation_changed(self) -> None:
+        show_pin = self.operation.currentData() == Operation.SetFidoPin
+        self.form.setRowVisible(self.current_pin, show_pin)
+        self.form.setRowVisible(self.new_pin, show_pin)
+
+    @Slot()
+    def run_operation(self) -> None:
+        if not self.devices or self.is_busy():
+            return
+
+        operation = self.operation.currentData()
+        if operation == Operation.SetFidoPin and len(self.new_pin.text()) < 4:
+            self.user_warn("The FIDO2 PIN must have at least 4 characters.", "Set FIDO2 PIN")
+            return
+
+        if operation == Operation.ResetPasswords:
+            res = QMessageBox.warning(
+                self,
+                "Reset Passwords",
+                f"This removes all credentials in Passwords on {len(self.devices)} device(s). "
+                "Do you want to continue?",
+                QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel,
+            )
+            if res != QMessageBox.StandardButton.Ok:
+                return
+
+        self.started_at = monotonic()
+        self.btn_run.setEnabled(False)
+        for device in self.devices:
+            device.start(operation, self.current_pin.text(), self.new_pin.text())
+        self.update_summary()
+
+    @Slot()
+    def device_finished(self) -> None:
+        self.update_summary()
+        if not self.is_busy():
+            self.btn_run.setEnabled(True)
+
+    def is_busy(self) -> bool:
+        return any(device.busy for device in self.devices)
+
+    def update_summary(self) -> None:
+        done = [device for device in self.devices if not device.busy]
+        failed = [device for device in done if device.failed]
+        text = f"{len(done)} of {len(self.devices)} done, {len(failed)} failed"
+        if self.started_at is not None and not self.is_busy():
+            text += f", total {monotonic() - self.started_at:.2f} s"
+        self.summary.setText(text)
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        if self.is_busy():
+            self.user_warn("Please wait until all devices have finished.", "Manage All Devices")
+            event.ignore()
+            return
+
+        for device in self.devices:
+            device.stop()
+        event.accept()
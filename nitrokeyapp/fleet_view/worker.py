@@ -0,0 +1,79 @@
+import logging
+from time import monotonic
+
+from PySide6.QtCore import Signal, Slot
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_health import DeviceHealth, health_service
+from nitrokeyapp.settings_tab.worker import SettingsWorker
+from nitrokeyapp.worker import Job
+
+logger = logging.getLogger(__name__)
+
+
+class CheckPinStatus(Job):
+    """Check the FIDO2 and, if available, the Passwords PIN in one health snapshot."""
+
+    pin_status = Signal(DeviceHealth)
+
+    def __init__(self, common_ui: CommonUi, data: DeviceData) -> None:
+        super().__init__(common_ui)
+
+        self.data = data
+
+        self.pin_status.connect(lambda _: self.finished.emit())
+
+    def run(self) -> None:
+        health = health_service.get(self.data)
+        if health.fido2_info is None and health.secrets is None:
+            self.trigger_error("Failed to query the PIN status")
+            return
+        self.pin_status.emit(health)
+
+
+class FleetWorker(SettingsWorker):
+    """`SettingsWorker` for a single device of the fleet view.
+
+    Every device gets its own worker and thread, so the jobs run in parallel
+    across devices. Each finished job is reported with its duration.
+    """
+
+    job_timed = Signal(str, float, bool)
+    version_checked = Signal(str)
+    pin_status = Signal(DeviceHealth)
+
+    def __init__(self, common_ui: CommonUi) -> None:
+        super().__init__(common_ui)
+
+    def run(self, job: Job) -> None:
+        start = monotonic()
+        failed = False
+
+        def job_failed() -> None:
+            nonlocal failed
+            failed = True
+
+        def job_finished() -> None:
+            # some jobs emit finished twice on errors, only time the first one
+            job.finished.disconnect(job_finished)
+            duration = monotonic() - start
+            logger.debug(f"{job.__class__.__name__} finished after {duration:.2f}s")
+            self.job_timed.emit(job.__class__.__name__, duration, failed)
+
+        job.failed.connect(job_failed)
+        job.finished.connect(job_finished)
+        super().run(job)
+
+    @Slot(DeviceData)
+    def check_status(self, data: DeviceData) -> None:
+        try:
+            version = str(data.version)
+        except Exception as e:
+            logger.warning(f"failed to read firmware version of {data.name}: {e}")
+            version = "?"
+        self.version_checked.emit(version)
+
+        job = CheckPinStatus(self.common_ui, data)
+        job.pin_status.connect(self.pin_status)
+        self.run(job)
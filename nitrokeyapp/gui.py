@@ -1,5 +1,7 @@
 import logging
 import signal
+import socket
+import threading
 import typing
 import webbrowser
 from time import sleep
@@ -8,18 +10,24 @@ from types import FrameType, TracebackType
 from nitrokey import _VID_NITROKEY
 from nitrokey.trussed import Model, Transport
 from PySide6 import QtWidgets
-from PySide6.QtCore import QEvent, Qt, QTimer, Signal, Slot
+from PySide6.QtCore import QEvent, QSocketNotifier, Qt, QTimer, Signal, Slot
 from PySide6.QtGui import QCursor
 from usbmonitor import USBMonitor
 from usbmonitor.attributes import ID_USB_INTERFACES, ID_VENDOR_ID
 
-from nitrokeyapp.device_data import DeviceData
-from nitrokeyapp.device_manager import DeviceManager
+from nitrokeyapp import diagnostics, pin_cache
+from nitrokeyapp.device_cache import CachedDevice, get_device_cache
+from nitrokeyapp.device_data import DeviceData, DeviceSnapshot
+from nitrokeyapp.device_health import health_service
+from nitrokeyapp.device_manager import DeviceDelta, DeviceManager
 from nitrokeyapp.device_view import DeviceView
 from nitrokeyapp.error_dialog import ErrorDialog
 from nitrokeyapp.fido2_tab import Fido2Tab
+from nitrokeyapp.fleet_view import FleetView
+from nitrokeyapp.hotplug import HotplugBurst, HotplugCoalescer
 from nitrokeyapp.information_box import InfoBox
-from nitrokeyapp.nk3_button import Nk3Button
+from nitrokeyapp.memory_profile import get_memory_profiler
+from nitrokeyapp.nk3_button import CachedDeviceButton, Nk3Button
 from nitrokeyapp.overview_tab import OverviewTab
 from nitrokeyapp.progress_box import ProgressBox
 from nitrokeyapp.prompt_box import PromptBox
@@ -45,8 +53,6 @@ UPDATE_IN_PROGRESS_MESSAGE = (
     "before closing the application."
 )
 
-SIGNAL_WAKEUP_INTERVAL_MS = 200
-
 
 class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
     trigger_handle_exception = Signal(object, BaseException, object)
@@ -69,16 +75,20 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
             {ID_VENDOR_ID: f"0x{nk_vid.lower()}"},
             {ID_VENDOR_ID: str(_VID_NITROKEY)},
         )
+        self.hotplug = HotplugCoalescer(self.handle_hotplug)
         monitor = USBMonitor(filter_devices=device_filter)
-        monitor.start_monitoring(
-            on_connect=self.detect_added_devices, on_disconnect=self.detect_removed_devices
-        )
+        monitor.start_monitoring(on_connect=self.usb_connected, on_disconnect=self.usb_disconnected)
 
         self.trigger_update_devices.connect(self.update_devices)
 
         self.device_manager = DeviceManager()
         self.device_buttons: list[Nk3Button] = []
+        # devices from the device cache shown until the first enumeration
+        self.cached_buttons: list[CachedDeviceButton] = []
         self.selected_device: DeviceData | None = None
+        # access key of the selected firmware device, kept while it is in the
+        # bootloader so that it is selected again once it is back
+        self.selected_key: str | None = None
 
         self.log_file = log_file
 
@@ -101,6 +111,8 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         self.progress_box = ProgressBox(self.ui.progress_bar)
 
         self.welcome_widget = WelcomeTab(self.log_file, self)
+        self.welcome_widget.fleet_view_requested.connect(self.open_fleet_view)
+        self.welcome_widget.memory_report_requested.connect(self.save_memory_report)
 
         # hint for mypy
         self.content = self.ui.content
@@ -121,6 +133,7 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         ]
 
         self.settings_tab._worker.reset_passwords.connect(self.secrets_tab.invalidate)
+        self.overview_tab.snapshot_ready.connect(self.show_snapshot)
         self.busy_count = 0
         for view in self.views:
             if view.worker:
@@ -141,6 +154,7 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
                 view.common_ui.progress.start.connect(self.progress_box.show)
                 view.common_ui.progress.stop.connect(self.progress_box.hide)
                 view.common_ui.progress.progress.connect(self.progress_box.update)
+                view.common_ui.progress.detail.connect(self.progress_box.set_detail)
 
                 view.common_ui.gui.refresh_devices.connect(self.refresh_devices)
 
@@ -187,14 +201,40 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         """Install a custom SIGINT handler for a clean shutdown.
 
         Python cannot run signal handlers while the Qt event loop is
-        blocking, so a timer regularly hands control back to the interpreter
-        to let pending signals be delivered.
+        blocking. The interpreter writes every received signal to the wakeup
+        socket, which wakes up the event loop via a socket notifier and gives
+        control back to the interpreter to run the handler. Unlike polling,
+        this does not wake up the process while no signal is received.
         """
         signal.signal(signal.SIGINT, self.handle_sigint)
 
-        self.signal_wakeup_timer = QTimer(self)
-        self.signal_wakeup_timer.timeout.connect(lambda: None)
-        self.signal_wakeup_timer.start(SIGNAL_WAKEUP_INTERVAL_MS)
+        self.signal_socket, self.signal_wakeup_socket = socket.socketpair()
+        self.signal_socket.setblocking(False)
+        self.signal_wakeup_socket.setblocking(False)
+        signal.set_wakeup_fd(self.signal_wakeup_socket.fileno())
+
+        self.signal_notifier = QSocketNotifier(
+            self.signal_socket.fileno(), QSocketNotifier.Type.Read, self
+        )
+        self.signal_notifier.activated.connect(self.handle_signal_wakeup)
+
+    def teardown_signal_handling(self) -> None:
+        signal.set_wakeup_fd(-1)
+        self.signal_notifier.setEnabled(False)
+        self.signal_socket.close()
+        self.signal_wakeup_socket.close()
+
+    @Slot()
+    def handle_signal_wakeup(self) -> None:
+        diagnostics.increment("signal.wakeups")
+        # the signal handler itself runs as soon as the interpreter regains
+        # control, i.e. when entering this slot; it might already have closed
+        # the window and the sockets before they are drained here
+        try:
+            while self.signal_socket.recv(64):
+                pass
+        except OSError:
+            pass
 
     def is_update_running(self) -> bool:
         """Whether a firmware update is currently being executed.
@@ -202,7 +242,7 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         Interrupting an update may brick the device, so this is used to block
         both signal-triggered and regular application exits.
         """
-        return any(device.updating for device in self.device_manager)
+        return self.device_manager.is_updating()
 
     def handle_sigint(self, sig: int, frame: FrameType | None) -> None:
         if self.is_update_running():
@@ -214,15 +254,12 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         self.close()
 
     def toggle_update_btn(self) -> None:
-        device_count = len(self.device_manager)
-        if device_count == 0:
+        if len(self.device_manager) == 0:
             self.l_insert_nitrokey.show()
-        self.overview_tab.set_update_enabled(device_count <= 1)
+        self.overview_tab.set_devices(list(self.device_manager))
 
-    def detect_added_devices(
-        self, device_id: str | None = None, device_info: dict[str, str] | None = None
-    ) -> None:
-        interfaces = device_info.get(ID_USB_INTERFACES, ()) if device_info else ()
+    def usb_connected(self, device_id: str, device_info: dict[str, str]) -> None:
+        interfaces = device_info.get(ID_USB_INTERFACES, ())
         ccid_classes = ("0b0000", "class_0b", "0x0b", "IOUSBHostFamily.kext")
         hid_classes = ("030000", "class_03", "0x03", "IOUSBHostFamily.kext")
 
@@ -246,34 +283,64 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         if not filter_success and interfaces:
             return
 
+        self.hotplug.added(device_id)
+
+    def usb_disconnected(self, device_id: str, device_info: dict[str, str]) -> None:
+        self.hotplug.removed(device_id)
+
+    def handle_hotplug(self, burst: HotplugBurst) -> None:
+        """reconcile `self.device_manager` once per burst of hotplug events"""
+        removed = self.remove_devices() if burst.removed else DeviceDelta()
+        added = self.add_devices() if burst.added else DeviceDelta()
+        if added or removed:
+            self.trigger_update_devices.emit()
+
+    def add_devices(self) -> DeviceDelta:
         # retry for up to 2secs
         for _tries in range(8):
-            devs = self.device_manager.add()
-            if devs:
+            delta = self.device_manager.add()
+            if delta:
                 break
             sleep(0.25)
 
-        if not devs:
+        if not delta:
             logger.info("failed adding device")
-            return
+            return delta
 
         # add as nk3 device
-        logger.info(f"{len(devs)} nk3 device(s) connected:")
-        for i, dev in enumerate(devs):
+        logger.info(f"{len(delta.added)} nk3 device(s) connected:")
+        for i, dev in enumerate(delta.added):
             logger.info(f"device #{i + 1}: {dev}")
+        for dev in delta.changed:
+            logger.info(f"nk3 device changed: {dev}")
 
-        self.trigger_update_devices.emit()
+        return delta
 
-    def detect_removed_devices(
-        self, device_id: str | None = None, device_info: dict[str, str] | None = None
-    ) -> None:
-        devs = self.device_manager.remove()
-        if not devs:
+    def remove_devices(self) -> DeviceDelta:
+        delta = self.device_manager.remove()
+        if not delta:
             logger.info("failed removing device")
-            return
+            return delta
+
+        logger.info(f"nk3 disconnected: {delta.removed}")
+        for data in delta.removed:
+            pin_cache.forget_device(data)
+            health_service.invalidate(data)
+        return delta
 
-        logger.info(f"nk3 disconnected: {devs}")
-        self.trigger_update_devices.emit()
+    def detect_added_devices(self, reconcile: bool = False) -> None:
+        """enumerate the devices on a separate thread to keep the GUI responsive
+
+        With `reconcile`, the device buttons are updated even if no device
+        was added, e.g. to replace the cached devices.
+        """
+        threading.Thread(
+            target=self._detect_added_devices, args=(reconcile,), name="enumerate", daemon=True
+        ).start()
+
+    def _detect_added_devices(self, reconcile: bool) -> None:
+        if self.add_devices() or reconcile:
+            self.trigger_update_devices.emit()
 
     @Slot()
     def refresh_devices(self) -> None:
@@ -285,41 +352,130 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
 
     @Slot()
     def update_devices(self) -> None:
-        """update device button view based on `self.device_manager` contents"""
+        """reconcile the device buttons with the `self.device_manager` contents
 
-        # always clear right view on update_devices
-        self.hide_device()
-        self.selected_device = None
-
-        for widget in self.device_buttons:
-            widget.setParent(None)
-            widget.destroy()
-        self.device_buttons.clear()
-
-        for device_data in self.device_manager:
+        Only the buttons of added and removed devices are touched. If the
+        selected device is still present, it stays selected and its view is
+        not refreshed.
+        """
+        devices = self.device_manager.snapshot()
+        self.remove_cached_devices()
+
+        snapshots = [data.known_snapshot() for data in devices]
+        get_device_cache().update([snapshot for snapshot in snapshots if snapshot])
+
+        for btn in list(self.device_buttons):
+            if btn.data not in devices:
+                if btn.data == self.selected_device:
+                    self.selected_device = None
+                self.ui.nitrokeyButtonsLayout.removeWidget(btn)
+                btn.setParent(None)
+                btn.deleteLater()
+                self.device_buttons.remove(btn)
+
+        known = [btn.data for btn in self.device_buttons]
+        changed = None
+        for btn in self.device_buttons:
+            if btn.is_bootloader != btn.data.is_bootloader:
+                # the device left or entered the bootloader, its view is outdated
+                btn.refresh_label()
+                if btn.data == self.selected_device:
+                    self.selected_device = None
+                    changed = btn.data
+
+        added = []
+        for device_data in devices:
+            if device_data in known:
+                continue
+            added.append(device_data)
             btn = Nk3Button(device_data, self.show_device)
+            if self.selected_device:
+                btn.fold()
+                btn.set_stylesheet_small()
+            else:
+                btn.unfold()
             self.device_buttons.append(btn)
             self.ui.nitrokeyButtonsLayout.addWidget(btn)
 
-            if not self.selected_device:
-                self.selected_device = device_data
+        self.secrets_tab.set_devices(devices)
 
-        if len(self.device_manager) > 0:
+        if len(devices) > 0:
             self.l_insert_nitrokey.hide()
-            self.hide_navigation()
-            if self.selected_device:
-                self.show_device(self.selected_device)
+            if not self.selected_device:
+                key = self.selected_key
+                data = changed or self.reselect_device(devices, added)
+                self.show_device(data)
+                if data.is_bootloader:
+                    self.selected_key = key
             self.toggle_update_btn()
         else:
+            self.hide_device()
             self.l_insert_nitrokey.show()
 
+    def reselect_device(self, devices: list[DeviceData], added: list[DeviceData]) -> DeviceData:
+        """the device to show after the selected device was removed or changed its mode
+
+        The device with the key of the last selected device is kept selected,
+        also while it is in the bootloader if it is the only added bootloader
+        device.  Only if it is gone, the first device is selected.
+        """
+        if self.selected_key is not None:
+            for data in devices:
+                if not data.is_bootloader and data.access_key == self.selected_key:
+                    return data
+            bootloaders = [data for data in added if data.is_bootloader]
+            if len(bootloaders) == 1:
+                return bootloaders[0]
+        return devices[0]
+
     def init_gui(self) -> None:
         self.hide_device()
-        self.detect_added_devices()
+        self.show_cached_devices()
+        self.detect_added_devices(reconcile=True)
+
+    def show_cached_devices(self) -> None:
+        """show the devices connected during the last run until they are enumerated"""
+        cached = get_device_cache().connected()
+        for device in cached:
+            btn = CachedDeviceButton(device, self.show_cached_device)
+            self.cached_buttons.append(btn)
+            self.ui.nitrokeyButtonsLayout.addWidget(btn)
+        if cached:
+            self.l_insert_nitrokey.hide()
+            self.show_cached_device(cached[0])
+
+    def show_cached_device(self, device: CachedDevice) -> None:
+        self.selected_device = None
+        for btn in self.device_buttons:
+            btn.setChecked(False)
+        for cached_btn in self.cached_buttons:
+            cached_btn.setChecked(cached_btn.device is device)
+
+        snapshot = device.snapshot()
+        self.info_box.set_device(f"{snapshot.name} (cached)")
+        self.tabs.show()
+        self.tabs.setCurrentIndex(0)
+        self.tabs.setTabVisible(1, snapshot.model == Model.NK3)
+        self.tabs.setTabVisible(2, True)
+        for idx in range(1, 4):
+            self.tabs.setTabEnabled(idx, False)
+
+        self.show_navigation()
+        self.welcome_widget.hide()
+        self.overview_tab.show_cached(snapshot)
+
+    def remove_cached_devices(self) -> None:
+        for btn in self.cached_buttons:
+            self.ui.nitrokeyButtonsLayout.removeWidget(btn)
+            btn.setParent(None)
+            btn.deleteLater()
+        self.cached_buttons = []
 
     def show_navigation(self) -> None:
         for btn in self.device_buttons:
             btn.fold()
+        for cached_btn in self.cached_buttons:
+            cached_btn.fold()
 
         self.ui.vertical_navigation.setMinimumWidth(80)
         self.ui.vertical_navigation.setMaximumWidth(80)
@@ -332,6 +488,8 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
     def hide_navigation(self) -> None:
         for btn in self.device_buttons:
             btn.unfold()
+        for cached_btn in self.cached_buttons:
+            cached_btn.unfold()
 
         self.ui.vertical_navigation.setMinimumWidth(200)
         self.ui.vertical_navigation.setMaximumWidth(200)
@@ -343,6 +501,9 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
 
     def show_device(self, data: DeviceData) -> None:
         self.selected_device = data
+        self.selected_key = None if data.is_bootloader else data.access_key
+        for cached_btn in self.cached_buttons:
+            cached_btn.setChecked(False)
         for btn in self.device_buttons:
             if btn.data == data:
                 btn.setChecked(True)
@@ -353,31 +514,46 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         self.tabs.show()
         self.tabs.setCurrentIndex(0)
 
-        if self.selected_device.is_too_old:
+        # the other tabs are enabled once the device has been queried, see
+        # `show_snapshot`
+        is_nk3 = data.model == Model.NK3
+        has_fido2 = data.model in (Model.NK3, Model.NKPK)
+        self.tabs.setTabVisible(1, is_nk3)
+        self.tabs.setTabVisible(2, has_fido2)
+        for idx in range(1, 4):
+            self.tabs.setTabEnabled(idx, False)
+
+        self.show_navigation()
+        self.welcome_widget.hide()
+
+        # enforce refreshing the current view
+        view = self.views[self.tabs.currentIndex()]
+        view.refresh(data, force=True)
+
+        for btn in self.device_buttons:
+            btn.set_stylesheet_small()
+
+    @Slot(DeviceSnapshot)
+    def show_snapshot(self, snapshot: DeviceSnapshot) -> None:
+        if self.selected_device is None or snapshot.key != self.selected_device.access_key:
+            return
+
+        self.info_box.set_device(snapshot.name)
+        if snapshot.is_too_old:
             self.tabs.setTabVisible(1, True)
             self.tabs.setTabEnabled(1, False)
             self.tabs.setTabVisible(2, True)
             self.tabs.setTabEnabled(2, False)
             self.tabs.setTabEnabled(3, False)
         else:
-            is_nk3 = self.selected_device.model == Model.NK3
-            has_fido2 = self.selected_device.model in (Model.NK3, Model.NKPK)
+            is_nk3 = snapshot.model == Model.NK3
+            has_fido2 = snapshot.model in (Model.NK3, Model.NKPK)
             self.tabs.setTabVisible(1, is_nk3)
             self.tabs.setTabEnabled(1, is_nk3)
             self.tabs.setTabVisible(2, has_fido2)
             self.tabs.setTabEnabled(2, has_fido2 and not self.passkeys_admin_required)
             self.tabs.setTabEnabled(3, True)
 
-        self.show_navigation()
-        self.welcome_widget.hide()
-
-        # enforce refreshing the current view
-        view = self.views[self.tabs.currentIndex()]
-        view.refresh(data, force=True)
-
-        for btn in self.device_buttons:
-            btn.set_stylesheet_small()
-
     def hide_device(self) -> None:
         self.selected_device = None
 
@@ -400,6 +576,34 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
             self.info_box.pin_icon.hide()
 
     # main-window callbacks
+    @Slot()
+    def open_fleet_view(self) -> None:
+        if self.is_update_running():
+            self.user_warn("Please wait until the update has finished.", "Manage All Devices")
+            return
+        if len(self.device_manager) == 0:
+            self.user_info("Please insert a Nitrokey first.", "Manage All Devices")
+            return
+
+        fleet_view = FleetView(list(self.device_manager), self)
+        fleet_view.setModal(True)
+        fleet_view.show()
+
+    @Slot()
+    def save_memory_report(self) -> None:
+        profiler = get_memory_profiler()
+        if profiler is None:
+            return
+        # take the snapshot before the file dialog allocates anything
+        report = profiler.report(self.views)
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Memory Report")
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(report + "\n")
+            except OSError as e:
+                logger.error(f"failed to save the memory report: {e}")
+
     @Slot()
     def home_button_pressed(self) -> None:
         self.hide_device()
@@ -463,4 +667,7 @@ class GUI(QtUtilsMixIn, QtWidgets.QMainWindow):
         self.settings_tab.worker_thread.quit()
         self.secrets_tab.worker_thread.quit()
         self.fido2_tab.worker_thread.quit()
+        self.hotplug.cancel()
+        self.teardown_signal_handling()
+        diagnostics.log_counters()
         event.accept()
@@ -0,0 +1,121 @@
+"""Coalescing of USB hotplug events.
+
+A single Nitrokey exposes several USB interfaces and USBMonitor reports an
+event for each of them. Firmware updates additionally produce bursts of
+events when the device switches to the bootloader and back. Enumerating the
+devices for every single event is slow and leads to flickering device
+buttons, so events are gathered over a short window and handled in one go.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from time import monotonic
+
+from nitrokeyapp import diagnostics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.3
+DEFAULT_MAX_DELAY = 2.0
+
+
+@dataclass
+class HotplugBurst:
+    added: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+    events: int = 0
+
+
+class HotplugCoalescer:
+    """Gather hotplug events and pass them on once per burst.
+
+    The callback is called from a timer thread once no further event has
+    been received for `window` seconds, but at most `max_delay` seconds after
+    the first event of the burst. Calls of the callback never overlap.
+    After `cancel`, pending and new events are dropped.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[HotplugBurst], None],
+        window: float = DEFAULT_WINDOW,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ) -> None:
+        self.callback = callback
+        self.window = window
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._burst: HotplugBurst | None = None
+        self._timer: threading.Timer | None = None
+        # incremented for every timer, so that superseded timers can be ignored
+        self._generation = 0
+        self._stopped = False
+        self._started = 0.0
+
+    def added(self, device_id: str) -> None:
+        self._push(device_id, added=True)
+
+    def removed(self, device_id: str) -> None:
+        self._push(device_id, added=False)
+
+    def _push(self, device_id: str, added: bool) -> None:
+        diagnostics.increment("hotplug.events")
+        with self._lock:
+            if self._stopped:
+                return
+            if self._burst is None:
+                self._burst = HotplugBurst()
+                self._started = monotonic()
+            if added:
+                self._burst.added.add(device_id)
+            else:
+                self._burst.removed.add(device_id)
+            self._burst.events += 1
+
+            # restart the window unless the burst is already delayed too long
+            if self._timer is not None:
+                if monotonic() - self._started + self.window > self.max_delay:
+                    return
+                self._timer.cancel()
+            self._generation += 1
+            self._timer = threading.Timer(self.window, self._flush, args=(self._generation,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self, generation: int) -> None:
+        with self._flush_lock:
+            with self._lock:
+                # the timer may have fired while waiting for a running callback or
+                # for the lock, after it was cancelled or replaced by a newer one
+                if self._stopped or generation != self._generation:
+                    return
+                burst = self._burst
+                self._burst = None
+                self._timer = None
+            if burst is None:
+                return
+
+            devices = len(burst.added) + len(burst.removed)
+            diagnostics.increment("hotplug.bursts")
+            diagnostics.increment("hotplug.collapsed", burst.events - 1)
+            logger.debug(
+                f"Handling {burst.events} hotplug event(s) for {devices} device interface(s)"
+            )
+            self.callback(burst)
+
+    def cancel(self) -> None:
+        """Drop pending events and ignore new ones.
+
+        A callback that is already running is not interrupted.
+        """
+        with self._lock:
+            self._stopped = True
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._burst = None
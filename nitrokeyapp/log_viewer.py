@@ -0,0 +1,389 @@
+"""Viewer for the log file of the running application.
+
+The log file can grow to hundreds of megabytes during long update sessions,
+so it is never loaded as a whole.  `LogIndex` reads the file incrementally
+and only keeps the offset, level and logger of every line.  The view is
+virtualized: only the visible lines are read from the file, with a small
+cache.  Filters are applied in chunks, so that the event loop is not blocked
+by large files.  New lines are picked up by polling the size of the file,
+and the index is rebuilt if the file was rotated.
+"""
+
+import json
+import logging
+import os
+from array import array
+from collections import OrderedDict
+from typing import Any
+
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+    QTimer,
+    Signal,
+    Slot,
+)
+from PySide6.QtGui import QColor, QFontDatabase, QHideEvent, QShowEvent
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListView,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from nitrokeyapp.logger import save_log
+
+logger = logging.getLogger(__name__)
+
+# bytes indexed per step, larger files are indexed over several steps
+INDEX_CHUNK_SIZE = 1024 * 1024
+POLL_INTERVAL = 1000
+# lines checked against the filters per step
+FILTER_CHUNK_SIZE = 50000
+# number of lines kept in memory by the model
+LINE_CACHE_SIZE = 2000
+MAX_LINE_LENGTH = 2000
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+# levels are stored as their logging level divided by 10, 0 if unknown
+_LEVEL_CODES = {name: logging.getLevelName(name) // 10 for name in LEVELS}
+
+WARNING_COLOR = QColor("#d29922")
+ERROR_COLOR = QColor("#c0392b")
+
+
+class LogIndex:
+    """Offsets, levels and loggers of the lines of a log file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def reset(self) -> None:
+        self.offsets = array("q")
+        self.levels = array("b")
+        self.modules = array("H")
+        self.module_names: list[str] = []
+        self._module_ids: dict[str, int] = {}
+        # end of the last complete line
+        self.end = 0
+        self._inode: int | None = None
+
+    def update(self, max_bytes: int = INDEX_CHUNK_SIZE) -> tuple[bool, bool]:
+        """
+        Index up to `max_bytes` of new content.
+
+        Returns whether the index was reset because the file was rotated or
+        truncated, and whether more content is left to index.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False, False
+
+        was_reset = False
+        if stat.st_size < self.end or (self._inode is not None and stat.st_ino != self._inode):
+            self.reset()
+            was_reset = True
+        self._inode = stat.st_ino
+
+        if stat.st_size == self.end:
+            return was_reset, False
+
+        with open(self.path, "rb") as f:
+            f.seek(self.end)
+            content = f.read(max_bytes)
+
+        last_newline = content.rfind(b"\n")
+        if last_newline < 0:
+            # an incomplete line, unless it does not fit into one chunk
+            if len(content) < max_bytes:
+                return was_reset, False
+            last_newline = len(content) - 1
+
+        # not splitlines, which also splits at other line boundaries than \n
+        start = 0
+        while start <= last_newline:
+            end = content.find(b"\n", start, last_newline + 1)
+            end = last_newline if end < 0 else end
+            self._add(self.end + start, content[start : end + 1])
+            start = end + 1
+        self.end += start
+        return was_reset, self.end < stat.st_size
+
+    def line(self, row: int) -> str:
+        start = self.offsets[row]
+        end = self.offsets[row + 1] if row + 1 < len(self.offsets) else self.end
+        length = min(end - start, MAX_LINE_LENGTH * 4)
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                content = f.read(length)
+        except OSError:
+            return ""
+        return content.decode("utf-8", errors="replace").rstrip("\r\n")[:MAX_LINE_LENGTH]
+
+    def _add(self, offset: int, line: bytes) -> None:
+        level, module = self._parse(line)
+        if level is None or module is None:
+            # continuation lines, e.g. of tracebacks, belong to the previous record
+            level = self.levels[-1] if self.levels else 0
+            module_id = self.modules[-1] if self.modules else self._module_id("")
+        else:
+            module_id = self._module_id(module)
+        self.offsets.append(offset)
+        self.levels.append(level)
+        self.modules.append(module_id)
+
+    def _parse(self, line: bytes) -> tuple[int | None, str | None]:
+        if line.startswith(b"{"):
+            try:
+                entry = json.loads(line)
+                return _LEVEL_CODES.get(entry["level"], 0), str(entry["logger"])
+            except (ValueError, KeyError, TypeError):
+                return None, None
+
+        # relativeCreated, levelname, name, message
+        parts = line[:200].decode("utf-8", errors="replace").split(None, 3)
+        if len(parts) < 3 or not parts[0].isdigit() or parts[1] not in _LEVEL_CODES:
+            return None, None
+        return _LEVEL_CODES[parts[1]], parts[2]
+
+    def _module_id(self, name: str) -> int:
+        module_id = self._module_ids.get(name)
+        if module_id is None:
+            module_id = len(self.module_names)
+            self.module_names.append(name)
+            self._module_ids[name] = module_id
+        return module_id
+
+
+class LogModel(QAbstractListModel):
+    """The lines of a `LogIndex` that match the level and module filters."""
+
+    # emitted after every filtering step
+    filtered = Signal()
+
+    def __init__(self, index: LogIndex) -> None:
+        super().__init__()
+        self.index_ = index
+        self.min_level = 0
+        self.module_filter = ""
+        self.rows = array("q")
+        # lines of the index that have been checked against the filters
+        self._filtered = 0
+        self._cache: OrderedDict[int, str] = OrderedDict()
+
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(0)
+        self._filter_timer.timeout.connect(self._filter)
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex | None = None) -> int:
+        return 0 if parent is not None and parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = 0) -> Any:
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        line = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._line(line)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            level = self.index_.levels[line]
+            if level >= _LEVEL_CODES["ERROR"]:
+                return ERROR_COLOR
+            if level >= _LEVEL_CODES["WARNING"]:
+                return WARNING_COLOR
+        return None
+
+    def set_filter(self, min_level: int, module_filter: str) -> None:
+        self.min_level = min_level
+        self.module_filter = module_filter.strip().lower()
+        self.beginResetModel()
+        self.rows = array("q")
+        self._filtered = 0
+        self.endResetModel()
+        self._filter()
+
+    def reset(self) -> None:
+        self.beginResetModel()
+        self.rows = array("q")
+        self._filtered = 0
+        self._cache.clear()
+        self.endResetModel()
+
+    def lines_added(self) -> None:
+        """Add the matching lines that were added to the index."""
+        self._filter()
+
+    @property
+    def filtering(self) -> bool:
+        return self._filtered < len(self.index_)
+
+    @Slot()
+    def _filter(self) -> None:
+        # filter one chunk at a time, so that large logs do not block the event loop
+        first = self._filtered
+        last = min(first + FILTER_CHUNK_SIZE, len(self.index_))
+        matching = self._matching(first, last)
+        self._filtered = last
+        if matching:
+            count = len(self.rows)
+            self.beginInsertRows(QModelIndex(), count, count + len(matching) - 1)
+            self.rows.extend(matching)
+            self.endInsertRows()
+        if self.filtering and not self._filter_timer.isActive():
+            self._filter_timer.start()
+        self.filtered.emit()
+
+    def _matching(self, first: int, last: int) -> list[int]:
+        levels = self.index_.levels
+        modules = self.index_.modules
+        if self.module_filter:
+            allowed = {
+                i
+                for i, name in enumerate(self.index_.module_names)
+                if self.module_filter in name.lower()
+            }
+            return [
+                i
+                for i in range(first, last)
+                if levels[i] >= self.min_level and modules[i] in allowed
+            ]
+        if self.min_level == 0:
+            return list(range(first, last))
+        return [i for i in range(first, last) if levels[i] >= self.min_level]
+
+    def _line(self, line: int) -> str:
+        text = self._cache.get(line)
+        if text is None:
+            text = self.index_.line(line)
+            self._cache[line] = text
+            if len(self._cache) > LINE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(line)
+        return text
+
+
+class LogViewer(QDialog):
+    def __init__(self, log_file: str, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+
+        self.log_file = log_file
+        self.setWindowTitle("Log")
+        self.resize(900, 600)
+
+        self.log_index = LogIndex(log_file)
+        self.model = LogModel(self.log_index)
+        self.model.filtered.connect(self.rows_changed)
+
+        self.level = QComboBox(self)
+        self.level.addItem("All levels", 0)
+        for name in LEVELS[1:]:
+            self.level.addItem(f"{name.capitalize()} and above", _LEVEL_CODES[name])
+        self.level.currentIndexChanged.connect(self.filter_changed)
+
+        self.module = QLineEdit(self)
+        self.module.setPlaceholderText("Filter by module, e.g. secrets_tab")
+        self.module.setClearButtonEnabled(True)
+        self.module.textChanged.connect(self.filter_changed)
+
+        self.follow = QCheckBox("Follow", self)
+        self.follow.setChecked(True)
+        self.follow.setToolTip("Scroll to new lines as they are written")
+
+        self.status = QLabel(self)
+
+        filters = QHBoxLayout()
+        filters.addWidget(self.level)
+        filters.addWidget(self.module, 1)
+        filters.addWidget(self.follow)
+
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        # all lines have the same height, so only the visible ones are laid out
+        self.view.setUniformItemSizes(True)
+        self.view.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.view.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.view.verticalScrollBar().valueChanged.connect(self.scrolled)
+
+        self.button_save_log = QPushButton("Save Log File", self)
+        self.button_save_log.pressed.connect(self.save_log)
+        self.button_close = QPushButton("Close", self)
+        self.button_close.pressed.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.status, 1)
+        buttons.addWidget(self.button_save_log)
+        buttons.addWidget(self.button_close)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(filters)
+        layout.addWidget(self.view, 1)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(POLL_INTERVAL)
+        self.timer.timeout.connect(self.poll)
+
+    def showEvent(self, event: QShowEvent) -> None:
+        super().showEvent(event)
+        self.timer.start()
+        self.poll()
+
+    def hideEvent(self, event: QHideEvent) -> None:
+        super().hideEvent(event)
+        self.timer.stop()
+
+    @Slot()
+    def poll(self) -> None:
+        try:
+            was_reset, pending = self.log_index.update()
+        except OSError as e:
+            logger.warning(f"Failed to read the log file: {e}")
+            return
+
+        if was_reset:
+            self.model.reset()
+        self.model.lines_added()
+
+        if pending:
+            # index the rest without blocking the event loop
+            QTimer.singleShot(0, self.poll)
+
+    @Slot()
+    def filter_changed(self) -> None:
+        self.model.set_filter(self.level.currentData(), self.module.text())
+
+    @Slot()
+    def rows_changed(self) -> None:
+        self.update_status()
+        if self.follow.isChecked():
+            self.view.scrollToBottom()
+
+    @Slot(int)
+    def scrolled(self, value: int) -> None:
+        # follow new lines only while the view is at the bottom
+        self.follow.setChecked(value >= self.view.verticalScrollBar().maximum())
+
+    def update_status(self) -> None:
+        status = f"{len(self.model.rows)} of {len(self.log_index)} lines"
+        if self.model.filtering:
+            status += " (filtering...)"
+        self.status.setText(status)
+
+    @Slot()
+    def save_log(self) -> None:
+        save_log(self.log_file, self)
@@ -1,55 +1,438 @@
+import copy
+import gzip
+import io
+import json
 import logging
 import logging.handlers
 import os
 import platform
+import queue
 import shutil
 import sys
 import tempfile
+import threading
+import uuid
 from collections.abc import Generator
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from importlib.metadata import version as package_version
 from pathlib import Path
+from time import monotonic, time
+from typing import Any, TextIO
 
 from PySide6.QtWidgets import QFileDialog, QWidget
 
+from nitrokeyapp import diagnostics
+
 logger = logging.getLogger(__name__)
 
 log_to_console = "NKAPP_LOG" in os.environ
+# write the log file as JSON lines, see `JsonFormatter`
+log_json = "NKAPP_LOG_JSON" in os.environ
 
 LOG_FILE_NAME = "nitrokey-app2.log"
-LOG_FILE_BACKUP_COUNT = 9
+# the log file is rotated if it exceeds this size or age
+LOG_FILE_MAX_SIZE = 5 * 1024 * 1024
+LOG_FILE_MAX_AGE = 24 * 60 * 60
+# total size of the rotated log files, the oldest are deleted first
+LOG_DISK_BUDGET = 50 * 1024 * 1024
+LOG_COMPRESS = True
+# seconds until rotating is tried again if it failed
+LOG_ROTATE_RETRY = 60
 
+# maximum number of records waiting for the writer, further records are dropped
+LOG_QUEUE_SIZE = 10000
+# maximum number of records written before the handlers are flushed
+LOG_BATCH_SIZE = 256
+# how long `flush_logs` waits for the writer, in seconds
+LOG_FLUSH_TIMEOUT = 5
 
-@contextmanager
-def init_logging() -> Generator[str, None, None]:
-    log_file = Path(tempfile.gettempdir()) / LOG_FILE_NAME
-    log_format = "%(relativeCreated)-8d %(levelname)6s %(name)10s %(message)s"
 
+@dataclass
+class JobContext:
+    """State of a running job that is attached to its log records."""
+
+    job: str
+    device: str | None = None
+    transport: str | None = None
+    correlation_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started: float = field(default_factory=monotonic)
+    opens: int = 0
+    failed: bool = False
+    done: bool = False
+
+    @property
+    def duration_ms(self) -> float:
+        return round((monotonic() - self.started) * 1000, 1)
+
+
+_job_contexts = threading.local()
+
+
+@contextmanager
+def job_context(context: JobContext) -> Generator[None, None, None]:
+    """Attribute log records and device opens of the current thread to `context`."""
+    stack: list[JobContext] = _job_contexts.__dict__.setdefault("stack", [])
+    stack.append(context)
     try:
-        handler = logging.handlers.RotatingFileHandler(
-            filename=log_file, backupCount=LOG_FILE_BACKUP_COUNT, delay=True, encoding="utf-8"
-        )
+        yield
+    finally:
+        stack.pop()
+
+
+def current_job() -> JobContext | None:
+    stack: list[JobContext] = _job_contexts.__dict__.get("stack", [])
+    return stack[-1] if stack else None
+
+
+def count_device_open() -> None:
+    context = current_job()
+    if context is not None:
+        context.opens += 1
+
+
+class JobContextFilter(logging.Filter):
+    """Add the correlation id of the current job to the records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = current_job()
+        record.correlation_id = context.correlation_id if context else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as JSON objects, one per line.  Structured data passed in
+    the `event` extra, e.g. durations of jobs, is added as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "relative_ms": round(record.relativeCreated),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id:
+            entry["correlation_id"] = correlation_id
+        event = getattr(record, "event", None)
+        if isinstance(event, dict):
+            entry.update(event)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredFlushMixin(logging.StreamHandler):  # type: ignore[type-arg]
+    """Stream handler that only flushes when the current batch is written."""
+
+    deferred = False
+
+    def flush(self) -> None:
+        if not self.deferred:
+            super().flush()
+
+
+class SegmentedFileHandler(_DeferredFlushMixin, logging.handlers.BaseRotatingHandler):
+    """
+    File handler that rotates the log file by size and age.
+
+    The log file is kept across application starts.  Once it exceeds
+    `max_size` bytes, or `max_age` seconds passed since it was started, it is
+    renamed to a segment named after the current time and optionally
+    compressed.  Other segments are never renamed, so rotating does not get
+    more expensive with the number of segments.  The oldest segments are
+    deleted if they exceed `disk_budget` bytes in total.
+
+    The start of the log file is stored next to it, so its age is kept
+    across application starts and an outdated log file is rotated on the
+    first record.  The size is counted while writing, so checking for a
+    rollover does not flush the batched records.  As all records are
+    written by the `LogWriter` thread, rotating never blocks the
+    application.
+    """
+
+    def __init__(
+        self,
+        filename: Path,
+        max_size: int = LOG_FILE_MAX_SIZE,
+        max_age: float = LOG_FILE_MAX_AGE,
+        disk_budget: int = LOG_DISK_BUDGET,
+        compress: bool = LOG_COMPRESS,
+    ) -> None:
+        super().__init__(filename, "a", encoding="utf-8", delay=True)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.disk_budget = disk_budget
+        self.compress = compress
+        self.start_file = f"{self.baseFilename}.start"
+        self._started = time()
+        self._size = 0
+        self._retry_at = 0.0
+
+    def _open(self) -> io.TextIOWrapper:
+        # the log may contain sensitive information, only the user may read it
         try:
-            handler.doRollover()
+            os.close(os.open(self.baseFilename, os.O_CREAT | os.O_WRONLY, 0o600))
+            stat = os.stat(self.baseFilename)
         except OSError:
-            pass
+            stat = None
+
+        self._size = stat.st_size if stat else 0
+        if self._size == 0:
+            self._started = time()
+            self._write_start()
+        else:
+            self._started = self._read_start(stat.st_mtime if stat else time())
+        return super()._open()
 
+    def _read_start(self, default: float) -> float:
         try:
-            os.close(os.open(log_file, os.O_CREAT | os.O_WRONLY, 0o600))
+            return float(Path(self.start_file).read_text())
+        except (OSError, ValueError):
+            # e.g. a log file written by an older version
+            return default
+
+    def _write_start(self) -> None:
+        try:
+            Path(self.start_file).write_text(repr(self._started))
         except OSError:
             pass
 
-        console_handler = logging.StreamHandler(sys.stdout)
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self._size += len(msg.encode("utf-8"))
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        if self._size == 0 or time() < self._retry_at:
+            return False
+        return self._size >= self.max_size or time() - self._started >= self.max_age
+
+    def doRollover(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
 
-        handlers = [handler]
+        segment = f"{self.baseFilename}.{datetime.now():%Y%m%d-%H%M%S-%f}"
+        try:
+            os.replace(self.baseFilename, segment)
+            if self.compress:
+                with open(segment, "rb") as src, gzip.open(f"{segment}.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(segment)
+        except OSError as e:
+            self._retry_at = time() + LOG_ROTATE_RETRY
+            # queued, so it is written after the current record
+            logger.warning(f"Failed to rotate the log file {self.baseFilename}: {e}")
+
+        self._enforce_budget()
+        self.stream = self._open()
+
+    def _enforce_budget(self) -> None:
+        base = Path(self.baseFilename)
+        segments = []
+        for path in base.parent.glob(f"{base.name}.*"):
+            if str(path) == self.start_file:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            segments.append((stat.st_mtime, stat.st_size, path))
+
+        total = 0
+        for _mtime, size, path in sorted(segments, reverse=True):
+            total += size
+            if total > self.disk_budget:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+class BatchedStreamHandler(_DeferredFlushMixin):
+    pass
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking if the queue is full."""
+
+    def __init__(self, log_queue: "queue.Queue[object]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # unlike `QueueHandler.prepare`, only the message is merged, so the
+        # exception is kept for the formatters of the writer
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            diagnostics.increment("logging.dropped")
+
+
+class _Flush:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class LogWriter:
+    """
+    Writes the records from the log queue to the handlers on a background
+    thread, so that logging never blocks the GUI or the workers.  Records
+    are written in batches, and the handlers are flushed once per batch.
+    """
+
+    _stop = object()
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[object]",
+        queue_handler: DroppingQueueHandler,
+        handlers: list[_DeferredFlushMixin],
+    ) -> None:
+        self.queue = log_queue
+        self.queue_handler = queue_handler
+        self.handlers = handlers
+        self._reported_drops = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.queue.put(self._stop)
+        self._thread.join()
+
+    def flush(self, timeout: float = LOG_FLUSH_TIMEOUT) -> bool:
+        """Wait until all records queued so far are written."""
+        if not self._thread.is_alive():
+            return False
+        marker = _Flush()
+        self.queue.put(marker, timeout=timeout)
+        return marker.done.wait(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            flushes = []
+            for handler in self.handlers:
+                handler.deferred = True
+            try:
+                for item in batch:
+                    if item is self._stop:
+                        stop = True
+                    elif isinstance(item, _Flush):
+                        flushes.append(item)
+                    elif isinstance(item, logging.LogRecord):
+                        self._handle(item)
+                self._report_drops()
+            finally:
+                for handler in self.handlers:
+                    handler.deferred = False
+                    handler.flush()
+
+            for flush in flushes:
+                flush.done.set()
+
+    def _handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_drops(self) -> None:
+        dropped = self.queue_handler.dropped
+        if dropped > self._reported_drops:
+            self._handle(
+                logging.makeLogRecord(
+                    {
+                        "name": __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"{dropped - self._reported_drops} log records dropped, "
+                        "the log queue was full",
+                    }
+                )
+            )
+            self._reported_drops = dropped
+
+
+_writer: LogWriter | None = None
+
+
+def flush_logs() -> None:
+    """Write all queued log records, e.g. before copying the log file."""
+    if _writer is None or not _writer.flush():
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+
+@contextmanager
+def init_logging(console: TextIO | None = None) -> Generator[str, None, None]:
+    """Log to the log file and, if NKAPP_LOG is set, to `console` (default: stdout)."""
+    log_file = Path(tempfile.gettempdir()) / LOG_FILE_NAME
+    log_format = "%(relativeCreated)-8d %(levelname)6s %(name)10s %(message)s"
+
+    global _writer
+
+    try:
+        handler = SegmentedFileHandler(log_file)
+
+        formatter = logging.Formatter(log_format)
+        handler.setFormatter(JsonFormatter() if log_json else formatter)
+        handlers: list[_DeferredFlushMixin] = [handler]
         if log_to_console:
-            handlers.append(console_handler)  # type: ignore
+            console_handler = BatchedStreamHandler(console or sys.stdout)
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
 
-        logging.basicConfig(format=log_format, level=logging.DEBUG, handlers=handlers)
+        log_queue: queue.Queue[object] = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(JobContextFilter())
+        _writer = LogWriter(log_queue, queue_handler, handlers)
+        _writer.start()
+
+        logging.basicConfig(level=logging.DEBUG, handlers=[queue_handler])
 
         yield str(log_file)
     finally:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
         logging.shutdown()
 
 
@@ -68,9 +451,7 @@ def log_environment() -> None:
 def save_log(log_file: str, parent: QWidget) -> None:
     path, _ = QFileDialog.getSaveFileName(parent, "Save Log File")
     if path:
-        root_logger = logging.getLogger()
-        for handler in root_logger.handlers:
-            handler.flush()
+        flush_logs()
         try:
             shutil.copyfile(log_file, path)
         except OSError as e:
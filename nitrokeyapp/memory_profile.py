@@ -0,0 +1,239 @@
+"""Memory profiling for long running sessions.
+
+On demand, the profiler takes a tracemalloc snapshot and compares it to the
+previous one and to the baseline taken when profiling started, so growing
+allocation sites stand out.  Each report also lists the number of live
+objects of the classes that are known to accumulate, e.g. jobs, device data
+and credentials, and the number of signal connections per tab, which grows
+if connections made per job or per refresh are never released.  The reports
+can be saved from the Welcome tab.
+
+Profiling is disabled by default as tracemalloc slows down the application
+and increases its memory usage.  It is enabled with this environment
+variable:
+
+- NKAPP_MEMORY_PROFILE: number of stack frames stored per allocation, or any
+  other non-empty value for the default
+"""
+
+import functools
+import gc
+import linecache
+import logging
+import os
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from PySide6.QtCore import QAbstractAnimation, QMetaMethod, QObject
+from PySide6.QtWidgets import QListWidgetItem
+
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_view import DeviceView
+from nitrokeyapp.secrets_tab.data import Credential
+from nitrokeyapp.worker import Job
+
+NKAPP_MEMORY_PROFILE = "NKAPP_MEMORY_PROFILE"
+
+DEFAULT_FRAMES = 10
+TOP_STATISTICS = 25
+TOP_SIGNALS = 10
+# key of the signals shared by all tabs in `MemorySnapshot.connections`
+COMMON_UI = "common UI"
+
+# classes whose live instances are counted in the reports
+TRACKED_TYPES: list[type] = [Job, DeviceData, Credential, QListWidgetItem, QAbstractAnimation]
+
+logger = logging.getLogger(__name__)
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    # the snapshots kept by the profiler itself
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+@dataclass
+class MemorySnapshot:
+    taken: datetime
+    traces: tracemalloc.Snapshot
+    objects: dict[str, int] = field(default_factory=dict)
+    # tab title or COMMON_UI -> signal -> number of receivers
+    connections: dict[str, Counter[str]] = field(default_factory=dict)
+
+
+class MemoryProfiler:
+    def __init__(self, frames: int) -> None:
+        self.frames = frames
+
+        self._baseline: MemorySnapshot | None = None
+        self._previous: MemorySnapshot | None = None
+
+    def start(self) -> None:
+        tracemalloc.start(self.frames)
+        self._baseline = self._take([])
+        logger.info(f"Tracing memory allocations with {self.frames} frames")
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+    def report(self, views: list[DeviceView]) -> str:
+        """Take a snapshot and compare it to the previous one and the baseline."""
+        snapshot = self._take(views)
+        previous, self._previous = self._previous, snapshot
+        baseline = self._baseline
+
+        lines = [f"Memory report of {snapshot.taken.isoformat()}", ""]
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"traced memory: {_size(current)} (peak {_size(peak)})")
+        lines.append("")
+
+        lines.append("live objects:")
+        for name, count in snapshot.objects.items():
+            change = ""
+            if previous is not None:
+                change = f" ({count - previous.objects.get(name, 0):+d})"
+            lines.append(f"  {name}: {count}{change}")
+        lines.append("")
+
+        lines.append("signal connections per tab and of the common UI:")
+        for title, receivers in snapshot.connections.items():
+            total = sum(receivers.values())
+            change = ""
+            old = previous.connections.get(title) if previous is not None else None
+            if old is not None:
+                change = f" ({total - sum(old.values()):+d})"
+            lines.append(f"  {title}: {total}{change}")
+            if old is None:
+                for signal, count in receivers.most_common(TOP_SIGNALS):
+                    lines.append(f"    {signal}: {count}")
+                continue
+            # only the signals whose connections changed, growing ones first
+            changed = receivers.copy()
+            changed.subtract(old)
+            for signal, delta in changed.most_common():
+                if delta != 0:
+                    lines.append(f"    {signal}: {receivers[signal]} ({delta:+d})")
+        lines.append("")
+
+        if previous is not None:
+            lines.append(f"allocations since {previous.taken.isoformat()}:")
+            lines.extend(_compare(snapshot, previous))
+            lines.append("")
+        if baseline is not None:
+            lines.append(f"allocations since the start at {baseline.taken.isoformat()}:")
+            lines.extend(_compare(snapshot, baseline))
+        else:
+            lines.append("top allocations:")
+            for stat in snapshot.traces.statistics("lineno")[:TOP_STATISTICS]:
+                lines.append(f"  {stat}")
+
+        total = sum(sum(receivers.values()) for receivers in snapshot.connections.values())
+        logger.info(
+            f"Memory snapshot: {_size(current)} traced, {total} signal connections, "
+            + ", ".join(f"{name}={count}" for name, count in snapshot.objects.items())
+        )
+        return "\n".join(lines)
+
+    def _take(self, views: list[DeviceView]) -> MemorySnapshot:
+        # only count objects that are still reachable
+        gc.collect()
+        return MemorySnapshot(
+            taken=datetime.now(),
+            traces=tracemalloc.take_snapshot().filter_traces(_FILTERS),
+            objects=_count_objects(),
+            connections=_count_all_connections(views),
+        )
+
+
+def _count_all_connections(views: list[DeviceView]) -> dict[str, Counter[str]]:
+    connections: dict[str, Counter[str]] = {}
+    if views:
+        connections[COMMON_UI] = _count_connections(_common_objects(views))
+    for view in views:
+        connections[view.title] = _count_connections(_view_objects(view))
+    return connections
+
+
+def _compare(snapshot: MemorySnapshot, old: MemorySnapshot) -> list[str]:
+    stats = snapshot.traces.compare_to(old.traces, "lineno")
+    return [f"  {stat}" for stat in stats[:TOP_STATISTICS]]
+
+
+def _count_objects() -> dict[str, int]:
+    counts = {cls.__name__: 0 for cls in TRACKED_TYPES}
+    types = tuple(TRACKED_TYPES)
+    for obj in gc.get_objects():
+        if isinstance(obj, types):
+            for cls in TRACKED_TYPES:
+                if isinstance(obj, cls):
+                    counts[cls.__name__] += 1
+    return counts
+
+
+def _common_objects(views: list[DeviceView]) -> list[tuple[str, QObject]]:
+    """The signal objects of the common UI, each only once if the tabs share them."""
+    objects: dict[int, tuple[str, QObject]] = {}
+    for view in views:
+        common_ui = view.common_ui
+        for name, obj in [
+            ("touch", common_ui.touch),
+            ("info", common_ui.info),
+            ("progress", common_ui.progress),
+            ("prompt", common_ui.prompt),
+            ("gui", common_ui.gui),
+        ]:
+            objects.setdefault(id(obj), (name, obj))
+    return list(objects.values())
+
+
+def _view_objects(view: DeviceView) -> list[tuple[str, QObject]]:
+    objects: list[tuple[str, QObject]] = [(type(view.widget).__name__, view.widget)]
+    if view.worker is not None:
+        objects.append((type(view.worker).__name__, view.worker))
+    objects.extend((type(child).__name__, child) for child in view.widget.findChildren(QObject))
+    return objects
+
+
+def _count_connections(objects: list[tuple[str, QObject]]) -> Counter[str]:
+    """Count the receivers of the signals of `objects` by signal name."""
+    receivers: Counter[str] = Counter()
+    for name, obj in objects:
+        # overloads, e.g. clicked() and clicked(bool), share their connections
+        by_signal: dict[str, int] = {}
+        meta = obj.metaObject()
+        for i in range(meta.methodCount()):
+            method = meta.method(i)
+            if method.methodType() != QMetaMethod.MethodType.Signal:
+                continue
+            signature = bytes(method.methodSignature().data()).decode()
+            signal = bytes(method.name().data()).decode()
+            # the "2" prefix marks a signal, see the SIGNAL macro
+            count = obj.receivers("2" + signature)
+            by_signal[signal] = max(by_signal.get(signal, 0), count)
+        for signal, count in by_signal.items():
+            if count:
+                receivers[f"{name}.{signal}"] += count
+    return receivers
+
+
+def _size(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+@functools.cache
+def get_memory_profiler() -> MemoryProfiler | None:
+    value = os.environ.get(NKAPP_MEMORY_PROFILE)
+    if not value:
+        return None
+    frames = DEFAULT_FRAMES
+    try:
+        frames = max(1, int(value))
+    except ValueError:
+        pass
+    return MemoryProfiler(frames)
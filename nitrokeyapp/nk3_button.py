@@ -2,6 +2,7 @@ from collections.abc import Callable
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from nitrokeyapp.device_cache import CachedDevice
 from nitrokeyapp.device_data import DeviceData
 from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
 
@@ -14,6 +15,9 @@ class Nk3Button(QtWidgets.QToolButton):
 
         self.data = data
         self.bootloader_data: DeviceData | None = None
+        # state of the device when the label was last set, see `refresh_label`
+        self.is_bootloader = data.is_bootloader
+        self.folded = False
 
         self.clicked.connect(lambda: on_click(self.data))
 
@@ -110,7 +114,16 @@ class Nk3Button(QtWidgets.QToolButton):
         self.setToolTip("")
         self.effect.setStrength(0)
 
+    def refresh_label(self) -> None:
+        """update the label after the device has changed, e.g. left the bootloader"""
+        self.is_bootloader = self.data.is_bootloader
+        if self.folded:
+            self.setText(self.data.uuid_prefix if not self.data.is_bootloader else "BL")
+        else:
+            self.setText(self.data.name)
+
     def fold(self) -> None:
+        self.folded = True
         self.setText(self.data.uuid_prefix if not self.data.is_bootloader else "BL")
         self.setMinimumWidth(58)
         self.setMaximumWidth(58)
@@ -118,9 +131,59 @@ class Nk3Button(QtWidgets.QToolButton):
         self.setToolButtonStyle(QtCore.Qt.ToolButtonStyle.ToolButtonTextUnderIcon)
 
     def unfold(self) -> None:
+        self.folded = False
         self.setChecked(False)
         self.setText(self.data.name)
         self.setMinimumWidth(178)
         self.setMaximumWidth(178)
         self.setIconSize(QtCore.QSize(32, 32))
         self.setToolButtonStyle(QtCore.Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+
+
+class CachedDeviceButton(QtWidgets.QToolButton):
+    """Placeholder for a device that is known from the device cache but not yet confirmed."""
+
+    def __init__(self, device: CachedDevice, on_click: Callable[[CachedDevice], None]) -> None:
+        super().__init__()
+
+        self.setIcon(QtUtilsMixIn.get_qicon("nitrokey.svg"))
+
+        self.device = device
+        self.name = device.snapshot().name
+
+        self.clicked.connect(lambda: on_click(self.device))
+
+        self.setCheckable(True)
+        self.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
+        self.setToolTip(f"Last seen {device.last_seen_str}, waiting for the device")
+        self.setStyleSheet(
+            """
+            QToolButton {
+                background-color: transparent;
+                border: 1px dashed #768390;
+                margin: 0; margin-top: 6px;
+                padding: 0.3em 0.5em;
+                border-radius: 6px;
+                font-style: italic; font-size: 8pt;
+                color: #768390;
+            }
+            QToolButton:checked {
+                border: 1px dashed rgba(192, 57, 43, 0.5);
+            }
+        """
+        )
+
+    def fold(self) -> None:
+        self.setText(self.device.uuid[:5])
+        self.setMinimumWidth(58)
+        self.setMaximumWidth(58)
+        self.setIconSize(QtCore.QSize(40, 40))
+        self.setToolButtonStyle(QtCore.Qt.ToolButtonStyle.ToolButtonTextUnderIcon)
+
+    def unfold(self) -> None:
+        self.setChecked(False)
+        self.setText(f"{self.name} (cached)")
+        self.setMinimumWidth(178)
+        self.setMaximumWidth(178)
+        self.setIconSize(QtCore.QSize(32, 32))
+        self.setToolButtonStyle(QtCore.Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
@@ -7,7 +7,7 @@ from PySide6.QtCore import QThread, Signal, Slot
 from PySide6.QtWidgets import QFileDialog, QWidget
 
 from nitrokeyapp.common_ui import CommonUi
-from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_data import DeviceData, DeviceSnapshot
 from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
 from nitrokeyapp.update import UpdateResult, UpdateStatus
 from nitrokeyapp.utils import get_transport
@@ -21,16 +21,21 @@ logger = logging.getLogger(__name__)
 class OverviewTab(QtUtilsMixIn, QWidget):
     # standard UI
     busy_state_changed = Signal(bool)
+    # the snapshot of the displayed device has been collected
+    snapshot_ready = Signal(DeviceSnapshot)
 
     # worker triggers
+    trigger_snapshot = Signal(DeviceData)
     trigger_update = Signal(DeviceData, bool)
     trigger_update_file = Signal(DeviceData, str, bool)
+    trigger_update_all = Signal(list, bool)
 
     def __init__(self, parent: QWidget | None = None) -> None:
         QWidget.__init__(self, parent)
         QtUtilsMixIn.__init__(self)
 
         self.data: DeviceData | None = None
+        self.devices: list[DeviceData] = []
         self.common_ui = CommonUi()
 
         self.worker_thread = QThread()
@@ -38,10 +43,15 @@ class OverviewTab(QtUtilsMixIn, QWidget):
         self._worker.moveToThread(self.worker_thread)
         self.worker_thread.start()
 
+        self.trigger_snapshot.connect(self._worker.snapshot_device)
         self.trigger_update.connect(self._worker.update_device)
         self.trigger_update_file.connect(self._worker.update_device_file)
+        self.trigger_update_all.connect(self._worker.update_all_devices)
 
+        self._worker.device_snapshot.connect(self.show_snapshot)
         self._worker.device_updated.connect(self.device_updated)
+        self._worker.queue_device_updated.connect(self.queue_device_updated)
+        self._worker.queue_finished.connect(self.queue_finished)
 
         # self.ui === self -> this tricks mypy due to monkey-patching self
         self.ui = self.load_ui("overview_tab.ui", self)
@@ -50,6 +60,8 @@ class OverviewTab(QtUtilsMixIn, QWidget):
 
         self.ui.btn_update_with_file.clicked.connect(self.update_with_file)
         self.ui.btn_update.clicked.connect(self.run_update)
+        self.ui.btn_update_all.clicked.connect(self.run_update_all)
+        self.ui.btn_update_all.hide()
 
         self.using_ccid = get_transport() == Transport.CCID
 
@@ -77,41 +89,80 @@ class OverviewTab(QtUtilsMixIn, QWidget):
         self.reset()
         self.data = data
 
+        # the device is queried on the worker, see `show_snapshot`
+        self.set_device_data(str(data.path), "…", "…", "…", "…")
+        self.trigger_snapshot.emit(data)
+
+    @Slot(DeviceSnapshot)
+    def show_snapshot(self, snapshot: DeviceSnapshot) -> None:
+        if self.data is None or snapshot.key != self.data.access_key:
+            # the selected device changed in the meantime
+            return
+
+        self.render_snapshot(snapshot)
+        self.snapshot_ready.emit(snapshot)
+
+    def show_cached(self, snapshot: DeviceSnapshot) -> None:
+        """Show a device from the device cache until it is enumerated."""
+        self.reset()
+        self.render_snapshot(snapshot)
+        for btn in [self.ui.btn_update, self.ui.btn_update_with_file, self.ui.btn_update_all]:
+            btn.setEnabled(False)
+            btn.setToolTip("Waiting for the device")
+
+    def render_snapshot(self, snapshot: DeviceSnapshot) -> None:
         # catch too old firmware
-        if data.is_too_old:
+        if snapshot.is_too_old:
             self.set_device_data(
-                str(data.path), "n/a", "n/a", "Update Your Nitrokey 3 for full functionality", "n/a"
+                str(snapshot.path),
+                "n/a",
+                "n/a",
+                "Update Your Nitrokey 3 for full functionality",
+                "n/a",
             )
             self.ui.status_label.hide()
             self.ui.nk3_status.hide()
             self.ui.more_info.hide()
             self.ui.nk3_label.setText("Nitrokey 3 (old firmware)")
             self.status_error(InitStatus(0))
-            return
 
-        if data.is_bootloader:
-            self.set_device_data(str(data.path), "n/a", "n/a", "n/a", "n/a")
+        elif snapshot.is_bootloader:
+            self.set_device_data(str(snapshot.path), "n/a", "n/a", "n/a", "n/a")
             self.ui.status_label.hide()
             self.ui.nk3_status.hide()
             self.ui.more_info.hide()
-            self.ui.nk3_label.setText(f"{data.model} Bootloader")
+            self.ui.nk3_label.setText(f"{snapshot.model} Bootloader")
             self.status_error(InitStatus(0))
 
+        elif snapshot.cached:
+            # mark the values that have not been confirmed by the device
+            self.set_device_data(
+                "waiting for the device",
+                f"{snapshot.uuid} (cached)",
+                f"{snapshot.version} (cached)",
+                f"{snapshot.variant} (cached)",
+                f"{snapshot.init_status} (cached)",
+            )
+            self.ui.nk3_label.setText(f"{snapshot.model} (cached)")
+            self.ui.status_label.hide()
+            self.ui.nk3_status.hide()
+            self.ui.icon_warn_notice.hide()
+            self.ui.more_info.hide()
+
         else:
-            assert data.status.variant
             self.set_device_data(
-                str(data.path),
-                str(data.uuid),
-                str(data.version),
-                str(data.status.variant.name),
-                str(data.status.init_status),
+                str(snapshot.path),
+                str(snapshot.uuid),
+                str(snapshot.version),
+                str(snapshot.variant),
+                str(snapshot.init_status),
             )
-            self.ui.nk3_label.setText(str(data.model))
-            if data.status.init_status is None:
+            self.ui.nk3_label.setText(str(snapshot.model))
+            if snapshot.init_status is None:
                 self.ui.status_label.hide()
                 self.ui.nk3_status.hide()
             else:
-                self.status_error(InitStatus(data.status.init_status))
+                self.status_error(InitStatus(snapshot.init_status))
                 self.ui.status_label.show()
                 self.ui.nk3_status.show()
 
@@ -132,6 +183,19 @@ class OverviewTab(QtUtilsMixIn, QWidget):
             self.ui.icon_warn_notice.hide()
             self.ui.more_info.hide()
 
+    def set_devices(self, devices: list[DeviceData]) -> None:
+        """Set the devices attached to the app.
+
+        Devices in firmware mode are identified by their uuid during the
+        update, so updates are possible with several devices attached. A
+        device in bootloader mode cannot be told apart from other devices.
+        """
+        self.devices = [data for data in devices if not data.is_bootloader]
+        has_bootloader = len(self.devices) < len(devices)
+
+        self.set_update_enabled(len(devices) <= 1 or not has_bootloader)
+        self.ui.btn_update_all.setVisible(len(devices) > 1)
+
     def set_update_enabled(self, enabled: bool) -> None:
         tooltip = ""
         btn_really_enabled = enabled and not self.using_ccid
@@ -143,18 +207,20 @@ class OverviewTab(QtUtilsMixIn, QWidget):
 
         if not enabled:
             self.common_ui.info.info.emit(
-                "Please remove all Nitrokey devices except the one you want to update."
+                "Please remove all other Nitrokey devices to update a device in bootloader mode."
+            )
+            tooltip = (
+                "Please remove all other Nitrokey devices to update a device in bootloader mode."
             )
-            tooltip = "Please remove all Nitrokey devices except the one you want to update."
 
-        for btn in [self.ui.btn_update, self.ui.btn_update_with_file]:
+        for btn in [self.ui.btn_update, self.ui.btn_update_with_file, self.ui.btn_update_all]:
             btn.setEnabled(btn_really_enabled)
             btn.setToolTip(tooltip)
 
     def update_btns_during_update(self, enabled: bool) -> None:
         tooltip = "" if enabled else "Update is already running. Please wait."
         self.busy_state_changed.emit(not enabled)
-        for btn in [self.ui.btn_update, self.ui.btn_update_with_file]:
+        for btn in [self.ui.btn_update, self.ui.btn_update_with_file, self.ui.btn_update_all]:
             btn.setEnabled(enabled)
             btn.setToolTip(tooltip)
 
@@ -166,6 +232,42 @@ class OverviewTab(QtUtilsMixIn, QWidget):
 
         self.trigger_update.emit(self.data, self.is_qubesos)
 
+    @Slot()
+    def run_update_all(self) -> None:
+        if not self.devices:
+            return
+        self.update_btns_during_update(False)
+
+        self.trigger_update_all.emit(self.devices, self.is_qubesos)
+
+    @Slot(str, UpdateResult)
+    def queue_device_updated(self, name: str, result: UpdateResult) -> None:
+        msg = ""
+        if result.message is not None:
+            msg = ": " + result.message
+
+        if result.status == UpdateStatus.SUCCESS:
+            logger.info(f"{name} successfully updated{msg}")
+        elif result.status == UpdateStatus.SKIPPED:
+            logger.info(f"{name} not updated{msg}")
+        else:
+            logger.error(f"{name} update {result.status.value}{msg}")
+            self.common_ui.info.error.emit(f"{name} update failed{msg}")
+
+    @Slot(int, int, int)
+    def queue_finished(self, succeeded: int, skipped: int, total: int) -> None:
+        self.update_btns_during_update(True)
+
+        text = f"{succeeded} of {total} devices updated"
+        if skipped:
+            text += f", {skipped} already up to date"
+        if succeeded + skipped == total:
+            self.common_ui.info.info.emit(text)
+        else:
+            self.common_ui.info.error.emit(text)
+
+        self.common_ui.gui.refresh_devices.emit()
+
     @Slot(UpdateResult)
     def device_updated(self, result: UpdateResult) -> None:
         self.update_btns_during_update(True)
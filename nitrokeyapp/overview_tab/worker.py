@@ -1,15 +1,43 @@
 import logging
 
-from PySide6.QtCore import Signal, Slot
+from nitrokey.trussed import Model
+from PySide6.QtCore import QMetaObject, QObject, Signal, Slot
 
 from nitrokeyapp.common_ui import CommonUi
-from nitrokeyapp.device_data import DeviceData
-from nitrokeyapp.update import UpdateGUI, UpdateResult
+from nitrokeyapp.device_data import DeviceData, DeviceSnapshot
+from nitrokeyapp.firmware_cache import FirmwareImage, get_firmware_cache
+from nitrokeyapp.update import (
+    QueuedUpdateGUI,
+    UpdateException,
+    UpdateGUI,
+    UpdateResult,
+    UpdateStatus,
+    fetch_firmware,
+)
 from nitrokeyapp.worker import Job, Worker
 
 logger = logging.getLogger(__name__)
 
 
+class DeviceSnapshotJob(Job):
+    device_snapshot = Signal(DeviceSnapshot)
+
+    def __init__(self, common_ui: CommonUi, data: DeviceData) -> None:
+        super().__init__(common_ui)
+
+        self.data = data
+
+        self.device_snapshot.connect(lambda _: self.finished.emit())
+
+    def run(self) -> None:
+        try:
+            snapshot = self.data.snapshot()
+        except Exception as e:
+            self.trigger_error(f"Failed to read device information: {e}")
+            return
+        self.device_snapshot.emit(snapshot)
+
+
 class UpdateDevice(Job):
     device_updated = Signal(UpdateResult)
 
@@ -24,19 +52,119 @@ class UpdateDevice(Job):
         self.device_updated.connect(lambda _: self.finished.emit())
 
         self.update_gui = UpdateGUI(self.common_ui, data.model, self.is_qubesos)
-        self.common_ui.prompt.confirmed.connect(self.cancel_busy_wait)
+        # the prompt is shared with the other tabs, so only this slot is disconnected
+        self._confirmed_conn: QMetaObject.Connection | None = (
+            self.common_ui.prompt.confirmed.connect(self.cancel_busy_wait)
+        )
 
     def run(self) -> None:
         if not self.image:
             result = self.data.update(self.update_gui)
         else:
-            result = self.data.update(self.update_gui, self.image)
+            result = self.data.update(self.update_gui, self.import_image(self.image))
 
         self.device_updated.emit(result)
 
+    def import_image(self, image: str) -> str:
+        """Import a local firmware file into the firmware cache.
+
+        If the file cannot be imported, it is used as is, so that the updater
+        reports the problem with the file.
+        """
+        try:
+            return get_firmware_cache().import_file(image, self.data.model).path
+        except Exception as e:
+            logger.warning(f"Failed to import {image} into the firmware cache: {e}")
+            return image
+
     @Slot()
     def cleanup(self) -> None:
-        self.common_ui.prompt.confirmed.disconnect()
+        if self._confirmed_conn is not None:
+            QObject.disconnect(self._confirmed_conn)
+            self._confirmed_conn = None
+
+    @Slot(bool)
+    def cancel_busy_wait(self, confirmed: bool) -> None:
+        self.update_gui.await_confirmation = confirmed
+
+
+class UpdateQueue(Job):
+    """Update several devices one after another.
+
+    The latest firmware is fetched once per model, from the firmware cache or
+    downloaded into it, before the first device is rebooted into the
+    bootloader. The devices are updated sequentially and tracked through the
+    bootloader by their uuid, so all of them can stay connected.
+    """
+
+    queue_device_updated = Signal(str, UpdateResult)
+    # updated, skipped and total number of devices
+    queue_finished = Signal(int, int, int)
+
+    def __init__(self, common_ui: CommonUi, devices: list[DeviceData], is_qubesos: bool) -> None:
+        super().__init__(common_ui)
+
+        self.devices = devices
+        self.succeeded = 0
+        self.skipped = 0
+
+        self.queue_finished.connect(lambda _succeeded, _skipped, _total: self.finished.emit())
+
+        self.update_gui = QueuedUpdateGUI(self.common_ui, devices[0].model, is_qubesos)
+        self._confirmed_conn: QMetaObject.Connection | None = (
+            self.common_ui.prompt.confirmed.connect(self.cancel_busy_wait)
+        )
+
+    def run(self) -> None:
+        try:
+            self.update_gui.confirm_queue(len(self.devices))
+        except UpdateException:
+            self.queue_finished.emit(0, 0, len(self.devices))
+            return
+
+        images: dict[Model, FirmwareImage] = {}
+        for model in sorted({data.model for data in self.devices}, key=str):
+            self.update_gui.model = model
+            try:
+                images[model] = fetch_firmware(self.update_gui, model)
+            except UpdateException as e:
+                self.common_ui.info.error.emit(f"{model} update failed: {e}")
+                self.queue_finished.emit(0, 0, len(self.devices))
+                return
+
+        for i, data in enumerate(self.devices):
+            self.common_ui.info.info.emit(f"Updating {data.name} ({i + 1} of {len(self.devices)})")
+            result = self.update_device(data, images[data.model])
+            self.queue_device_updated.emit(data.name, result)
+
+            if result.status == UpdateStatus.SUCCESS:
+                self.succeeded += 1
+            elif result.status == UpdateStatus.SKIPPED:
+                self.skipped += 1
+            elif result.status == UpdateStatus.ABORTED:
+                logger.info(f"Update queue aborted at {data.name}")
+                break
+
+        self.queue_finished.emit(self.succeeded, self.skipped, len(self.devices))
+
+    def update_device(self, data: DeviceData, image: FirmwareImage) -> UpdateResult:
+        try:
+            current = data.version
+        except Exception as e:
+            return UpdateResult(data.model, UpdateStatus.ERROR, str(e))
+
+        if current.core() >= image.version.core():
+            logger.info(f"Skipping {data.name}, firmware {current} is up to date")
+            return UpdateResult(data.model, UpdateStatus.SKIPPED, f"{current} is up to date")
+
+        self.update_gui.model = data.model
+        return data.update(self.update_gui, image.path)
+
+    @Slot()
+    def cleanup(self) -> None:
+        if self._confirmed_conn is not None:
+            QObject.disconnect(self._confirmed_conn)
+            self._confirmed_conn = None
 
     @Slot(bool)
     def cancel_busy_wait(self, confirmed: bool) -> None:
@@ -45,11 +173,20 @@ class UpdateDevice(Job):
 
 class OverviewWorker(Worker):
     # TODO: remove DeviceData from signatures
+    device_snapshot = Signal(DeviceSnapshot)
     device_updated = Signal(UpdateResult)
+    queue_device_updated = Signal(str, UpdateResult)
+    queue_finished = Signal(int, int, int)
 
     def __init__(self, common_ui: CommonUi) -> None:
         super().__init__(common_ui)
 
+    @Slot(DeviceData)
+    def snapshot_device(self, data: DeviceData) -> None:
+        job = DeviceSnapshotJob(self.common_ui, data)
+        job.device_snapshot.connect(self.device_snapshot)
+        self.run(job)
+
     @Slot(DeviceData, bool)
     def update_device(self, data: DeviceData, is_qubesos: bool) -> None:
         job = UpdateDevice(self.common_ui, data, is_qubesos)
@@ -62,3 +199,10 @@ class OverviewWorker(Worker):
         job.image = filename
         job.device_updated.connect(self.device_updated)
         self.run(job)
+
+    @Slot(list, bool)
+    def update_all_devices(self, devices: list[DeviceData], is_qubesos: bool) -> None:
+        job = UpdateQueue(self.common_ui, devices, is_qubesos)
+        job.queue_device_updated.connect(self.queue_device_updated)
+        job.queue_finished.connect(self.queue_finished)
+        self.run(job)
@@ -0,0 +1,182 @@
+"""Cache for the PINs of several devices.
+
+Both the Passwords and the Passkeys tab cache the PIN entered by the user so
+that it is not queried for every operation.  The PINs are kept per device,
+identified by its uuid, so switching between connected devices does not
+require entering the PIN again.  A PIN is dropped
+
+- if it has not been used for `idle_ttl` seconds,
+- `max_ttl` seconds after it was entered,
+- if more than `max_entries` devices are cached (least recently used first),
+- if its device is removed, and
+- if the system was suspended.
+
+Suspend is detected by the periodic expiry check: the monotonic clock stops
+while the system is suspended, so it falls behind a clock that keeps running,
+the boot time clock if available, otherwise the wall clock.
+"""
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic, time
+
+try:
+    from time import CLOCK_BOOTTIME, clock_gettime
+
+    def _running_time() -> float:
+        return clock_gettime(CLOCK_BOOTTIME)
+
+except ImportError:
+    _running_time = time
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from nitrokeyapp.device_data import DeviceData
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_IDLE_TTL = 10 * 60
+DEFAULT_MAX_TTL = 60 * 60
+
+EXPIRY_INTERVAL = 15
+SUSPEND_THRESHOLD = 60
+
+
+def cache_key(data: DeviceData) -> str | None:
+    if data.is_bootloader:
+        return None
+    try:
+        uuid = data.uuid
+    except Exception as e:
+        logger.warning(f"failed to query uuid of {data.path}: {e}")
+        return None
+    return str(uuid) if uuid else None
+
+
+@dataclass
+class _Entry:
+    pin: str
+    created: float
+    used: float
+
+
+class PinCache(QObject):
+    """PINs of the connected devices, keyed by uuid.
+
+    The cache is used from worker threads and the GUI thread.  `pin_cached`
+    and `pin_cleared` are emitted with the key of the affected device, or an
+    empty key if all PINs were cleared.
+    """
+
+    pin_cached = Signal(str)
+    pin_cleared = Signal(str)
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        max_ttl: float = DEFAULT_MAX_TTL,
+    ) -> None:
+        super().__init__()
+
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.max_ttl = max_ttl
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._last_check = (monotonic(), _running_time())
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.expire)
+        self._timer.start(EXPIRY_INTERVAL * 1000)
+
+        _caches.add(self)
+
+    def get(self, data: DeviceData) -> str | None:
+        key = cache_key(data)
+        if key is None:
+            return None
+        self.expire()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.used = monotonic()
+            self._entries.move_to_end(key)
+            return entry.pin
+
+    def contains(self, data: DeviceData) -> bool:
+        """Check if a PIN is cached for `data` without counting it as used."""
+        key = cache_key(data)
+        with self._lock:
+            return key is not None and key in self._entries
+
+    def update(self, data: DeviceData, pin: str) -> None:
+        key = cache_key(data)
+        if key is None:
+            return
+        now = monotonic()
+        evicted = []
+        with self._lock:
+            self._entries[key] = _Entry(pin, now, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        for evicted_key in evicted:
+            logger.debug(f"Evicting PIN of {evicted_key}, cache is full")
+            self.pin_cleared.emit(evicted_key)
+        self.pin_cached.emit(key)
+
+    def forget(self, data: DeviceData) -> None:
+        key = cache_key(data)
+        if key is None:
+            return
+        with self._lock:
+            removed = self._entries.pop(key, None)
+        if removed:
+            self.pin_cleared.emit(key)
+
+    @Slot()
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.pin_cleared.emit("")
+
+    @Slot()
+    def expire(self) -> None:
+        now = monotonic()
+        running = _running_time()
+        with self._lock:
+            last_now, last_running = self._last_check
+            suspended = (running - last_running) - (now - last_now) > SUSPEND_THRESHOLD
+            self._last_check = (now, running)
+            if suspended:
+                expired = list(self._entries)
+            else:
+                expired = [
+                    key
+                    for key, entry in self._entries.items()
+                    if now - entry.used > self.idle_ttl or now - entry.created > self.max_ttl
+                ]
+            for key in expired:
+                del self._entries[key]
+
+        if suspended and expired:
+            logger.info("Clearing cached PINs after suspend")
+        for key in expired:
+            self.pin_cleared.emit(key)
+
+
+_caches: "weakref.WeakSet[PinCache]" = weakref.WeakSet()
+
+
+def forget_device(data: DeviceData) -> None:
+    """Drop the PIN of a removed device from all caches."""
+    for cache in list(_caches):
+        cache.forget(data)
@@ -1,25 +1,135 @@
 import logging
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import monotonic
 
 from PySide6.QtCore import QObject, QTimer, Signal, Slot
 from PySide6.QtWidgets import QProgressBar
 
+from nitrokeyapp import diagnostics
+
 logger = logging.getLogger(__name__)
 
+# maximum number of progress updates per second delivered to the GUI
+DEFAULT_MAX_RATE = 30.0
+# time span of the chunk timings used to estimate the throughput
+RATE_WINDOW = 3.0
+
 
 class ProgressUi(QObject):
     start = Signal(str)
     stop = Signal()
     progress = Signal(int, int)
+    detail = Signal(str)
 
     def __init__(self) -> None:
         super().__init__()
 
+    @contextmanager
+    def throttled(
+        self, desc: str, unit: str | None = None, max_rate: float = DEFAULT_MAX_RATE
+    ) -> Iterator["ProgressThrottle"]:
+        self.start.emit(desc)
+        throttle = ProgressThrottle(self, unit=unit, max_rate=max_rate)
+        try:
+            yield throttle
+        finally:
+            throttle.flush()
+
+
+def format_size(n: float) -> str:
+    if n < 1024:
+        return f"{n:.0f} B"
+    n /= 1024
+    for prefix in ("Ki", "Mi"):
+        if n < 1024:
+            return f"{n:.1f} {prefix}B"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds + 0.5)
+    if seconds < 60:
+        return f"{seconds} s"
+    return f"{seconds // 60} min {seconds % 60:02d} s"
+
+
+class ProgressThrottle:
+    """Progress callback that limits the updates sent to the GUI.
+
+    Updaters report the progress for every chunk, and every report is a
+    signal queued to the GUI thread.  The throttle forwards at most
+    `max_rate` updates per second, but always the final one, and estimates
+    the throughput and the remaining time from the timings of all chunks.
+    """
+
+    def __init__(
+        self, progress_ui: ProgressUi, unit: str | None = None, max_rate: float = DEFAULT_MAX_RATE
+    ) -> None:
+        self.progress_ui = progress_ui
+        self.unit = unit
+        self.interval = 1 / max_rate if max_rate > 0 else 0.0
+
+        self._samples: deque[tuple[float, int]] = deque()
+        self._last_emit: float | None = None
+        self._pending: tuple[int, int] | None = None
+
+    def __call__(self, n: int, total: int) -> None:
+        now = monotonic()
+        self._samples.append((now, n))
+        while now - self._samples[0][0] > RATE_WINDOW and len(self._samples) > 2:
+            self._samples.popleft()
+
+        diagnostics.increment("progress.reported")
+        self._pending = (n, total)
+        if n >= total or self._last_emit is None or now - self._last_emit >= self.interval:
+            self._emit(now)
+
+    def flush(self) -> None:
+        """Deliver the last reported value if it was held back."""
+        if self._pending:
+            self._emit(monotonic())
+
+    def rate(self) -> float | None:
+        """Units per second within the last `RATE_WINDOW` seconds."""
+        if len(self._samples) < 2:
+            return None
+        (start, first), (end, last) = self._samples[0], self._samples[-1]
+        if end <= start or last <= first:
+            return None
+        return (last - first) / (end - start)
+
+    def _emit(self, now: float) -> None:
+        assert self._pending
+        n, total = self._pending
+        self._pending = None
+        self._last_emit = now
+
+        diagnostics.increment("progress.delivered")
+        self.progress_ui.progress.emit(n, total)
+        self.progress_ui.detail.emit(self.describe(n, total))
+
+    def describe(self, n: int, total: int) -> str:
+        rate = self.rate()
+        if rate is None or n >= total:
+            return ""
+        parts = []
+        if self.unit == "B":
+            parts.append(f"{format_size(rate)}/s")
+        elif self.unit:
+            parts.append(f"{rate:.1f} {self.unit}/s")
+        parts.append(f"{format_duration((total - n) / rate)} left")
+        return ", ".join(parts)
+
 
 class ProgressBox(QObject):
     def __init__(self, progress_bar: QProgressBar):
         super().__init__()
 
         self.progress_bar = progress_bar
+        self.text = ""
 
         self.progress_bar.setTextVisible(True)
 
@@ -32,6 +142,7 @@ class ProgressBox(QObject):
 
     @Slot(str)
     def show(self, txt: str) -> None:
+        self.text = txt
         self.progress_bar.setFormat(f"{txt}: %p%")
         self.progress_bar.show()
 
@@ -40,6 +151,13 @@ class ProgressBox(QObject):
         self.progress_bar.hide()
         self.progress_bar.setValue(0)
 
+    @Slot(str)
+    def set_detail(self, detail: str) -> None:
+        if detail:
+            self.progress_bar.setFormat(f"{self.text}: %p% ({detail})")
+        else:
+            self.progress_bar.setFormat(f"{self.text}: %p%")
+
     @Slot(int, int)
     def update(self, n: int, total: int) -> None:
         self.progress_bar.show()
@@ -50,7 +168,4 @@ class ProgressBox(QObject):
         elif (n * 100 // total) > value:
             self.progress_bar.setValue((n * 100 // total))
 
-        if self.hide_timer.isActive():
-            self.hide_timer.stop()
-        self.hide_timer.setInterval(7000)
         self.hide_timer.start()
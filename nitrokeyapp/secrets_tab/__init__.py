@@ -3,21 +3,32 @@ import logging
 import string
 from base64 import b32decode, b32encode
 from collections.abc import Callable
-from datetime import datetime, timedelta
+from datetime import datetime
 from enum import Enum
 from random import randbytes
 from secrets import choice
 
+from nitrokey.trussed import Model
 from PySide6.QtCore import QEvent, QObject, Qt, QThread, QTimer, Signal, Slot
-from PySide6.QtGui import QGuiApplication, QKeyEvent, QKeySequence, QResizeEvent
+from PySide6.QtGui import (
+    QGuiApplication,
+    QHideEvent,
+    QKeyEvent,
+    QKeySequence,
+    QResizeEvent,
+    QShowEvent,
+)
 from PySide6.QtWidgets import (
     QAbstractSpinBox,
     QCheckBox,
+    QFileDialog,
     QFormLayout,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
     QLineEdit,
     QListWidgetItem,
+    QMenu,
     QMessageBox,
     QSpinBox,
     QWidget,
@@ -25,10 +36,13 @@ from PySide6.QtWidgets import (
 
 from nitrokeyapp.common_ui import CommonUi
 from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.pin_cache import cache_key
 from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
 from nitrokeyapp.worker import Worker
 
-from .data import Credential, OtherKind, OtpData, OtpKind
+from .data import CloneSummary, Credential, OtherKind, OtpData, OtpKind
+from .export import ExportSummary, ImportSummary
+from .otp_countdown import TOTP_PERIOD, OtpCountdown
 from .worker import SecretsWorker
 
 # TODO:
@@ -83,6 +97,7 @@ class PasswordGenRow(QWidget):
 
 
 CLIPBOARD_CLEAR_TIMEOUT_MS = 10_000
+EXPORT_PASSPHRASE_MIN_LENGTH = 8
 
 
 def parse_base32(s: str) -> bytes:
@@ -120,10 +135,15 @@ class SecretsTab(QtUtilsMixIn, QWidget):
     trigger_add_credential = Signal(DeviceData, Credential, bytes)
     trigger_check_device = Signal(DeviceData)
     trigger_delete_credential = Signal(DeviceData, Credential)
-    trigger_generate_otp = Signal(DeviceData, Credential)
+    trigger_generate_otp = Signal(DeviceData, Credential, int, float)
     trigger_refresh_credentials = Signal(DeviceData, bool)
     trigger_get_credential = Signal(DeviceData, Credential)
     trigger_edit_credential = Signal(DeviceData, Credential, bytes, bytes)
+    trigger_export_credentials = Signal(DeviceData, str, str)
+    trigger_export_dry_run = Signal(DeviceData)
+    trigger_import_credentials = Signal(DeviceData, str, str)
+    trigger_clone_credentials = Signal(DeviceData, DeviceData)
+    trigger_cancel = Signal()
 
     def __init__(self, parent: QWidget) -> None:
         QWidget.__init__(self, parent)
@@ -143,12 +163,15 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         self.trigger_refresh_credentials.connect(self._worker.refresh_credentials)
         self.trigger_get_credential.connect(self._worker.get_credential)
         self.trigger_edit_credential.connect(self._worker.edit_credential)
+        self.trigger_export_credentials.connect(self._worker.export_credentials)
+        self.trigger_export_dry_run.connect(self._worker.export_dry_run)
+        self.trigger_import_credentials.connect(self._worker.import_credentials)
+        self.trigger_clone_credentials.connect(self._worker.clone_credentials)
+        self.trigger_cancel.connect(self._worker.cancel)
 
-        self._worker.pin_cache.pin_cleared.connect(self.common_ui.info.pin_cleared)
-        self._worker.pin_cache.pin_cleared.connect(lambda: self.uncheck_checkbox(True))
-
-        self._worker.pin_cache.pin_cached.connect(self.common_ui.info.pin_cached)
-        self.common_ui.info.pin_pressed.connect(self._worker.pin_cache.clear)
+        self._worker.pin_cache.pin_cleared.connect(self.pin_cleared)
+        self._worker.pin_cache.pin_cached.connect(self.pin_cached)
+        self.common_ui.info.pin_pressed.connect(self.forget_pin)
 
         self._worker.credential_added.connect(self.credential_added)
         self._worker.credential_deleted.connect(self.credential_deleted)
@@ -157,18 +180,26 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         self._worker.device_checked.connect(self.device_checked)
         self._worker.otp_generated.connect(self.otp_generated)
         self._worker.uncheck_checkbox.connect(self.uncheck_checkbox)
+        self._worker.credentials_exported.connect(self.credentials_exported)
+        self._worker.credentials_imported.connect(self.credentials_imported)
+        self._worker.credentials_cloned.connect(self.credentials_cloned)
 
         self._worker.received_credential.connect(self.handle_receive_credential)
         self.next_credential_receiver: Callable[[Credential], None] | None = None
 
         self.data: DeviceData | None = None
         self.active_credential: Credential | None = None
-
-        self.period: int = 0
-        self.otp_timeout: datetime | None = None
-        self.otp_timer = QTimer()
-        self.otp_timer.timeout.connect(self.update_otp_timeout)
-        self.otp_timer.setInterval(1000)
+        # all attached devices, used to offer clone targets
+        self.devices: list[DeviceData] = []
+
+        self.otp_period = TOTP_PERIOD
+        # TOTP of the next period, requested in the background
+        self.pending_otp: OtpData | None = None
+        self.otp_countdown = OtpCountdown(self)
+        self.otp_countdown.tick.connect(self.update_otp_timeout)
+        self.otp_countdown.refresh_due.connect(self.refresh_otp)
+        self.otp_countdown.expired.connect(self.otp_expired)
+        self.otp_countdown.finished.connect(self.hide_otp)
 
         self.clipboard = QGuiApplication.clipboard()
 
@@ -205,6 +236,15 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         assert isinstance(form, QFormLayout)
         pw_row = form.getWidgetPosition(self.ui.password)[0]  # type: ignore[index]
         form.insertRow(pw_row + 1, self._pw_gen_widget)
+
+        self.otp_auto_refresh = QCheckBox("Refresh automatically")
+        self.otp_auto_refresh.setToolTip(
+            "Generate the next code in the background before the current one expires "
+            "(not for credentials that require touch)"
+        )
+        self.otp_auto_refresh.hide()
+        otp_row = form.getWidgetPosition(self.ui.otp_timeout_progress)[0]  # type: ignore[index]
+        form.insertRow(otp_row + 1, self.otp_auto_refresh)
         self._pin_label_column(form)
 
         self.action_comment_copy = self.ui.comment.addAction(icon_copy, loc)
@@ -274,6 +314,14 @@ class SecretsTab(QtUtilsMixIn, QWidget):
 
         self.ui.btn_delete.pressed.connect(self.delete_credential)
 
+        export_menu = QMenu(self.ui.btn_export)
+        export_menu.addAction("Export to File...", self.export_credentials)
+        export_menu.addAction("Dry Run (Counts and Sizes)", self.export_dry_run)
+        export_menu.addAction("Import from File...", self.import_credentials)
+        export_menu.addSeparator()
+        export_menu.addAction("Clone to Another Device...", self.clone_credentials)
+        self.ui.btn_export.setMenu(export_menu)
+
         self.reset()
 
     @property
@@ -301,8 +349,12 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         Used after an external change to the passwords app (e.g. a factory
         reset from the Settings tab) that this tab cannot observe directly.
         """
+        self.trigger_cancel.emit()
         self.active_credential = None
-        self._worker.pin_cache.clear()
+        if self.data:
+            self._worker.pin_cache.forget(self.data)
+        else:
+            self._worker.pin_cache.clear()
         self.data = None
         self.reset_ui()
 
@@ -321,11 +373,36 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         if data == self.data and not force:
             return
         self.data = data
-        self._worker.pin_cache.clear()
+        # the PINs of other devices stay cached, just show the state of this one
+        if self._worker.pin_cache.contains(data):
+            self.common_ui.info.pin_cached.emit()
+        else:
+            self.common_ui.info.pin_cleared.emit()
+            self.uncheck_checkbox(True)
 
         self.reset_ui()
         self.trigger_check_device.emit(self.data)
 
+    @Slot()
+    def forget_pin(self) -> None:
+        # only the PIN of the shown device, the others stay cached
+        if self.data:
+            self._worker.pin_cache.forget(self.data)
+
+    def _is_current(self, key: str) -> bool:
+        return not key or (self.data is not None and cache_key(self.data) == key)
+
+    @Slot(str)
+    def pin_cached(self, key: str) -> None:
+        if self._is_current(key):
+            self.common_ui.info.pin_cached.emit()
+
+    @Slot(str)
+    def pin_cleared(self, key: str) -> None:
+        if self._is_current(key):
+            self.common_ui.info.pin_cleared.emit()
+            self.uncheck_checkbox(True)
+
     @Slot(bool)
     def device_checked(self, compatible: bool) -> None:
         self.show_secrets(compatible)
@@ -378,19 +455,26 @@ class SecretsTab(QtUtilsMixIn, QWidget):
 
     @Slot(OtpData)
     def otp_generated(self, data: OtpData) -> None:
-        self.ui.otp.setText(data.otp)
+        if data.validity and data.validity[0] > datetime.now():
+            # refreshed in the background, shown once the current code expires
+            if self.otp_countdown.active:
+                self.pending_otp = data
+            return
+
         self.common_ui.info.info.emit("Secret is generated")
+        self.show_otp(data)
+
+    def show_otp(self, data: OtpData) -> None:
+        self.ui.otp.setText(data.otp)
 
         if data.validity:
             start, end = data.validity
             period = int((end - start).total_seconds())
-            self.period = period
             self.ui.otp_timeout_progress.setMaximum(period)
-            self.otp_timeout = end
-            self.otp_timer.start()
-            self.update_otp_timeout()
+            self.otp_countdown.start(end, period)
 
         self.ui.otp_timeout_progress.setVisible(data.validity is not None)
+        self.otp_auto_refresh.setVisible(data.validity is not None)
         self.ui.otp.show()
 
     def add_credential(self, credential: Credential) -> QListWidgetItem:
@@ -993,25 +1077,46 @@ class SecretsTab(QtUtilsMixIn, QWidget):
 
     @Slot()
     def hide_otp(self) -> None:
-        self.otp_timeout = None
-        self.otp_timer.stop()
+        self.otp_countdown.stop()
+        self.pending_otp = None
         self.ui.otp_timeout_progress.hide()
+        self.otp_auto_refresh.hide()
         self.ui.otp.clear()
         self.ui.otp.setPlaceholderText("<hidden>")
 
+    @Slot(int)
+    def update_otp_timeout(self, remaining: int) -> None:
+        self.ui.otp_timeout_progress.setValue(remaining)
+
+    @Slot()
+    def otp_expired(self) -> None:
+        if self.pending_otp:
+            data, self.pending_otp = self.pending_otp, None
+            self.show_otp(data)
+
     @Slot()
-    def update_otp_timeout(self) -> None:
-        self.ui.otp_timeout_progress.show()
-        if not self.otp_timeout:
+    def refresh_otp(self) -> None:
+        if not (self.otp_auto_refresh.isChecked() and self.data and self.otp_countdown.valid_until):
+            return
+        credential = self.get_current_credential()
+        if not credential or credential.otp != OtpKind.TOTP or credential.touch_required:
             return
-        timeout = int((self.otp_timeout - datetime.now()).total_seconds())
-        hidden_timeout = int(
-            (self.otp_timeout + timedelta(seconds=self.period) - datetime.now()).total_seconds()
+        if credential.protected and not self._worker.pin_cache.contains(self.data):
+            return
+        self.trigger_generate_otp.emit(
+            self.data,
+            credential,
+            self.otp_countdown.period,
+            self.otp_countdown.valid_until.timestamp(),
         )
-        if hidden_timeout >= 0:
-            self.ui.otp_timeout_progress.setValue(timeout)
-        else:
-            self.hide_otp()
+
+    def showEvent(self, event: QShowEvent) -> None:
+        super().showEvent(event)
+        self.otp_countdown.resume()
+
+    def hideEvent(self, event: QHideEvent) -> None:
+        super().hideEvent(event)
+        self.otp_countdown.pause()
 
     @Slot(QListWidgetItem)
     def credential_clicked(self, item: QListWidgetItem | None) -> None:
@@ -1104,7 +1209,146 @@ class SecretsTab(QtUtilsMixIn, QWidget):
         assert self.data
         credential = self.get_current_credential()
         assert credential
-        self.trigger_generate_otp.emit(self.data, credential)
+        self.trigger_generate_otp.emit(self.data, credential, self.otp_period, 0.0)
+
+    @Slot()
+    def export_credentials(self) -> None:
+        assert self.data
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Passwords", "passwords.nkexport", "Passwords Export (*.nkexport)"
+        )
+        if not path:
+            return
+
+        passphrase, ok = QInputDialog.getText(
+            self,
+            "Export Passwords",
+            "Enter a passphrase to encrypt the export "
+            f"(at least {EXPORT_PASSPHRASE_MIN_LENGTH} characters):",
+            QLineEdit.EchoMode.Password,
+        )
+        if not ok:
+            return
+        if len(passphrase) < EXPORT_PASSPHRASE_MIN_LENGTH:
+            self.user_warn(
+                f"The passphrase must have at least {EXPORT_PASSPHRASE_MIN_LENGTH} characters.",
+                "Export Passwords",
+            )
+            return
+
+        confirm, ok = QInputDialog.getText(
+            self, "Export Passwords", "Confirm the passphrase:", QLineEdit.EchoMode.Password
+        )
+        if not ok:
+            return
+        if passphrase != confirm:
+            self.user_warn("The passphrases do not match.", "Export Passwords")
+            return
+
+        self.trigger_export_credentials.emit(self.data, path, passphrase)
+
+    @Slot()
+    def export_dry_run(self) -> None:
+        assert self.data
+        self.trigger_export_dry_run.emit(self.data)
+
+    @Slot()
+    def import_credentials(self) -> None:
+        assert self.data
+
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Passwords", "", "Passwords Export (*.nkexport)"
+        )
+        if not path:
+            return
+
+        passphrase, ok = QInputDialog.getText(
+            self,
+            "Import Passwords",
+            "Enter the passphrase of the export:",
+            QLineEdit.EchoMode.Password,
+        )
+        if not ok:
+            return
+
+        self.trigger_import_credentials.emit(self.data, path, passphrase)
+
+    def set_devices(self, devices: list[DeviceData]) -> None:
+        self.devices = devices
+
+    @Slot()
+    def clone_credentials(self) -> None:
+        assert self.data
+
+        targets = [
+            device
+            for device in self.devices
+            if device is not self.data and not device.is_bootloader and device.model == Model.NK3
+        ]
+        if not targets:
+            self.user_info(
+                "Please attach the Nitrokey 3 you want to copy the credentials to.",
+                "Clone Passwords",
+            )
+            return
+
+        names = [device.name for device in targets]
+        name, ok = QInputDialog.getItem(
+            self,
+            "Clone Passwords",
+            f"Copy all exportable credentials from {self.data.name} to:",
+            names,
+            0,
+            False,
+        )
+        if not ok:
+            return
+
+        target = targets[names.index(name)]
+        self.trigger_clone_credentials.emit(self.data, target)
+
+    @Slot(ExportSummary)
+    def credentials_exported(self, summary: ExportSummary) -> None:
+        if summary.dry_run:
+            title = "Export Dry Run"
+            text = (
+                f"{summary.exported} credential(s) would be exported (at least {summary.size} "
+                "bytes, logins, passwords and comments are not read in a dry run)."
+            )
+        else:
+            title = "Export Passwords"
+            text = f"{summary.exported} credential(s) exported ({summary.size} bytes)."
+        self.common_ui.info.info.emit(text)
+
+        if summary.skipped:
+            text += f"\n\n{len(summary.skipped)} credential(s) skipped:\n"
+            text += "\n".join(f"{name}: {reason}" for name, reason in summary.skipped)
+        self.user_info(text, title)
+
+    @Slot(ImportSummary)
+    def credentials_imported(self, summary: ImportSummary) -> None:
+        text = f"{summary.imported} credential(s) imported."
+        self.common_ui.info.info.emit(text)
+        self.refresh_credential_list()
+
+        if summary.skipped:
+            text += f"\n\n{len(summary.skipped)} credential(s) skipped:\n"
+            text += "\n".join(f"{name}: {reason}" for name, reason in summary.skipped)
+        self.user_info(text, "Import Passwords")
+
+    @Slot(CloneSummary)
+    def credentials_cloned(self, summary: CloneSummary) -> None:
+        text = (
+            f"{summary.copied} credential(s) copied in {summary.duration:.1f}s "
+            f"({summary.throughput:.1f} credentials/s)."
+        )
+        self.common_ui.info.info.emit(text)
+
+        if summary.skipped:
+            text += f"\n\n{len(summary.skipped)} credential(s) skipped:\n"
+            text += "\n".join(f"{name}: {reason}" for name, reason in summary.skipped)
+        self.user_info(text, "Clone Passwords")
 
     @Slot(bool)
     def uncheck_checkbox(self, uncheck: bool) -> None:
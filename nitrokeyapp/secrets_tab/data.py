@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum, auto, unique
 
@@ -132,3 +132,17 @@ class Credential:
 class OtpData:
     otp: str
     validity: tuple[datetime, datetime] | None = None
+
+
+@dataclass
+class CloneSummary:
+    copied: int = 0
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Copied credentials per second."""
+        if self.duration <= 0:
+            return 0.0
+        return self.copied / self.duration
@@ -0,0 +1,219 @@
+"""Encrypted export file format for Passwords credentials.
+
+An export file starts with a fixed header containing the key derivation salt
+and a random nonce prefix. It is followed by a sequence of length-prefixed
+AES-GCM frames, each carrying one JSON encoded credential. Frames are written
+as soon as a credential has been read from the device, so neither the writer
+nor the reader has to keep more than one credential in memory.
+
+The last frame is an empty end marker. It is authenticated with a different
+associated data tag than regular records, which lets readers tell a complete
+export apart from a truncated one.
+"""
+
+import json
+import os
+import struct
+from base64 import b64decode, b64encode
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Any, BinaryIO
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+from .data import Credential, OtherKind, OtpKind
+
+MAGIC = b"NKSECRET"
+FORMAT_VERSION = 1
+
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 8
+KEY_SIZE = 32
+TAG_SIZE = 16
+
+SCRYPT_N = 2**15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+HEADER = struct.Struct(f">8sB{SALT_SIZE}s{NONCE_PREFIX_SIZE}s")
+FRAME_LENGTH = struct.Struct(">I")
+FRAME_OVERHEAD = FRAME_LENGTH.size + TAG_SIZE
+
+AAD_RECORD = b"record"
+AAD_END = b"end"
+
+
+class ExportFormatError(Exception):
+    pass
+
+
+@dataclass
+class ExportSummary:
+    dry_run: bool
+    exported: int = 0
+    size: int = 0
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class ImportSummary:
+    imported: int = 0
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+
+
+def skip_reason(credential: Credential, unlocked: bool) -> str | None:
+    """Why `credential` cannot be exported, or None if it can be.
+
+    `unlocked` tells whether the PIN protected credentials can be read.
+    """
+    if credential.otp or credential.other:
+        # the OTP/HMAC secret cannot be read back from the device
+        return "secret is not exportable"
+    if credential.protected and not unlocked:
+        return "PIN not available"
+    return None
+
+
+def _encode_bytes(value: bytes | None) -> str | None:
+    return b64encode(value).decode() if value is not None else None
+
+
+def _decode_bytes(value: str | None) -> bytes | None:
+    return b64decode(value) if value is not None else None
+
+
+def encode_credential(credential: Credential) -> bytes:
+    record: dict[str, Any] = {
+        "id": _encode_bytes(credential.id),
+        "otp": credential.otp.name if credential.otp else None,
+        "other": credential.other.name if credential.other else None,
+        "login": _encode_bytes(credential.login),
+        "password": _encode_bytes(credential.password),
+        "comment": _encode_bytes(credential.comment),
+        "protected": credential.protected,
+        "touch_required": credential.touch_required,
+    }
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def decode_credential(payload: bytes) -> Credential:
+    record = json.loads(payload)
+    cred_id = _decode_bytes(record["id"])
+    if cred_id is None:
+        raise ExportFormatError("Credential record without id")
+    return Credential(
+        id=cred_id,
+        otp=OtpKind.from_str(record["otp"]) if record.get("otp") else None,
+        other=OtherKind.from_str(record["other"]) if record.get("other") else None,
+        login=_decode_bytes(record.get("login")),
+        password=_decode_bytes(record.get("password")),
+        comment=_decode_bytes(record.get("comment")),
+        protected=bool(record.get("protected")),
+        touch_required=bool(record.get("touch_required")),
+        loaded=True,
+    )
+
+
+def encoded_size(credential: Credential) -> int:
+    """Number of bytes `ExportWriter.write` would produce for this credential."""
+    return FRAME_OVERHEAD + len(encode_credential(credential))
+
+
+def empty_export_size() -> int:
+    """Size of an export file without any records (header and end marker)."""
+    return HEADER.size + FRAME_OVERHEAD
+
+
+def _derive_key(passphrase: str, salt: bytes) -> AESGCM:
+    kdf = Scrypt(salt=salt, length=KEY_SIZE, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return AESGCM(kdf.derive(passphrase.encode()))
+
+
+def _nonce(prefix: bytes, counter: int) -> bytes:
+    return prefix + counter.to_bytes(12 - NONCE_PREFIX_SIZE, "big")
+
+
+class ExportWriter:
+    def __init__(self, stream: BinaryIO, passphrase: str) -> None:
+        self.stream = stream
+        self.size = 0
+
+        salt = os.urandom(SALT_SIZE)
+        self._nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._aead = _derive_key(passphrase, salt)
+        self._counter = 0
+        self._closed = False
+
+        self._write(HEADER.pack(MAGIC, FORMAT_VERSION, salt, self._nonce_prefix))
+
+    def __enter__(self) -> "ExportWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        # only mark the export as complete if all records have been written
+        if exc_type is None:
+            self.close()
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self.size += len(data)
+
+    def _write_frame(self, payload: bytes, aad: bytes) -> int:
+        if self._closed:
+            raise ExportFormatError("Export has already been closed")
+        ciphertext = self._aead.encrypt(_nonce(self._nonce_prefix, self._counter), payload, aad)
+        self._counter += 1
+        self._write(FRAME_LENGTH.pack(len(ciphertext)))
+        self._write(ciphertext)
+        return FRAME_LENGTH.size + len(ciphertext)
+
+    def write(self, credential: Credential) -> int:
+        return self._write_frame(encode_credential(credential), AAD_RECORD)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._write_frame(b"", AAD_END)
+            self._closed = True
+            self.stream.flush()
+
+
+def read_export(stream: BinaryIO, passphrase: str) -> Iterator[Credential]:
+    header = stream.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ExportFormatError("File is too short to be a Passwords export")
+    magic, version, salt, nonce_prefix = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ExportFormatError("File is not a Passwords export")
+    if version != FORMAT_VERSION:
+        raise ExportFormatError(f"Unsupported export format version {version}")
+
+    aead = _derive_key(passphrase, salt)
+    counter = 0
+    while True:
+        length_bytes = stream.read(FRAME_LENGTH.size)
+        if len(length_bytes) != FRAME_LENGTH.size:
+            raise ExportFormatError("Export is truncated")
+        (length,) = FRAME_LENGTH.unpack(length_bytes)
+        ciphertext = stream.read(length)
+        if len(ciphertext) != length:
+            raise ExportFormatError("Export is truncated")
+
+        nonce = _nonce(nonce_prefix, counter)
+        counter += 1
+        try:
+            payload = aead.decrypt(nonce, ciphertext, AAD_RECORD)
+        except InvalidTag:
+            try:
+                aead.decrypt(nonce, ciphertext, AAD_END)
+            except InvalidTag:
+                raise ExportFormatError("Wrong passphrase or corrupted export") from None
+            return
+        yield decode_credential(payload)
@@ -0,0 +1,107 @@
+"""Countdown for the validity of a displayed TOTP.
+
+Instead of polling with a fixed interval, the countdown schedules a single
+precise timer for the next moment the displayed seconds change, aligned to
+the end of the TOTP period.  A displayed code is kept for one more period
+after it expired, as most verifiers still accept the previous code.
+"""
+
+import logging
+import math
+from datetime import datetime
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal, Slot
+
+logger = logging.getLogger(__name__)
+
+# the default TOTP period of the Passwords app
+TOTP_PERIOD = 30
+# request the code of the next period this many seconds before the current
+# one expires
+REFRESH_MARGIN = 2
+# tolerance for timers firing slightly early or late, in seconds
+EPSILON = 0.005
+
+
+class OtpCountdown(QObject):
+    # remaining validity in seconds, 0 once expired
+    tick = Signal(int)
+    # the next code should be requested now
+    refresh_due = Signal()
+    # the displayed code just expired
+    expired = Signal()
+    # the displayed code should no longer be shown
+    finished = Signal()
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+
+        self.valid_until: datetime | None = None
+        self.period = TOTP_PERIOD
+        self._refresh_sent = False
+        self._expired_sent = False
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.wake)
+
+    @property
+    def active(self) -> bool:
+        return self.valid_until is not None
+
+    def start(self, valid_until: datetime, period: int) -> None:
+        self.valid_until = valid_until
+        self.period = period
+        self._refresh_sent = False
+        self._expired_sent = False
+        self.wake()
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self.valid_until = None
+
+    def pause(self) -> None:
+        """Stop waking up, but keep the validity so that `resume` can continue."""
+        self.timer.stop()
+
+    def resume(self) -> None:
+        if self.valid_until is not None and not self.timer.isActive():
+            self.wake()
+
+    @Slot()
+    def wake(self) -> None:
+        if self.valid_until is None:
+            return
+        remaining = self._remaining()
+
+        if remaining <= EPSILON - self.period:
+            self.stop()
+            self.finished.emit()
+            return
+
+        if remaining <= EPSILON:
+            if not self._expired_sent:
+                self._expired_sent = True
+                self.expired.emit()
+                # the handler may have stopped or started the next period
+                if self.valid_until is None or self._remaining() > EPSILON:
+                    return
+            self.tick.emit(0)
+            self._start_timer(remaining + self.period)
+            return
+
+        if remaining <= REFRESH_MARGIN + EPSILON and not self._refresh_sent:
+            self._refresh_sent = True
+            self.refresh_due.emit()
+
+        # wake up again when the displayed seconds change
+        self.tick.emit(int(remaining + EPSILON))
+        self._start_timer(remaining - math.floor(remaining - EPSILON))
+
+    def _remaining(self) -> float:
+        assert self.valid_until is not None
+        return (self.valid_until - datetime.now()).total_seconds()
+
+    def _start_timer(self, delay: float) -> None:
+        self.timer.start(max(1, round(delay * 1000)))
@@ -1,55 +1,38 @@
 import logging
-from dataclasses import dataclass
+import os
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, nullcontext
 from datetime import datetime
+from time import monotonic
 
 from nitrokey.nk3 import NK3
 from nitrokey.nk3.secrets_app import SecretsApp, SecretsAppException
-from nitrokey.trussed import Uuid
-from PySide6.QtCore import QObject, Signal, Slot
+from PySide6.QtCore import Signal, Slot
 from PySide6.QtWidgets import QWidget
 
 from nitrokeyapp.common_ui import CommonUi
 from nitrokeyapp.device_data import DeviceData
-from nitrokeyapp.worker import Job, Worker
-
-from .data import Credential, OtpData, OtpKind
+from nitrokeyapp.device_health import health_service
+from nitrokeyapp.pin_cache import PinCache
+from nitrokeyapp.worker import CoroutineJob, Job, JobError, Steps, Worker
+
+from .data import CloneSummary, Credential, OtpData, OtpKind
+from .export import (
+    ExportFormatError,
+    ExportSummary,
+    ExportWriter,
+    ImportSummary,
+    empty_export_size,
+    encoded_size,
+    read_export,
+    skip_reason,
+)
+from .otp_countdown import TOTP_PERIOD
 from .ui import PinUi
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class PinCache(QObject):
-    uuid: Uuid | None = None
-    pin: str | None = None
-
-    pin_cached = Signal()
-    pin_cleared = Signal()
-
-    def __init__(self) -> None:
-        super().__init__()
-
-    @Slot()
-    def clear(self) -> None:
-        self.uuid = None
-        self.pin = None
-        self.pin_cleared.emit()
-
-    def get(self, data: DeviceData) -> str | None:
-        if data.uuid and self.uuid == data.uuid:
-            return self.pin
-        else:
-            return None
-
-    def update(self, data: DeviceData, pin: str) -> None:
-        if not data.uuid:
-            return
-        self.uuid = data.uuid
-        self.pin = pin
-
-        self.pin_cached.emit()
-
-
 class CheckDeviceJob(Job):
     device_checked = Signal(bool)
 
@@ -63,14 +46,7 @@ class CheckDeviceJob(Job):
     def run(self) -> None:
         compatible = False
         try:
-            with self.data.open() as device:
-                if isinstance(device, NK3):
-                    secrets = SecretsApp(device)
-                    try:
-                        compatible = secrets._semver_equal_or_newer("4.11.0")
-                    except Exception:
-                        # TODO: catch a more specific exception
-                        pass
+            compatible = health_service.get(self.data).secrets_compatible
         except Exception as e:
             logger.info(f"check device job failed: {e}")
             compatible = False
@@ -78,100 +54,138 @@ class CheckDeviceJob(Job):
         self.device_checked.emit(compatible)
 
 
-class VerifyPinJob(Job):
-    pin_verified = Signal(bool)
+class SecretsJob(CoroutineJob):
+    """Base class for passwords jobs that are written as a sequence of steps."""
 
     # internal signals
     query_pin = Signal(int)
     choose_pin = Signal()
 
     def __init__(
-        self,
-        common_ui: CommonUi,
-        pin_cache: PinCache,
-        pin_ui: PinUi,
-        data: DeviceData,
-        set_pin: bool = False,
+        self, common_ui: CommonUi, pin_cache: PinCache, pin_ui: PinUi, data: DeviceData
     ) -> None:
         super().__init__(common_ui)
 
         self.pin_cache = pin_cache
+        self.pin_ui = pin_ui
         self.data = data
-        self.set_pin = set_pin
-
-        self.pin_verified.connect(lambda _: self.finished.emit())
 
         self.query_pin.connect(pin_ui.query)
         self.choose_pin.connect(pin_ui.choose)
 
-        self.pin_ui = pin_ui.connect_actions(
-            self.pin_queried, self.pin_chosen, lambda: self.pin_verified.emit(False)
-        )
+    def secrets(self, data: DeviceData | None = None) -> Steps[SecretsApp]:
+        device = yield from self.open(data or self.data)
+        if not isinstance(device, NK3):
+            raise JobError("This device does not support Passwords")
+        return SecretsApp(device)
 
-    def cleanup(self) -> None:
-        self.pin_ui.disconnect()
+    def prompt_pin(self, request: Callable[[], None]) -> Steps[str | None]:
+        result = yield from self.wait(
+            self.pin_ui.queried, self.pin_ui.chosen, self.pin_ui.cancelled, request=request
+        )
+        return result.args[0] if result.index < 2 else None
 
-    def run(self) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            select = secrets.select()
+    def verify_pin(self, set_pin: bool = False, data: DeviceData | None = None) -> Steps[bool]:
+        data = data or self.data
+        secrets = yield from self.secrets(data)
+        select = secrets.select()
 
         if select.pin_attempt_counter:
-            pin = self.pin_cache.get(self.data)
-            if pin:
-                self.pin_queried(pin)
-            else:
-                self.query_pin.emit(select.pin_attempt_counter)
-        elif self.set_pin:
-            self.choose_pin.emit()
+            pin = self.pin_cache.get(data)
+            if not pin:
+                attempts = select.pin_attempt_counter
+                pin = yield from self.prompt_pin(lambda: self.query_pin.emit(attempts))
+                if not pin:
+                    return False
+        elif set_pin:
+            pin = yield from self.prompt_pin(self.choose_pin.emit)
+            if not pin:
+                return False
+            secrets = yield from self.secrets(data)
+            with self.touch_prompt():
+                secrets.set_pin_raw(pin)
+            health_service.invalidate(data)
+            if not secrets.select().pin_attempt_counter:
+                raise JobError("Failed to set Secrets PIN")
         else:
-            self.pin_verified.emit(False)
+            return False
 
-    @Slot(str)
-    def pin_queried(self, pin: str) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            try:
-                with self.touch_prompt():
-                    secrets.verify_pin_raw(pin)
-                self.pin_cache.update(self.data, pin)
-                self.pin_verified.emit(True)
-            except SecretsAppException as e:
-                logger.warning(f"Secrets PIN verification failed: {e}")
-                self.pin_cache.clear()
-                # TODO: repeat on failure
-                self.trigger_error("Incorrect PIN. Please try again.")
-
-    @Slot(str)
-    def pin_chosen(self, pin: str) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
+        secrets = yield from self.secrets(data)
+        try:
             with self.touch_prompt():
-                secrets.set_pin_raw(pin)
-            select = secrets.select()
+                secrets.verify_pin_raw(pin)
+        except SecretsAppException as e:
+            logger.warning(f"Secrets PIN verification failed: {e}")
+            self.pin_cache.forget(data)
+            health_service.invalidate(data)
+            raise JobError("Incorrect PIN. Please try again.") from e
+        self.pin_cache.update(data, pin)
+        return True
+
+    def unlock(self, data: DeviceData | None = None) -> Steps[bool]:
+        """Verify the PIN, if one is set, to access the PIN protected credentials.
+
+        Unlike `verify_pin`, a failed verification, e.g. a wrong PIN, is only
+        shown to the user, so the job can continue with the unprotected
+        credentials.
+        """
+        try:
+            return (yield from self.verify_pin(data=data))
+        except JobError as e:
+            logger.error(f"{self.__class__.__name__}: {e}")
+            self.common_ui.info.error.emit(str(e))
+            return False
+
+    def list_credentials(self) -> Steps[list[Credential]]:
+        # also list the PIN-protected credentials if a PIN is set
+        yield from self.verify_pin()
+        secrets = yield from self.secrets()
+        return Credential.list(secrets)
+
+    def register(self, secrets: SecretsApp, credential: Credential, secret: bytes) -> None:
+        if credential.uri:
+            secrets.register_uri(
+                uri=credential.uri,
+                touch_button_required=credential.touch_required,
+                pin_based_encryption=credential.protected,
+            )
+            return
 
-        if select.pin_attempt_counter:
-            self.pin_queried(pin)
-        else:
-            self.trigger_error("Failed to set Secrets PIN")
+        reg_data = {
+            "credid": credential.id,
+            "touch_button_required": credential.touch_required,
+            "pin_based_encryption": credential.protected,
+        }
+
+        if credential.other:
+            reg_data["secret"] = secret
+            reg_data["kind"] = credential.other.raw_kind()
+
+        if credential.otp:
+            reg_data["secret"] = secret
+            reg_data["kind"] = credential.otp.raw_kind()
 
-    @Slot(str)
-    def trigger_error(self, msg: str) -> None:
-        logger.error(f"{self.__class__.__name__} failed: {msg}")
-        self.common_ui.info.error.emit(msg)
-        self.pin_verified.emit(False)
+        if credential.login:
+            reg_data["login"] = credential.login
+        if credential.password:
+            reg_data["password"] = credential.password
+        if credential.comment:
+            reg_data["metadata"] = credential.comment
 
+        secrets.register(**reg_data)  # type: ignore [arg-type]
 
-class EditCredentialJob(Job):
+    def credential_touch(self, credential: Credential) -> AbstractContextManager[None]:
+        """Show the touch prompt while accessing `credential` if it requires a touch."""
+        return self.touch_prompt() if credential.touch_required else nullcontext()
+
+    def read_credential(self, secrets: SecretsApp, credential: Credential) -> Credential:
+        """Read the login, password and comment of a listed credential."""
+        with self.credential_touch(credential):
+            pse = secrets.get_credential(credential.id)
+        return credential.extend_with_password_safe_entry(pse)
+
+
+class EditCredentialJob(SecretsJob):
     credential_edited = Signal(Credential)
 
     def __init__(
@@ -184,149 +198,66 @@ class EditCredentialJob(Job):
         secret: bytes,
         old_cred_id: bytes,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.credential = credential
         self.secret = secret
         self.old_cred_id = old_cred_id
 
-        self.all_credentials: dict[bytes, Credential] | None = None
-
-        self.credential_edited.connect(lambda _: self.finished.emit())
-
-    def run(self) -> None:
-        list_credentials_job = ListCredentialsJob(
-            self.common_ui, self.pin_cache, self.pin_ui, self.data, pin_protected=True
-        )
-        list_credentials_job.credentials_listed.connect(self.check_credential)
-        self.spawn(list_credentials_job)
-
-    @Slot(list)
-    def check_credential(self, credentials: list[Credential]) -> None:
-        self.all_credentials = {cred.id: cred for cred in credentials}
-        # ids = set([credential.id for credential in credentials])
+    def steps(self) -> Steps[None]:
+        credentials = yield from self.list_credentials()
+        ids = {cred.id for cred in credentials}
 
-        if self.old_cred_id not in self.all_credentials:
-            self.trigger_error(f"A credential with the name {self.old_cred_id!r} does not exists.")
-            return
+        if self.old_cred_id not in ids:
+            raise JobError(f"A credential with the name {self.old_cred_id!r} does not exists.")
 
-        if self.credential.id != self.old_cred_id and self.credential.id in self.all_credentials:
-            self.trigger_error(f"A credential named '{self.credential.name}' already exists.")
-            return
+        if self.credential.id != self.old_cred_id and self.credential.id in ids:
+            raise JobError(f"A credential named '{self.credential.name}' already exists.")
 
         if self.credential.protected:
-            verify_pin_job = VerifyPinJob(
-                self.common_ui,
-                self.pin_cache,
-                self.pin_ui,
-                self.data,
-                set_pin=self.credential.protected,
-            )
-            verify_pin_job.pin_verified.connect(self.edit_credential)
-            self.spawn(verify_pin_job)
-        else:
-            self.edit_credential()
-
-    @Slot()
-    def edit_credential(self, successful: bool = True) -> None:
-        if not successful:
-            self.finished.emit()
-            return
-
-        # no new secret, new id
-        if not self.credential.new_secret:
-            # if pin-protected has changed
-            self.edit_credential_final()
-
-        else:
-            # new secret, new id -> create new, delete old
-            if self.old_cred_id != self.credential.id:
-                self.add_credential(self.credential, self.secret, self.old_cred_id)
+            if not (yield from self.verify_pin(set_pin=True)):
+                return
 
-            # new secret, same id -> rename old, create new, delete renamed-old
+        # all modifications are done in a single device session
+        secrets = yield from self.secrets()
+        with self.touch_prompt():
+            if not self.credential.new_secret:
+                self.update_credential(secrets)
+            elif self.old_cred_id != self.credential.id:
+                # new secret, new id -> create new, delete old
+                self.register(secrets, self.credential, self.secret)
+                secrets.delete(self.old_cred_id)
             else:
-                temp_cred_id = self.temp_rename_credential(self.old_cred_id)
-                self.add_credential(self.credential, self.secret, temp_cred_id)
-
-    def add_credential(self, cred: Credential, secret: bytes, then_delete_id: bytes) -> None:
-        add_job = AddCredentialJob(
-            self.common_ui, self.pin_cache, self.pin_ui, self.data, credential=cred, secret=secret
-        )
-        add_job.credential_added.connect(lambda cred: self.handle_created(cred, then_delete_id))
-        self.spawn(add_job)
+                # new secret, same id -> rename old, create new, delete renamed-old
+                temp_cred_id = b"__" + self.old_cred_id
+                while temp_cred_id in ids:
+                    temp_cred_id += b"_"
+                secrets.update_credential(cred_id=self.old_cred_id, new_name=temp_cred_id)
+                self.register(secrets, self.credential, self.secret)
+                secrets.delete(temp_cred_id)
 
-    def handle_created(self, credential: Credential, delete_id: bytes) -> None:
-        self.credential = credential
-        self.delete_credential(delete_id)
-
-    def delete_credential(self, cred_id: bytes) -> None:
-        cred = Credential(
-            id=cred_id,
-            protected=self.credential.protected,
-            touch_required=self.credential.touch_required,
-        )
-        del_job = DeleteCredentialJob(
-            self.common_ui, self.pin_cache, self.pin_ui, self.data, credential=cred
-        )
-        del_job.credential_deleted.connect(self.handle_deleted)
-        self.spawn(del_job)
-
-    @Slot(Credential)
-    def handle_deleted(self, credential: Credential) -> None:
-        # drop credential
         self.credential_edited.emit(self.credential)
 
-    def temp_rename_credential(self, from_cred_id: bytes) -> bytes:
-        new_cred_id = b"__" + from_cred_id
-        assert self.all_credentials
-        while new_cred_id in self.all_credentials.keys():
-            new_cred_id += b"_"
-
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                return from_cred_id
-            secrets = SecretsApp(device)
-            with self.touch_prompt():
-                secrets.update_credential(cred_id=from_cred_id, new_name=new_cred_id)
-
-        return new_cred_id
+    def update_credential(self, secrets: SecretsApp) -> None:
+        reg_data = {
+            "cred_id": self.old_cred_id,
+            "touch_button": self.credential.touch_required,
+            # pin_based_encryption=self.credential.protected,
+        }
+        if self.old_cred_id != self.credential.id:
+            reg_data["new_name"] = self.credential.id
 
-    @Slot()
-    def edit_credential_final(self) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            with self.touch_prompt():
-                reg_data = {
-                    "cred_id": self.old_cred_id,
-                    "touch_button": self.credential.touch_required,
-                    # pin_based_encryption=self.credential.protected,
-                }
-                if self.old_cred_id != self.credential.id:
-                    reg_data["new_name"] = self.credential.id
-
-                if self.credential.login:
-                    reg_data["login"] = self.credential.login
-                if self.credential.password:
-                    reg_data["password"] = self.credential.password
-                if self.credential.comment:
-                    reg_data["metadata"] = self.credential.comment
-
-                try:
-                    secrets.update_credential(**reg_data)  # type: ignore [arg-type]
-                except SecretsAppException as e:
-                    self.trigger_exception(e)
-                    return
+        if self.credential.login:
+            reg_data["login"] = self.credential.login
+        if self.credential.password:
+            reg_data["password"] = self.credential.password
+        if self.credential.comment:
+            reg_data["metadata"] = self.credential.comment
 
-        self.credential_edited.emit(self.credential)
+        secrets.update_credential(**reg_data)  # type: ignore [arg-type]
 
 
-class AddCredentialJob(Job):
+class AddCredentialJob(SecretsJob):
     credential_added = Signal(Credential)
 
     def __init__(
@@ -338,99 +269,28 @@ class AddCredentialJob(Job):
         credential: Credential,
         secret: bytes,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.credential = credential
         self.secret = secret
 
-        self.credential_added.connect(lambda _: self.finished.emit())
-
-    def run(self) -> None:
-        list_credentials_job = ListCredentialsJob(
-            self.common_ui, self.pin_cache, self.pin_ui, self.data, pin_protected=True
-        )
-        list_credentials_job.credentials_listed.connect(self.check_credential)
-        self.spawn(list_credentials_job)
-
-    @Slot(list)
-    def check_credential(self, credentials: list[Credential]) -> None:
-        ids = {credential.id for credential in credentials}
-        if self.credential.id in ids:
-            self.trigger_error(f"A credential with the name {self.credential.name} already exists.")
-        elif self.credential.protected:
-            verify_pin_job = VerifyPinJob(
-                self.common_ui,
-                self.pin_cache,
-                self.pin_ui,
-                self.data,
-                set_pin=self.credential.protected,
-            )
-            verify_pin_job.pin_verified.connect(self.add_credential)
-            self.spawn(verify_pin_job)
-        else:
-            self.add_credential(True)
-
-    @Slot(bool)
-    def add_credential(self, successful: bool = True) -> None:
-        if not successful:
-            self.finished.emit()
-            return
+    def steps(self) -> Steps[None]:
+        credentials = yield from self.list_credentials()
+        if self.credential.id in {credential.id for credential in credentials}:
+            raise JobError(f"A credential with the name {self.credential.name} already exists.")
 
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
+        if self.credential.protected:
+            if not (yield from self.verify_pin(set_pin=True)):
                 return
 
-            if self.credential.uri and self.credential.id:
-                self.trigger_error("Other fields must be empty if URI is used")
-
-            secrets = SecretsApp(device)
-            with self.touch_prompt():
-                if self.credential.uri:
-                    try:
-                        secrets.register_uri(
-                            uri=self.credential.uri,
-                            touch_button_required=self.credential.touch_required,
-                            pin_based_encryption=self.credential.protected,
-                        )
-                    except SecretsAppException as e:
-                        self.trigger_exception(e)
-                        return
-
-                else:
-                    reg_data = {
-                        "credid": self.credential.id,
-                        "touch_button_required": self.credential.touch_required,
-                        "pin_based_encryption": self.credential.protected,
-                    }
-
-                    if self.credential.other:
-                        reg_data["secret"] = self.secret
-                        reg_data["kind"] = self.credential.other.raw_kind()
-
-                    if self.credential.otp:
-                        reg_data["secret"] = self.secret
-                        reg_data["kind"] = self.credential.otp.raw_kind()
-
-                    if self.credential.login:
-                        reg_data["login"] = self.credential.login
-                    if self.credential.password:
-                        reg_data["password"] = self.credential.password
-                    if self.credential.comment:
-                        reg_data["metadata"] = self.credential.comment
-                    try:
-                        secrets.register(**reg_data)  # type: ignore [arg-type]
-                    except SecretsAppException as e:
-                        self.trigger_exception(e)
-                        return
+        secrets = yield from self.secrets()
+        with self.touch_prompt():
+            self.register(secrets, self.credential, self.secret)
 
         self.credential_added.emit(self.credential)
 
 
-class DeleteCredentialJob(Job):
+class DeleteCredentialJob(SecretsJob):
     credential_deleted = Signal(Credential)
 
     def __init__(
@@ -441,44 +301,25 @@ class DeleteCredentialJob(Job):
         data: DeviceData,
         credential: Credential,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.credential = credential
 
-        self.credential_deleted.connect(lambda _: self.finished.emit())
+    def steps(self) -> Steps[None]:
+        if self.credential.protected and not (yield from self.unlock()):
+            return
 
-    def run(self) -> None:
+        secrets = yield from self.secrets()
         with self.touch_prompt():
-            if self.credential.protected:
-                verify_pin_job = VerifyPinJob(
-                    self.common_ui, self.pin_cache, self.pin_ui, self.data
-                )
-                verify_pin_job.pin_verified.connect(self.delete_credential)
-                self.spawn(verify_pin_job)
-            else:
-                self.delete_credential()
+            secrets.delete(self.credential.id)
 
-    @Slot()
-    def delete_credential(self) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            try:
-                secrets.delete(self.credential.id)
-            except SecretsAppException as e:
-                self.trigger_exception(e)
-                return
+        self.credential_deleted.emit(self.credential)
 
-            self.credential_deleted.emit(self.credential)
 
+class GenerateOtpJob(SecretsJob):
+    """Calculate an OTP, for TOTP credentials for the period containing `at`."""
 
-class GenerateOtpJob(Job):
-    # TODO: make period and digits configurable
+    # TODO: make digits configurable
 
     otp_generated = Signal(OtpData)
 
@@ -489,57 +330,41 @@ class GenerateOtpJob(Job):
         pin_ui: PinUi,
         data: DeviceData,
         credential: Credential,
+        period: int = TOTP_PERIOD,
+        at: datetime | None = None,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.credential = credential
-
-        self.otp_generated.connect(lambda _: self.finished.emit())
-
-    def run(self) -> None:
-        if self.credential.protected:
-            verify_pin_job = VerifyPinJob(self.common_ui, self.pin_cache, self.pin_ui, self.data)
-            verify_pin_job.pin_verified.connect(self.generate_otp)
-            self.spawn(verify_pin_job)
+        self.period = period
+        self.at = at
+
+    def steps(self) -> Steps[None]:
+        challenge = None
+        validity = None
+        if self.credential.otp == OtpKind.HOTP:
+            pass
+        elif self.credential.otp == OtpKind.TOTP:
+            period = self.period
+            timestamp = int((self.at or datetime.now()).timestamp())
+            challenge = timestamp // period
+            valid_from = datetime.fromtimestamp(challenge * period)
+            valid_until = datetime.fromtimestamp((challenge + 1) * period)
+            validity = (valid_from, valid_until)
         else:
-            self.generate_otp()
-
-    @Slot()
-    def generate_otp(self) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
+            raise RuntimeError(f"Unexpected OTP kind: {self.credential.otp}")
 
-            challenge = None
-            validity = None
-            if self.credential.otp == OtpKind.HOTP:
-                pass
-            elif self.credential.otp == OtpKind.TOTP:
-                period = 30
-                now = int(datetime.now().timestamp())
-                challenge = now // period
-                valid_from = datetime.fromtimestamp(challenge * period)
-                valid_until = datetime.fromtimestamp((challenge + 1) * period)
-                validity = (valid_from, valid_until)
-            else:
-                self.trigger_exception(RuntimeError(f"Unexpected OTP kind: {self.credential.otp}"))
+        if self.credential.protected and not (yield from self.unlock()):
+            return
 
-            try:
-                with self.touch_prompt():
-                    otp = secrets.calculate(self.credential.id, challenge).decode()
-            except SecretsAppException as e:
-                self.trigger_exception(e)
-                return
+        secrets = yield from self.secrets()
+        with self.touch_prompt():
+            otp = secrets.calculate(self.credential.id, challenge).decode()
 
-            self.otp_generated.emit(OtpData(otp, validity))
+        self.otp_generated.emit(OtpData(otp, validity))
 
 
-class ListCredentialsJob(Job):
+class ListCredentialsJob(SecretsJob):
     credentials_listed = Signal(list)
     uncheck_checkbox = Signal(bool)
 
@@ -551,47 +376,19 @@ class ListCredentialsJob(Job):
         data: DeviceData,
         pin_protected: bool,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.pin_protected = pin_protected
 
-        self.credentials_listed.connect(lambda _: self.finished.emit())
-
-    def run(self) -> None:
-        if self.pin_protected:
-            verify_pin_job = VerifyPinJob(self.common_ui, self.pin_cache, self.pin_ui, self.data)
-            verify_pin_job.pin_verified.connect(self.list_protected_credentials)
-            self.spawn(verify_pin_job)
-        else:
-            with self.data.open() as device:
-                if not isinstance(device, NK3):
-                    self.trigger_error("This device does not support Passwords")
-                    return
-                secrets = SecretsApp(device)
-                credentials = Credential.list(secrets)
-            self.credentials_listed.emit(credentials)
-
-    @Slot(bool)
-    def list_protected_credentials(self, successful: bool) -> None:
-        credentials = []
-        if not successful:
+    def steps(self) -> Steps[None]:
+        if self.pin_protected and not (yield from self.unlock()):
             self.uncheck_checkbox.emit(True)
 
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            for credential in Credential.list(secrets):
-                credentials.append(credential)
-
-        self.credentials_listed.emit(credentials)
+        secrets = yield from self.secrets()
+        self.credentials_listed.emit(Credential.list(secrets))
 
 
-class GetCredentialJob(Job):
+class GetCredentialJob(SecretsJob):
     received_credential = Signal(Credential)
 
     def __init__(
@@ -602,41 +399,241 @@ class GetCredentialJob(Job):
         data: DeviceData,
         credential: Credential,
     ) -> None:
-        super().__init__(common_ui)
+        super().__init__(common_ui, pin_cache, pin_ui, data)
 
-        self.pin_cache = pin_cache
-        self.pin_ui = pin_ui
-        self.data = data
         self.credential = credential
 
-        self.received_credential.connect(lambda _: self.finished.emit())
+    def steps(self) -> Steps[None]:
+        if self.credential.protected and not (yield from self.unlock()):
+            return
 
-    def run(self) -> None:
-        with self.touch_prompt():
-            if self.credential.protected:
-                verify_pin_job = VerifyPinJob(
-                    self.common_ui, self.pin_cache, self.pin_ui, self.data
-                )
-                verify_pin_job.pin_verified.connect(self.get_credential)
-                self.spawn(verify_pin_job)
+        secrets = yield from self.secrets()
+        self.received_credential.emit(self.read_credential(secrets, self.credential))
+
+
+class ExportCredentialsJob(SecretsJob):
+    """Bulk counterpart to `GetCredentialJob`.
+
+    All credentials are read in a single device session and streamed into an
+    encrypted export file one by one. Without a `path` the job runs as a dry
+    run that only lists the credentials, without reading their secrets, and
+    reports how many credentials would be exported and a lower bound for the
+    size of the export.
+    """
+
+    credentials_exported = Signal(ExportSummary)
+
+    def __init__(
+        self,
+        common_ui: CommonUi,
+        pin_cache: PinCache,
+        pin_ui: PinUi,
+        data: DeviceData,
+        path: str | None = None,
+        passphrase: str | None = None,
+    ) -> None:
+        super().__init__(common_ui, pin_cache, pin_ui, data)
+
+        self.path = path
+        self.passphrase = passphrase
+
+    def steps(self) -> Steps[None]:
+        # PIN protected credentials are only exported if the PIN is available,
+        # a cancelled PIN query still exports all unprotected credentials
+        unlocked = yield from self.unlock()
+        secrets = yield from self.secrets()
+        credentials = Credential.list(secrets)
+        summary = ExportSummary(dry_run=self.path is None)
+
+        self.common_ui.progress.start.emit("Export")
+        try:
+            if self.path is None:
+                # logins, passwords and comments are not listed and not counted
+                summary.size = empty_export_size()
+                for credential in credentials:
+                    if self._exportable(credential, unlocked, summary):
+                        summary.size += encoded_size(credential)
+                        summary.exported += 1
             else:
-                self.get_credential()
+                self._write_export(self.path, secrets, credentials, unlocked, summary)
+        finally:
+            self.common_ui.progress.stop.emit()
 
-    @Slot()
-    def get_credential(self) -> None:
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
+        self.credentials_exported.emit(summary)
+
+    def _write_export(
+        self,
+        path: str,
+        secrets: SecretsApp,
+        credentials: list[Credential],
+        unlocked: bool,
+        summary: ExportSummary,
+    ) -> None:
+        assert self.passphrase
+        # only replace the target file once the export is complete
+        partial_path = path + ".part"
+        fd = os.open(partial_path, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f, ExportWriter(f, self.passphrase) as writer:
+                for credential in self._read_credentials(secrets, credentials, unlocked, summary):
+                    writer.write(credential)
+                    summary.exported += 1
+            summary.size = writer.size
+            os.replace(partial_path, path)
+        except BaseException:
             try:
-                pse = secrets.get_credential(self.credential.id)
-            except SecretsAppException as e:
-                self.trigger_exception(e)
-                return
+                os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+
+    def _read_credentials(
+        self,
+        secrets: SecretsApp,
+        credentials: list[Credential],
+        unlocked: bool,
+        summary: ExportSummary,
+    ) -> Iterator[Credential]:
+        for i, credential in enumerate(credentials):
+            self.common_ui.progress.progress.emit(i, len(credentials))
+            if self._exportable(credential, unlocked, summary):
+                yield self.read_credential(secrets, credential)
+        self.common_ui.progress.progress.emit(len(credentials), len(credentials))
+
+    def _exportable(self, credential: Credential, unlocked: bool, summary: ExportSummary) -> bool:
+        reason = skip_reason(credential, unlocked)
+        if reason:
+            summary.skipped.append((credential.name, reason))
+        return reason is None
+
+
+class ImportCredentialsJob(SecretsJob):
+    """Counterpart to `ExportCredentialsJob`.
+
+    The export file is decrypted and checked completely before the device is
+    accessed, so a truncated or corrupted file does not lead to a partial
+    import.  Credentials that already exist on the device are not overwritten.
+    """
+
+    credentials_imported = Signal(ImportSummary)
+
+    def __init__(
+        self,
+        common_ui: CommonUi,
+        pin_cache: PinCache,
+        pin_ui: PinUi,
+        data: DeviceData,
+        path: str,
+        passphrase: str,
+    ) -> None:
+        super().__init__(common_ui, pin_cache, pin_ui, data)
+
+        self.path = path
+        self.passphrase = passphrase
+
+    def steps(self) -> Steps[None]:
+        try:
+            with open(self.path, "rb") as f:
+                credentials = list(read_export(f, self.passphrase))
+        except (OSError, ExportFormatError) as e:
+            raise JobError(f"Failed to read {self.path}: {e}") from e
+
+        # PIN protected credentials can only be imported if the PIN is available
+        unlocked = yield from self.unlock()
+        secrets = yield from self.secrets()
+        existing = {credential.id for credential in Credential.list(secrets)}
+        summary = ImportSummary()
+
+        self.common_ui.progress.start.emit("Import")
+        try:
+            for i, credential in enumerate(credentials):
+                self.common_ui.progress.progress.emit(i, len(credentials))
+                reason = skip_reason(credential, unlocked)
+                if credential.id in existing:
+                    reason = "already exists on device"
+                if reason:
+                    summary.skipped.append((credential.name, reason))
+                    continue
+
+                with self.credential_touch(credential):
+                    self.register(secrets, credential, b"")
+                existing.add(credential.id)
+                summary.imported += 1
+            self.common_ui.progress.progress.emit(len(credentials), len(credentials))
+        finally:
+            self.common_ui.progress.stop.emit()
+
+        self.credentials_imported.emit(summary)
+
+
+class CloneCredentialsJob(SecretsJob):
+    """Copy all Passwords credentials from one device to another.
 
-            cred = self.credential.extend_with_password_safe_entry(pse)
-            self.received_credential.emit(cred)
+    Both devices are opened in one session, each credential is read from the
+    source and written to the target before the next one is read, so the
+    credential store is never buffered as a whole.  The same credentials as
+    for an export are skipped.
+    """
+
+    credentials_cloned = Signal(CloneSummary)
+
+    def __init__(
+        self,
+        common_ui: CommonUi,
+        pin_cache: PinCache,
+        pin_ui: PinUi,
+        source: DeviceData,
+        target: DeviceData,
+    ) -> None:
+        super().__init__(common_ui, pin_cache, pin_ui, source)
+
+        self.source = source
+        self.target = target
+
+    def steps(self) -> Steps[None]:
+        self.common_ui.info.info.emit(f"Unlocking the source device {self.source.name}")
+        source_unlocked = yield from self.unlock(self.source)
+        self.common_ui.info.info.emit(f"Unlocking the target device {self.target.name}")
+        target_unlocked = yield from self.unlock(self.target)
+        if source_unlocked:
+            # a query for the target PIN closes the source session, verify the cached PIN again
+            source_unlocked = yield from self.unlock(self.source)
+
+        target = yield from self.secrets(self.target)
+        existing = {credential.id for credential in Credential.list(target)}
+        source = yield from self.secrets(self.source)
+        credentials = Credential.list(source)
+
+        summary = CloneSummary()
+        start = monotonic()
+        self.common_ui.progress.start.emit("Clone")
+        try:
+            for i, credential in enumerate(credentials):
+                self.common_ui.progress.progress.emit(i, len(credentials))
+                reason = skip_reason(credential, source_unlocked)
+                if credential.id in existing:
+                    reason = "already exists on target"
+                elif reason is None and credential.protected and not target_unlocked:
+                    reason = "target PIN not available"
+                if reason:
+                    summary.skipped.append((credential.name, reason))
+                    continue
+
+                credential = self.read_credential(source, credential)
+                with self.credential_touch(credential):
+                    self.register(target, credential, b"")
+                summary.copied += 1
+            self.common_ui.progress.progress.emit(len(credentials), len(credentials))
+        finally:
+            self.common_ui.progress.stop.emit()
+
+        summary.duration = monotonic() - start
+        logger.info(
+            f"cloned {summary.copied} credential(s) from {self.source.name} to "
+            f"{self.target.name} in {summary.duration:.1f}s ({summary.throughput:.2f}/s), "
+            f"skipped {len(summary.skipped)}"
+        )
+        self.credentials_cloned.emit(summary)
 
 
 class SecretsWorker(Worker):
@@ -650,6 +647,9 @@ class SecretsWorker(Worker):
     device_checked = Signal(bool)
     otp_generated = Signal(OtpData)
     received_credential = Signal(Credential)
+    credentials_exported = Signal(ExportSummary)
+    credentials_imported = Signal(ImportSummary)
+    credentials_cloned = Signal(CloneSummary)
 
     def __init__(self, common_ui: CommonUi, app_widget: QWidget) -> None:
         super().__init__(common_ui)
@@ -677,9 +677,20 @@ class SecretsWorker(Worker):
         job.credential_deleted.connect(self.credential_deleted)
         self.run(job)
 
-    @Slot(DeviceData, Credential)
-    def generate_otp(self, data: DeviceData, credential: Credential) -> None:
-        job = GenerateOtpJob(self.common_ui, self.pin_cache, self.pin_ui, data, credential)
+    @Slot(DeviceData, Credential, int, float)
+    def generate_otp(
+        self, data: DeviceData, credential: Credential, period: int, at: float
+    ) -> None:
+        """Generate an OTP, for TOTP credentials valid at the timestamp `at` or now if 0."""
+        job = GenerateOtpJob(
+            self.common_ui,
+            self.pin_cache,
+            self.pin_ui,
+            data,
+            credential,
+            period,
+            datetime.fromtimestamp(at) if at else None,
+        )
         job.otp_generated.connect(self.otp_generated)
         self.run(job)
 
@@ -705,3 +716,31 @@ class SecretsWorker(Worker):
         )
         job.credential_edited.connect(self.credential_edited)
         self.run(job)
+
+    @Slot(DeviceData, str, str)
+    def export_credentials(self, data: DeviceData, path: str, passphrase: str) -> None:
+        job = ExportCredentialsJob(
+            self.common_ui, self.pin_cache, self.pin_ui, data, path, passphrase
+        )
+        job.credentials_exported.connect(self.credentials_exported)
+        self.run(job)
+
+    @Slot(DeviceData)
+    def export_dry_run(self, data: DeviceData) -> None:
+        job = ExportCredentialsJob(self.common_ui, self.pin_cache, self.pin_ui, data)
+        job.credentials_exported.connect(self.credentials_exported)
+        self.run(job)
+
+    @Slot(DeviceData, str, str)
+    def import_credentials(self, data: DeviceData, path: str, passphrase: str) -> None:
+        job = ImportCredentialsJob(
+            self.common_ui, self.pin_cache, self.pin_ui, data, path, passphrase
+        )
+        job.credentials_imported.connect(self.credentials_imported)
+        self.run(job)
+
+    @Slot(DeviceData, DeviceData)
+    def clone_credentials(self, source: DeviceData, target: DeviceData) -> None:
+        job = CloneCredentialsJob(self.common_ui, self.pin_cache, self.pin_ui, source, target)
+        job.credentials_cloned.connect(self.credentials_cloned)
+        self.run(job)
@@ -8,6 +8,7 @@ from PySide6.QtCore import Signal, Slot
 
 from nitrokeyapp.common_ui import CommonUi
 from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_health import health_service
 from nitrokeyapp.worker import Job, Worker
 
 logger = logging.getLogger(__name__)
@@ -24,17 +25,12 @@ class CheckFidoPinStatus(Job):
         self.status_fido.connect(lambda _a, _b: self.finished.emit())
 
     def run(self) -> None:
-        # pin_status: bool = False
-        with self.data.open_ctap2() as ctap2:
-            # pin_status = ctap2.info.options["clientPin"]
-
-            c_pin = ClientPin(ctap2)
-            try:
-                pin_retries = c_pin.get_pin_retries()[0]
-            except Exception:
-                pin_retries = -1
-
-            self.status_fido.emit(ctap2.info, pin_retries)
+        health = health_service.get(self.data)
+        if health.fido2_info is None:
+            self.trigger_error("Failed to query the FIDO2 status")
+            return
+        pin_retries = health.fido2_pin_retries
+        self.status_fido.emit(health.fido2_info, -1 if pin_retries is None else pin_retries)
 
 
 class CheckPasswordsInfo(Job):
@@ -48,19 +44,11 @@ class CheckPasswordsInfo(Job):
         self.info_passwords.connect(lambda _: self.finished.emit())
 
     def run(self) -> None:
-        pin_status: bool = False
-        with self.data.open() as device:
-            if not isinstance(device, NK3):
-                self.trigger_error("This device does not support Passwords")
-                return
-            secrets = SecretsApp(device)
-            status = secrets.select()
-            if status.pin_attempt_counter is not None:
-                pin_status = True
-            else:
-                pin_status = False
-            self.info_passwords.emit(pin_status, status)
-        return
+        health = health_service.get(self.data)
+        if health.secrets is None:
+            self.trigger_error("This device does not support Passwords")
+            return
+        self.info_passwords.emit(health.secrets_pin_set, health.secrets)
 
 
 class SaveFidoPinJob(Job):
@@ -94,6 +82,9 @@ class SaveFidoPinJob(Job):
                     self.common_ui.info.info.emit("FIDO2 PIN changed!")
             except Exception as e:
                 self.trigger_error(f"fido2 change_pin failed: {e}")
+        # the clientPin option changes if the PIN was set
+        self.data.invalidate_ctap2_info()
+        health_service.invalidate(self.data)
         self.change_pw_fido.emit()
 
 
@@ -139,6 +130,7 @@ class SavePasswordsPinJob(Job):
                     except SecretsAppException as e:
                         self.trigger_error(f"PIN validation failed: {e}")
 
+        health_service.invalidate(self.data)
         self.change_pw_passwords.emit()
 
     @Slot(str)
@@ -171,6 +163,8 @@ class ResetFido(Job):
                     )
                 else:
                     self.trigger_error(f"fido2 reset failed: {e}")
+        self.data.invalidate_ctap2_info()
+        health_service.invalidate(self.data)
         self.reset_fido.emit()
 
 
@@ -196,6 +190,7 @@ class ResetPasswords(Job):
                     self.common_ui.info.info.emit("PASSWORDS function reset successfully!")
             except SecretsAppException as e:
                 self.trigger_error(f"Passwords reset failed: {e}")
+        health_service.invalidate(self.data)
         self.reset_passwords.emit()
 
 
@@ -1,17 +1,35 @@
 import logging
 from collections.abc import Callable, Iterator
-from contextlib import contextmanager
+from contextlib import AbstractContextManager, contextmanager, nullcontext
 from dataclasses import dataclass
 from enum import Enum
+from io import BytesIO
 from time import sleep
 from typing import TYPE_CHECKING, Any, TypeVar
 
 from nitrokey import trussed
-from nitrokey.trussed import Model, TrussedBase, TrussedBootloader, TrussedDevice, Version
+from nitrokey.trussed import (
+    FirmwareContainer,
+    Model,
+    TrussedBase,
+    TrussedBootloader,
+    TrussedDevice,
+    Uuid,
+    Version,
+)
 from nitrokey.trussed.admin_app import InitStatus
-from nitrokey.trussed.updates import DeviceHandler, Updater, UpdateUi, Warning
+from nitrokey.trussed.updates import (
+    DeviceHandler,
+    Updater,
+    UpdateUi,
+    Warning,
+    get_firmware_repository,
+    get_firmware_update,
+)
 from PySide6.QtCore import QCoreApplication
 
+from nitrokeyapp.firmware_cache import FirmwareImage, get_firmware_cache, is_offline
+
 if TYPE_CHECKING:
     from nitrokeyapp.common_ui import CommonUi
 
@@ -24,6 +42,8 @@ class UpdateStatus(Enum):
     SUCCESS = "success"
     ERROR = "error"
     ABORTED = "aborted"
+    # the device already runs the firmware, nothing was flashed
+    SKIPPED = "skipped"
 
 
 @dataclass
@@ -50,6 +70,8 @@ class UpdateGUI(UpdateUi):
 
         # blocking wait, set by parent during confirm-prompt
         self.await_confirmation: bool | None = None
+        # confirmed before the download, so the Updater does not ask again
+        self.confirmed_same_version: Version | None = None
 
     def error(self, *msgs: Any) -> Exception:
         logger.error(f"Error during firmware update: {msgs}")
@@ -126,6 +148,8 @@ class UpdateGUI(UpdateUi):
         self.common_ui.info.info.emit("Device is in bootloader mode")
 
     def confirm_update_same_version(self, version: Version) -> None:
+        if version == self.confirmed_same_version:
+            return
         res = self.run_confirm_dialog(
             f"{self.model} Firmware Update",
             "The version of the firmware image is the same as on the device."
@@ -136,6 +160,7 @@ class UpdateGUI(UpdateUi):
             raise self.abort("canceled by user (confirm same version)")
 
         logger.info("OK clicked (confirm same version)")
+        self.confirmed_same_version = version
 
     def confirm_extra_information(self, txt: list[str]) -> None:
         if len(txt) == 0:
@@ -166,27 +191,159 @@ class UpdateGUI(UpdateUi):
     @contextmanager
     def update_progress_bar(self) -> Iterator[Callable[[int, int], None]]:
         self.common_ui.touch.stop.emit()
-        self.common_ui.progress.start.emit("Update")
-        yield self.common_ui.progress.progress.emit
+        with self.common_ui.progress.throttled("Update", unit="B") as progress:
+            yield progress
 
     @contextmanager
     def download_progress_bar(self, desc: str) -> Iterator[Callable[[int, int], None]]:
-        self.common_ui.progress.start.emit("Download")
-        yield self.common_ui.progress.progress.emit
+        with self.common_ui.progress.throttled("Download", unit="B") as progress:
+            yield progress
 
     @contextmanager
     def finalization_progress_bar(self) -> Iterator[Callable[[int, int], None]]:
-        self.common_ui.progress.start.emit("Finalization")
-        yield self.common_ui.progress.progress.emit
+        with self.common_ui.progress.throttled("Finalization") as progress:
+            yield progress
+
+
+class QueuedUpdateGUI(UpdateGUI):
+    """`UpdateGUI` for updating several devices one after another.
+
+    The download and the update are confirmed once for the whole queue, so
+    only the touch confirmation is left for every single device.
+    """
+
+    def confirm_download(self, current: Version | None, new: Version) -> None:
+        pass
+
+    def confirm_update(self, current: Version | None, new: Version) -> None:
+        self.common_ui.touch.start.emit()
+
+    def confirm_queue(self, count: int) -> None:
+        msg = (
+            f"Please do not remove any of the {count} devices or insert any other "
+            "devices during the update. Doing so may damage them. Each device has "
+            "to be confirmed by touching it when it starts blinking."
+        )
+        if self.is_qubesos:
+            msg += (
+                "\n\nQubesOS is detected!\n\nEvery device is loaded into the bootloader "
+                "and must then be reattached to the current Qube."
+            )
+        res = self.run_confirm_dialog(
+            "Firmware Update", msg + "\n\nDo you want to update all devices now?"
+        )
+        if not res:
+            logger.info("Cancel clicked (confirm queue)")
+            raise self.abort("canceled by user (confirm queue)")
+
+        logger.info("OK clicked (confirm queue)")
+
+
+def validate_version(ui: UpdateGUI, current: Version | None, new: Version) -> None:
+    """Abort downgrades and confirm updates to the same version, like the Updater."""
+    if current is None:
+        return
+    if current.core() > new.core():
+        raise ui.abort_downgrade(current, new)
+    if current == new:
+        ui.confirm_update_same_version(
+            current if current.complete and new.complete else current.core()
+        )
+
+
+def fetch_firmware(ui: UpdateGUI, model: Model, current: Version | None = None) -> FirmwareImage:
+    """Get the latest firmware container for `model`, downloading it if needed.
+
+    Downloaded containers are verified and added to the firmware cache, so
+    that further updates to the same release do not download it again. In
+    offline mode, the most recent cached container is used.
+
+    If the `current` version of the device is known, the latest release is
+    checked against it before anything is downloaded.
+    """
+    cache = get_firmware_cache()
+
+    if is_offline():
+        try:
+            image = cache.latest(model)
+        except OSError as e:
+            raise ui.error("Failed to access the firmware cache", e) from e
+        if image is None:
+            raise ui.error(f"Offline mode is enabled, but no {model} firmware is cached")
+        logger.info(f"Offline mode: using cached {model} firmware {image.version}")
+        return image
+
+    try:
+        release = get_firmware_repository(model).get_latest_release()
+        version = Version.from_v_str(release.tag)
+    except Exception as e:
+        raise ui.error(f"Failed to find latest {model} firmware release", e) from e
+
+    validate_version(ui, current, version)
+
+    try:
+        image = cache.get(model, version)
+    except OSError as e:
+        logger.warning(f"Failed to access the firmware cache: {e}")
+        image = None
+    if image:
+        return image
+
+    try:
+        asset = get_firmware_update(model, release)
+    except Exception as e:
+        raise ui.error(f"Failed to find firmware image for release {release}", e) from e
+
+    ui.confirm_download(current, version)
+    try:
+        with ui.download_progress_bar(asset.tag) as callback:
+            data = asset.read(callback=callback)
+    except Exception as e:
+        raise ui.error(f"Failed to download firmware update {asset.tag}", e) from e
+
+    try:
+        container = FirmwareContainer.parse(BytesIO(data), model)
+    except Exception as e:
+        raise ui.error(f"Failed to parse firmware container for {asset.tag}", e) from e
+    if container.version != version:
+        raise ui.error(
+            f"The firmware container for {asset.tag} has the version {container.version}"
+        )
+
+    try:
+        return cache.add(model, version, data)
+    except OSError as e:
+        raise ui.error("Failed to store firmware in the cache", e) from e
 
 
 class UpdateContext(DeviceHandler):
-    def __init__(self, path: str, model: Model) -> None:
+    def __init__(
+        self,
+        path: str,
+        model: Model,
+        uuid: Uuid | None = None,
+        access: Callable[[], AbstractContextManager[None]] = nullcontext,
+    ) -> None:
         self.path = path
         self.model = model
-        logger.info(f"update for path: {path}, model: {model}")
+        # if set, only devices with this uuid are considered while waiting for
+        # the bootloader and the updated device, so that other devices can stay
+        # connected during the update
+        self.uuid = uuid
+        # held while the device is accessed, but not while the firmware is fetched
+        self.access = access
+        logger.info(f"update for path: {path}, model: {model}, uuid: {uuid}")
         self.updating = False
 
+    def _matches(self, device: TrussedBase) -> bool:
+        if self.uuid is None:
+            return True
+        try:
+            return device.uuid() == self.uuid
+        except Exception as e:
+            logger.debug(f"Failed to query uuid of {device}: {e}")
+            return False
+
     def connect(self) -> TrussedBase:
         device = trussed.open(path=self.path, model=self.model)
         # TODO: improve error handling
@@ -207,7 +364,9 @@ class UpdateContext(DeviceHandler):
             logger.debug(f"Searching {name} device ({t})")
             try:
                 devices = [
-                    device for device in trussed.list(model=self.model) if isinstance(device, ty)
+                    device
+                    for device in trussed.list(model=self.model)
+                    if isinstance(device, ty) and self._matches(device)
                 ]
             except Exception:
                 # have to catch this, to avoid early exception-raise-out
@@ -240,9 +399,13 @@ class UpdateContext(DeviceHandler):
         # mypy does not allow abstract types here, but this is still valid
         return self._await(f"{self.model} bootloader", TrussedBootloader, 90, None)  # type: ignore[type-abstract]
 
-    def update(self, ui: UpdateGUI, image: str | None = None) -> UpdateResult:
+    def update(
+        self, ui: UpdateGUI, image: str | None = None, current: Version | None = None
+    ) -> UpdateResult:
         try:
-            with self.connect() as device:
+            if image is None:
+                image = fetch_firmware(ui, self.model, current).path
+            with self.access(), self.connect() as device:
                 updater = Updater(ui, self)
                 _, status = updater.update(device=device, image=image, update_version=None)
         except UpdateException as e:
@@ -0,0 +1,168 @@
+"""Watchdog for stalls of the GUI event loop.
+
+A background thread posts a heartbeat event to the GUI thread.  If the event
+is not delivered within the threshold, the event loop is blocked and the
+watchdog captures the stack of the GUI thread, including the slot or event
+handler that was called by Qt and has not returned yet.  The stalls are kept
+in a ring buffer that can be exported from the Welcome tab.
+
+The watchdog is disabled by default.  It is enabled with this environment
+variable:
+
+- NKAPP_WATCHDOG: stall threshold in milliseconds, or any other non-empty
+  value for the default threshold
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import monotonic
+
+from PySide6.QtCore import QCoreApplication, QEvent, QObject
+
+from nitrokeyapp import diagnostics
+
+NKAPP_WATCHDOG = "NKAPP_WATCHDOG"
+
+DEFAULT_THRESHOLD_MS = 500
+HEARTBEAT_INTERVAL = 0.1
+MAX_STALLS = 50
+
+logger = logging.getLogger(__name__)
+
+_HEARTBEAT_EVENT = QEvent.Type(QEvent.registerEventType())
+
+
+@dataclass
+class Stall:
+    started: datetime
+    # the outermost function called by the event loop, e.g. a slot
+    entry: str
+    stack: list[str] = field(default_factory=list)
+    # None while the stall is still ongoing
+    duration: float | None = None
+
+    def format(self) -> str:
+        duration = "ongoing" if self.duration is None else f"{self.duration * 1000:.0f} ms"
+        lines = [f"{self.started.isoformat()} stall of {duration} in {self.entry}"]
+        lines.extend(self.stack)
+        return "\n".join(lines)
+
+
+class _Heartbeat(QObject):
+    def __init__(self, watchdog: "StallWatchdog") -> None:
+        super().__init__()
+        self.watchdog = watchdog
+
+    def event(self, event: QEvent) -> bool:
+        if event.type() == _HEARTBEAT_EVENT:
+            self.watchdog._beat()
+            return True
+        return super().event(event)
+
+
+class StallWatchdog:
+    def __init__(self, threshold: float, max_stalls: int = MAX_STALLS) -> None:
+        self.threshold = threshold
+        self.stalls: deque[Stall] = deque(maxlen=max_stalls)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._heartbeat: _Heartbeat | None = None
+        self._gui_thread = threading.get_ident()
+        # number of stack frames below the event loop
+        self._loop_depth = 0
+        # time the pending heartbeat was posted
+        self._posted: float | None = None
+        self._stall: Stall | None = None
+
+    def start(self) -> None:
+        """Start watching, must be called from the function running the event loop."""
+        self._gui_thread = threading.get_ident()
+        # skip the frame of this method
+        self._loop_depth = len(traceback.extract_stack()) - 1
+        self._heartbeat = _Heartbeat(self)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, args=(self._heartbeat,), name="watchdog", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Watching the event loop for stalls of more than {self.threshold * 1000:.0f} ms"
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self) -> str:
+        with self._lock:
+            stalls = list(self.stalls)
+        if not stalls:
+            return "No stalls of the event loop recorded"
+        return "\n\n".join(stall.format() for stall in stalls)
+
+    def _watch(self, heartbeat: _Heartbeat) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            now = monotonic()
+            with self._lock:
+                if self._posted is None:
+                    self._posted = now
+                    post = True
+                else:
+                    post = False
+                    if self._stall is None and now - self._posted > self.threshold:
+                        self._stall = self._capture()
+                        self.stalls.append(self._stall)
+            if post:
+                QCoreApplication.postEvent(heartbeat, QEvent(_HEARTBEAT_EVENT))
+
+    def _beat(self) -> None:
+        now = monotonic()
+        with self._lock:
+            stall, self._stall = self._stall, None
+            if self._posted is not None and stall is not None:
+                stall.duration = now - self._posted
+            self._posted = None
+
+        if stall is not None and stall.duration is not None:
+            diagnostics.increment("watchdog.stalls")
+            diagnostics.observe("watchdog.stall", stall.duration)
+            logger.warning(
+                f"Event loop stalled for {stall.duration * 1000:.0f} ms in {stall.entry}"
+            )
+
+    def _capture(self) -> Stall:
+        frame = sys._current_frames().get(self._gui_thread)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        # the frames called from within the event loop
+        inner = stack[self._loop_depth :]
+        if inner:
+            entry = f"{inner[0].name} ({inner[0].filename}:{inner[0].lineno})"
+        else:
+            entry = "unknown"
+        return Stall(
+            datetime.now(), entry, [line.rstrip() for line in traceback.format_list(inner)]
+        )
+
+
+@functools.cache
+def get_watchdog() -> StallWatchdog | None:
+    value = os.environ.get(NKAPP_WATCHDOG)
+    if not value:
+        return None
+    threshold_ms = DEFAULT_THRESHOLD_MS
+    try:
+        threshold_ms = int(value)
+    except ValueError:
+        pass
+    return StallWatchdog(threshold_ms / 1000)
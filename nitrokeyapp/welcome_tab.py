@@ -1,13 +1,19 @@
+import logging
 import webbrowser
 
 from nitrokey.trussed import Version
 from nitrokey.updates import Repository
-from PySide6.QtCore import Slot
-from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Signal, Slot
+from PySide6.QtWidgets import QFileDialog, QWidget
 
 from nitrokeyapp import __version__
+from nitrokeyapp.log_viewer import LogViewer
 from nitrokeyapp.logger import save_log
+from nitrokeyapp.memory_profile import get_memory_profiler
 from nitrokeyapp.qt_utils_mix_in import QtUtilsMixIn
+from nitrokeyapp.watchdog import get_watchdog
+
+logger = logging.getLogger(__name__)
 
 REPOSITORY_OWNER = "Nitrokey"
 REPOSITORY_NAME = "nitrokey-app2"
@@ -15,16 +21,26 @@ REPOSITORY = Repository(owner=REPOSITORY_OWNER, name=REPOSITORY_NAME)
 
 
 class WelcomeTab(QtUtilsMixIn, QWidget):
+    fleet_view_requested = Signal()
+    memory_report_requested = Signal()
+
     def __init__(self, log_file: str, parent: QWidget | None = None) -> None:
         QWidget.__init__(self, parent)
         QtUtilsMixIn.__init__(self)
 
         self.log_file = log_file
+        self.log_viewer: LogViewer | None = None
 
         # self.ui === self -> this tricks mypy due to monkey-patching self
         self.ui = self.load_ui("welcome_tab.ui", self)
         self.refresh_icons()
+        self.ui.buttonShowLog.pressed.connect(self.show_log)
         self.ui.buttonSaveLog.pressed.connect(self.save_log)
+        self.ui.buttonFleetView.pressed.connect(self.fleet_view_requested)
+        self.ui.buttonSaveStalls.pressed.connect(self.save_stalls)
+        self.ui.buttonSaveStalls.setVisible(get_watchdog() is not None)
+        self.ui.buttonSaveMemoryReport.pressed.connect(self.memory_report_requested)
+        self.ui.buttonSaveMemoryReport.setVisible(get_memory_profiler() is not None)
         self.ui.VersionNr.setText(__version__)
         self.ui.CheckUpdate.pressed.connect(self.check_update)
 
@@ -50,6 +66,27 @@ class WelcomeTab(QtUtilsMixIn, QWidget):
         else:
             self.ui.CheckUpdate.setText("App is up to date")
 
+    @Slot()
+    def show_log(self) -> None:
+        if self.log_viewer is None:
+            self.log_viewer = LogViewer(self.log_file, self)
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+        self.log_viewer.activateWindow()
+
     @Slot()
     def save_log(self) -> None:
         save_log(self.log_file, self)
+
+    @Slot()
+    def save_stalls(self) -> None:
+        watchdog = get_watchdog()
+        if watchdog is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Stall Report")
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(watchdog.report() + "\n")
+            except OSError as e:
+                logger.error(f"failed to save the stall report: {e}")
@@ -1,10 +1,18 @@
 import logging
-from collections.abc import Generator
-from contextlib import contextmanager
+from abc import abstractmethod
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
 
-from PySide6.QtCore import QObject, Signal, Slot
+from nitrokey.trussed import TrussedDevice
+from PySide6.QtCore import QEvent, QObject, Signal, SignalInstance, Slot
 
+from nitrokeyapp import diagnostics
 from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_access import AccessPriority
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.logger import JobContext, job_context
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +20,8 @@ logger = logging.getLogger(__name__)
 # - connection management
 # - handling unexpected errors
 
+T = TypeVar("T")
+
 
 class Job(QObject):
     finished = Signal()
@@ -21,12 +31,26 @@ class Job(QObject):
         super().__init__()
 
         self.common_ui = common_ui
+        # set by `Worker.run`
+        self.log_context: JobContext | None = None
+        # spawned jobs that have not finished yet
+        self._spawned: set[Job] = set()
 
         self.finished.connect(self.cleanup)
 
     def run(self) -> None:
         pass
 
+    def event(self, event: QEvent) -> bool:
+        # queued slot calls are delivered as events, attribute them to the job
+        with self.log_scope():
+            return super().event(event)
+
+    def log_scope(self) -> AbstractContextManager[None]:
+        if self.log_context is None:
+            return nullcontext()
+        return job_context(self.log_context)
+
     @Slot()
     def cleanup(self) -> None:
         pass
@@ -46,6 +70,9 @@ class Job(QObject):
         self.finished.emit()
 
     def spawn(self, job: "Job") -> None:
+        # keep the job alive while it waits, e.g. for a PIN
+        self._spawned.add(job)
+        job.finished.connect(lambda: self._spawned.discard(job))
         job.failed.connect(self.propagate_failure)
         job.run()
 
@@ -63,6 +90,201 @@ class Job(QObject):
             self.common_ui.touch.stop.emit()
 
 
+class JobError(Exception):
+    """Raised by the steps of a `CoroutineJob` to fail with a message for the user."""
+
+
+class JobCancelled(Exception):
+    """Raised into the steps of a `CoroutineJob` when the job is cancelled."""
+
+
+@dataclass
+class OpenDevice:
+    data: DeviceData
+    priority: AccessPriority = AccessPriority.Interactive
+
+
+@dataclass
+class WaitSignal:
+    signals: tuple[SignalInstance, ...]
+    request: Callable[[], None] | None = None
+
+
+@dataclass
+class SignalResult:
+    index: int
+    args: tuple[Any, ...] = field(default_factory=tuple)
+
+
+Step = OpenDevice | WaitSignal
+Steps = Generator[Step, Any, T]
+
+
+class _SignalRelay(QObject):
+    """Forwards a signal to the waiting `CoroutineJob`.
+
+    The relay lives in the thread of the job, so signals emitted in other
+    threads, e.g. by dialogs in the GUI thread, are queued to the job.
+    """
+
+    def __init__(self, job: "CoroutineJob", signal: SignalInstance, index: int) -> None:
+        super().__init__()
+        self.job = job
+        self.signal = signal
+        self.index = index
+        self.active = True
+
+        signal.connect(self.received)
+
+    def received(self, *args: Any) -> None:
+        if self.active:
+            self.job._signal_received(SignalResult(self.index, args))
+
+    def detach(self) -> None:
+        self.active = False
+        self.signal.disconnect(self.received)
+        self.deleteLater()
+
+
+class CoroutineJob(Job):
+    """Job written as a generator of steps instead of a chain of slots.
+
+    Subclasses implement `steps`, which runs in the worker thread and yields
+    whenever it needs something from outside:
+
+    - `yield from self.open(data)` returns the opened device.  Devices stay
+      open until the job waits for a signal or ends, so consecutive device
+      operations share one session instead of reopening the device.
+    - `yield from self.wait(signal, ...)` suspends the job without blocking
+      the worker thread until one of the signals is emitted, e.g. the answer
+      to a prompt, and returns a `SignalResult`.
+
+    `cancel` raises `JobCancelled` into the steps at the next suspension
+    point, so `finally` blocks and context managers are run.  Raising
+    `JobError` fails the job with a message for the user.  `finished` is
+    emitted exactly once when the steps are done.
+    """
+
+    def __init__(self, common_ui: CommonUi) -> None:
+        # QObject subclasses cannot use ABCMeta, so the abstract method is checked here
+        if getattr(type(self).steps, "__isabstractmethod__", False):
+            raise TypeError(f"Can't instantiate abstract class {self.__class__.__name__}: steps")
+
+        super().__init__(common_ui)
+
+        self._steps: Steps[None] | None = None
+        self._session = ExitStack()
+        self._devices: dict[str, TrussedDevice] = {}
+        self._relays: list[_SignalRelay] = []
+        self._cancel_pending = False
+        self._done = False
+
+    @abstractmethod
+    def steps(self) -> Steps[None]: ...
+
+    def run(self) -> None:
+        self._steps = self.steps()
+        self._resume()
+
+    @property
+    def waiting(self) -> bool:
+        return bool(self._relays)
+
+    @Slot()
+    def cancel(self) -> None:
+        if self._done or self._steps is None:
+            return
+        logger.info(f"Cancelling {self.__class__.__name__}")
+        if self.waiting:
+            self._resume(exc=JobCancelled())
+        else:
+            self._cancel_pending = True
+
+    def open(
+        self, data: DeviceData, priority: AccessPriority = AccessPriority.Interactive
+    ) -> Steps[TrussedDevice]:
+        return (yield OpenDevice(data, priority))
+
+    def wait(
+        self, *signals: SignalInstance, request: Callable[[], None] | None = None
+    ) -> Steps[SignalResult]:
+        """Wait for one of `signals`.
+
+        `request` is called once the job listens for the signals, e.g. to
+        open a dialog whose answer is awaited.
+        """
+        return (yield WaitSignal(signals, request))
+
+    def _resume(self, value: Any = None, exc: BaseException | None = None) -> None:
+        assert self._steps is not None
+        self._disarm()
+        try:
+            while True:
+                if exc is None and self._cancel_pending:
+                    self._cancel_pending = False
+                    exc = JobCancelled()
+                if exc is not None:
+                    step = self._steps.throw(exc)
+                else:
+                    step = self._steps.send(value)
+                value, exc = None, None
+
+                if isinstance(step, OpenDevice):
+                    try:
+                        value = self._open_device(step)
+                    except Exception as e:
+                        exc = e
+                    continue
+
+                self._close_session()
+                self._arm(step)
+                return
+        except StopIteration:
+            self._finish()
+            self.finished.emit()
+        except JobCancelled:
+            logger.info(f"{self.__class__.__name__} cancelled")
+            self._finish()
+            self.finished.emit()
+        except JobError as e:
+            self._finish()
+            self.trigger_error(str(e))
+        except Exception as e:
+            self._finish()
+            self.trigger_exception(e)
+
+    def _finish(self) -> None:
+        self._close_session()
+        self._done = True
+
+    def _open_device(self, step: OpenDevice) -> TrussedDevice:
+        key = step.data.access_key
+        if key not in self._devices:
+            self._devices[key] = self._session.enter_context(step.data.open(step.priority))
+        return self._devices[key]
+
+    def _close_session(self) -> None:
+        self._devices = {}
+        self._session.close()
+
+    def _arm(self, step: WaitSignal) -> None:
+        self._relays = [
+            _SignalRelay(self, signal, index) for index, signal in enumerate(step.signals)
+        ]
+        if step.request:
+            step.request()
+
+    def _disarm(self) -> None:
+        for relay in self._relays:
+            relay.detach()
+        self._relays = []
+
+    def _signal_received(self, result: SignalResult) -> None:
+        if self.waiting:
+            with self.log_scope():
+                self._resume(result)
+
+
 class Worker(QObject):
     # standard UI
     busy_state_changed = Signal(bool)
@@ -70,13 +292,67 @@ class Worker(QObject):
     def __init__(self, owner_common_ui: CommonUi) -> None:
         super().__init__()
         self.common_ui = owner_common_ui
+        self._coroutine_jobs: set[CoroutineJob] = set()
 
     def run(self, job: Job) -> None:
-        logger.info(f"{self.__class__.__name__} starting {job.__class__.__name__}")
+        data = getattr(job, "data", None)
+        context = JobContext(job.__class__.__name__)
+        if isinstance(data, DeviceData):
+            context.device = data.access_key
+            context.transport = data.transport
+        job.log_context = context
+
         self.busy_state_changed.emit(True)
 
+        job.failed.connect(lambda: setattr(context, "failed", True))
+        job.finished.connect(lambda: self._job_finished(context))
         job.finished.connect(lambda: self.busy_state_changed.emit(False))
-        try:
-            job.run()
-        except Exception as e:
-            job.trigger_exception(e)
+        if isinstance(job, CoroutineJob):
+            self._coroutine_jobs.add(job)
+            # finished may be emitted more than once, e.g. on an error path
+            job.finished.connect(lambda: self._coroutine_jobs.discard(job))
+        with job.log_scope():
+            logger.info(
+                f"{self.__class__.__name__} starting {job.__class__.__name__}",
+                extra={
+                    "event": {
+                        "event": "job_start",
+                        "job": context.job,
+                        "worker": self.__class__.__name__,
+                        "device": context.device,
+                        "transport": context.transport,
+                    }
+                },
+            )
+            try:
+                job.run()
+            except Exception as e:
+                job.trigger_exception(e)
+
+    def _job_finished(self, context: JobContext) -> None:
+        if context.done:
+            return
+        context.done = True
+
+        status = "failed" if context.failed else "finished"
+        duration_ms = context.duration_ms
+        diagnostics.observe(f"job.{context.job}", duration_ms / 1000)
+        logger.info(
+            f"{context.job} {status} after {duration_ms} ms, {context.opens} device opens",
+            extra={
+                "event": {
+                    "event": "job_fail" if context.failed else "job_finish",
+                    "job": context.job,
+                    "device": context.device,
+                    "transport": context.transport,
+                    "duration_ms": duration_ms,
+                    "device_opens": context.opens,
+                }
+            },
+        )
+
+    @Slot()
+    def cancel(self) -> None:
+        """Cancel all running `CoroutineJob`s of this worker."""
+        for job in list(self._coroutine_jobs):
+            job.cancel()
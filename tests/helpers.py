@@ -0,0 +1,205 @@
+import os
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+from unittest import mock
+
+from nitrokey.nk3.secrets_app import (
+    Algorithm,
+    Kind,
+    ListItem,
+    ListItemProperties,
+    PasswordSafeEntry,
+    SecretsAppException,
+    SelectResponse,
+)
+from nitrokey.trussed import Model, Uuid
+from PySide6.QtCore import QCoreApplication, SignalInstance
+from PySide6.QtWidgets import QApplication, QWidget
+
+from nitrokeyapp.device_access import AccessPriority
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.secrets_tab.ui import PinUi
+
+
+def qt_app() -> QCoreApplication:
+    """The application instance, created without a display if necessary."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance()
+    return app if app is not None else QApplication([])
+
+
+class FakeDeviceData(DeviceData):
+    """Device data without a device, `open` yields `device` and counts the sessions.
+
+    If `device` has a `close` method, it is called at the end of each session.
+    """
+
+    def __init__(self, path: str, uuid: Uuid | None = None, device: Any = None) -> None:
+        self.path = path
+        self.model = Model.NK3
+        self.updating = False
+        self._uuid = uuid
+        self._version = None
+        self._status = None
+        self._device = None  # type: ignore[assignment]
+
+        self.device = device
+        self.opened = 0
+        self.closed = 0
+
+    @property
+    def is_bootloader(self) -> bool:
+        return False
+
+    @property
+    def uuid(self) -> Uuid | None:
+        return self._uuid
+
+    @property
+    def uuid_prefix(self) -> str:
+        return str(self._uuid)[:5]
+
+    @contextmanager
+    def open(self, priority: AccessPriority = AccessPriority.Interactive) -> Iterator[Any]:
+        self.opened += 1
+        try:
+            yield self.device
+        finally:
+            self.closed += 1
+            close = getattr(self.device, "close", None)
+            if close is not None:
+                close()
+
+
+@dataclass
+class StoredCredential:
+    id: bytes
+    kind: Kind = Kind.NotSet
+    protected: bool = False
+    touch_required: bool = False
+    login: bytes | None = None
+    password: bytes | None = None
+    comment: bytes | None = None
+
+
+class FakeSecretsDevice:
+    """State of the Passwords app of a device, shared by its `FakeSecretsApp` sessions."""
+
+    def __init__(self, credentials: Iterable[StoredCredential] = (), pin: str | None = None):
+        self.credentials = {credential.id: credential for credential in credentials}
+        self.pin = pin
+        self.calls: list[str] = []
+        # the PIN stays verified until the session is closed
+        self.verified = False
+
+    def close(self) -> None:
+        self.verified = False
+
+
+class FakeSecretsApp:
+    """Replaces `SecretsApp`, the protected credentials are only visible after verifying the PIN."""
+
+    def __init__(self, device: FakeSecretsDevice) -> None:
+        self.device = device
+
+    def select(self) -> SelectResponse:
+        attempts = 8 if self.device.pin else None
+        return SelectResponse(None, attempts, None, None, None, None)
+
+    def verify_pin_raw(self, pin: str) -> None:
+        self.device.calls.append("verify")
+        if pin != self.device.pin:
+            raise SecretsAppException("6300", "VerificationFailed")
+        self.device.verified = True
+
+    def set_pin_raw(self, pin: str) -> None:
+        self.device.calls.append("set_pin")
+        self.device.pin = pin
+
+    def list_with_properties(self) -> list[ListItem]:
+        return [
+            ListItem(
+                credential.kind,
+                Algorithm.Sha1,
+                credential.id,
+                ListItemProperties(credential.touch_required, credential.protected, True),
+            )
+            for credential in self.device.credentials.values()
+            if self.device.verified or not credential.protected
+        ]
+
+    def _credential(self, cred_id: bytes) -> StoredCredential:
+        credential = self.device.credentials.get(cred_id)
+        if credential is None or (credential.protected and not self.device.verified):
+            raise SecretsAppException("6a82", "NotFound")
+        return credential
+
+    def get_credential(self, cred_id: bytes) -> PasswordSafeEntry:
+        self.device.calls.append(f"get {cred_id.decode()}")
+        credential = self._credential(cred_id)
+        return PasswordSafeEntry(credential.login, credential.password, credential.comment)
+
+    def register(
+        self,
+        credid: bytes,
+        secret: bytes = b"",
+        kind: Kind = Kind.NotSet,
+        touch_button_required: bool = False,
+        pin_based_encryption: bool = False,
+        login: bytes | None = None,
+        password: bytes | None = None,
+        metadata: bytes | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self.device.calls.append(f"register {credid.decode()}")
+        if pin_based_encryption and not self.device.verified:
+            raise SecretsAppException("6982", "SecurityStatusNotSatisfied")
+        self.device.credentials[credid] = StoredCredential(
+            credid, kind, pin_based_encryption, touch_button_required, login, password, metadata
+        )
+
+    def delete(self, cred_id: bytes) -> None:
+        self.device.calls.append(f"delete {cred_id.decode()}")
+        self._credential(cred_id)
+        del self.device.credentials[cred_id]
+
+    def calculate(self, cred_id: bytes, challenge: int | None = None) -> bytes:
+        self.device.calls.append(f"calculate {cred_id.decode()} {challenge}")
+        self._credential(cred_id)
+        return b"123456"
+
+
+@contextmanager
+def fake_secrets_app() -> Iterator[None]:
+    """Run the Passwords jobs against `FakeSecretsDevice`s instead of devices."""
+    with (
+        mock.patch("nitrokeyapp.secrets_tab.worker.SecretsApp", FakeSecretsApp),
+        mock.patch("nitrokeyapp.secrets_tab.worker.NK3", FakeSecretsDevice),
+    ):
+        yield
+
+
+class FakePinUi(PinUi):
+    """Answers the PIN queries with `pins`, None cancels a query."""
+
+    def __init__(self, *pins: str | None) -> None:
+        super().__init__(QWidget())
+        self.pins = list(pins)
+        self.queries = 0
+
+    def query(self, attempts: int) -> None:
+        self.queries += 1
+        self._answer(self.queried)
+
+    def choose(self) -> None:
+        self.queries += 1
+        self._answer(self.chosen)
+
+    def _answer(self, signal: SignalInstance) -> None:
+        pin = self.pins.pop(0)
+        if pin:
+            signal.emit(pin)
+        else:
+            self.cancelled.emit()
@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+from PySide6.QtCore import QCoreApplication
+
+from nitrokeyapp.batch import BatchOptions, BatchPrompts, BatchRunner, DeviceRun, Operation
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def operation(sequential: bool = False) -> Operation:
+    return Operation("test", mock.Mock(), sequential=sequential)
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.devices = [FakeDeviceData(f"/dev/hidraw{i}", Uuid(i + 1)) for i in range(3)]
+        app = QCoreApplication.instance()
+        assert app
+        self.app = app
+
+        patcher = mock.patch.object(DeviceRun, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def running(self, operation: Operation, options: BatchOptions) -> int:
+        runner = BatchRunner(self.app, self.devices, operation, options)
+        runner.start()
+        return len(runner.running)
+
+    def test_parallel_by_default(self) -> None:
+        self.assertEqual(self.running(operation(), BatchOptions()), 3)
+        self.assertEqual(self.running(operation(), BatchOptions(jobs=2)), 2)
+
+    def test_sequential_ignores_jobs(self) -> None:
+        self.assertEqual(self.running(operation(sequential=True), BatchOptions()), 1)
+        self.assertEqual(self.running(operation(sequential=True), BatchOptions(jobs=3)), 1)
+
+
+class BatchPromptsTest(unittest.TestCase):
+    def test_new_pin_is_separate(self) -> None:
+        prompts = BatchPrompts(BatchOptions(pin="123456", new_pin="654321"))
+
+        self.assertEqual(prompts.query_pin("NK3", 3), "123456")
+        self.assertEqual(prompts.choose_pin("NK3"), "654321")
+
+    def test_no_new_pin_without_option(self) -> None:
+        prompts = BatchPrompts(BatchOptions(pin="123456"))
+
+        self.assertIsNone(prompts.choose_pin("NK3"))
+
+    def test_confirm(self) -> None:
+        self.assertTrue(BatchPrompts(BatchOptions(assume_yes=True)).confirm("NK3", "t", "d"))
+        self.assertFalse(BatchPrompts(BatchOptions()).confirm("NK3", "t", "d"))
+
+
+if __name__ == "__main__":
+    unittest.main()
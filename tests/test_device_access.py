@@ -0,0 +1,142 @@
+import threading
+import unittest
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from time import monotonic, sleep
+from unittest import mock
+
+from nitrokey.trussed import Model, Version
+
+from nitrokeyapp.device_access import AccessPriority, DeviceAccessArbiter
+from nitrokeyapp.firmware_cache import FirmwareImage
+from nitrokeyapp.update import UpdateContext, UpdateStatus
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = monotonic() + timeout
+    while not condition():
+        if monotonic() > deadline:
+            raise AssertionError("timeout")
+        sleep(0.001)
+
+
+class DeviceAccessArbiterTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.arbiter = DeviceAccessArbiter()
+        self.events: list[str] = []
+        self.threads: list[threading.Thread] = []
+
+    def tearDown(self) -> None:
+        for thread in self.threads:
+            thread.join(2)
+
+    def spawn(self, target: Callable[[], None]) -> None:
+        thread = threading.Thread(target=target)
+        self.threads.append(thread)
+        thread.start()
+
+    def access(self, key: str, priority: AccessPriority, name: str) -> Callable[[], None]:
+        def run() -> None:
+            with self.arbiter.access(key, priority):
+                self.events.append(name)
+
+        return run
+
+    def test_reentrant(self) -> None:
+        with self.arbiter.access("a"):
+            with self.arbiter.access("a"):
+                pass
+            self.spawn(self.access("a", AccessPriority.Interactive, "other"))
+            wait_until(lambda: self.arbiter.queue_depth("a") == 1)
+            self.assertEqual(self.events, [])
+        self.threads[0].join(2)
+        self.assertEqual(self.events, ["other"])
+
+    def test_other_devices_are_independent(self) -> None:
+        with self.arbiter.access("a"):
+            self.spawn(self.access("b", AccessPriority.Interactive, "b"))
+            self.threads[0].join(2)
+            self.assertEqual(self.events, ["b"])
+
+    def test_interactive_before_background(self) -> None:
+        with self.arbiter.access("a"):
+            self.spawn(self.access("a", AccessPriority.Background, "background"))
+            wait_until(lambda: self.arbiter.queue_depth("a") == 1)
+            self.spawn(self.access("a", AccessPriority.Interactive, "interactive"))
+            wait_until(lambda: self.arbiter.queue_depth("a") == 2)
+        for thread in self.threads:
+            thread.join(2)
+        self.assertEqual(self.events, ["interactive", "background"])
+
+    def test_enumeration_waits_for_devices(self) -> None:
+        def enumerate() -> None:
+            with self.arbiter.enumeration():
+                self.events.append("enumerated")
+
+        with self.arbiter.access("a"):
+            self.spawn(enumerate)
+            sleep(0.05)
+            self.assertEqual(self.events, [])
+        self.threads[0].join(2)
+        self.assertEqual(self.events, ["enumerated"])
+
+    def test_access_waits_for_enumeration(self) -> None:
+        with self.arbiter.enumeration():
+            # the enumerating thread may still open the devices itself
+            with self.arbiter.access("a"):
+                pass
+            self.spawn(self.access("a", AccessPriority.Interactive, "accessed"))
+            wait_until(lambda: self.arbiter.queue_depth("a") == 1)
+            sleep(0.01)
+            self.assertEqual(self.events, [])
+        self.threads[0].join(2)
+        self.assertEqual(self.events, ["accessed"])
+
+    def test_release_by_other_thread(self) -> None:
+        errors: list[Exception] = []
+
+        def release() -> None:
+            try:
+                self.arbiter.release("a")
+            except RuntimeError as e:
+                errors.append(e)
+
+        with self.arbiter.access("a"):
+            self.spawn(release)
+            self.threads[0].join(2)
+        self.assertEqual(len(errors), 1)
+
+
+class UpdateContextTest(unittest.TestCase):
+    def test_firmware_is_fetched_without_device_access(self) -> None:
+        events: list[str] = []
+
+        @contextmanager
+        def access() -> Iterator[None]:
+            events.append("acquire")
+            try:
+                yield
+            finally:
+                events.append("release")
+
+        def fetch_firmware(*_args: object) -> FirmwareImage:
+            events.append("fetch")
+            return FirmwareImage(Model.NK3, Version(1, 8, 0), "/tmp/firmware.zip")
+
+        def connect() -> None:
+            events.append("connect")
+            raise RuntimeError("gone")
+
+        context = UpdateContext("/dev/hidraw0", Model.NK3, access=access)
+        with (
+            mock.patch("nitrokeyapp.update.fetch_firmware", fetch_firmware),
+            mock.patch.object(context, "connect", connect),
+        ):
+            result = context.update(mock.Mock())
+
+        self.assertEqual(result.status, UpdateStatus.ERROR)
+        self.assertEqual(events, ["fetch", "acquire", "connect", "release"])
+
+
+if __name__ == "__main__":
+    unittest.main()
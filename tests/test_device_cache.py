@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nitrokey.trussed import Model
+from nitrokey.trussed.admin_app import InitStatus
+
+from nitrokeyapp.device_cache import DeviceCache
+from nitrokeyapp.device_data import DeviceSnapshot
+
+
+def snapshot(uuid: str, version: str = "v1.8.0", **kwargs: bool) -> DeviceSnapshot:
+    return DeviceSnapshot(
+        key=uuid,
+        path=f"/dev/{uuid}",
+        model=Model.NK3,
+        name=f"Nitrokey 3: {uuid[:5]}",
+        is_bootloader=kwargs.get("is_bootloader", False),
+        is_too_old=False,
+        uuid=uuid,
+        version=version,
+        variant="LPC55",
+        init_status=InitStatus(0),
+        cached=kwargs.get("cached", False),
+    )
+
+
+class DeviceCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "cache" / "devices.json"
+
+    def test_round_trip(self) -> None:
+        DeviceCache(self.path).update([snapshot("AAAAAAA"), snapshot("BBBBBBB")])
+
+        cache = DeviceCache(self.path)
+        self.assertEqual([device.uuid for device in cache.connected()], ["AAAAAAA", "BBBBBBB"])
+        cached = cache.connected()[0].snapshot()
+        self.assertEqual(
+            cached,
+            DeviceSnapshot(
+                key="AAAAAAA",
+                path=None,
+                model=Model.NK3,
+                name="Nitrokey 3: AAAAA",
+                is_bootloader=False,
+                is_too_old=False,
+                uuid="AAAAAAA",
+                version="v1.8.0",
+                variant="LPC55",
+                init_status=InitStatus(0),
+                cached=True,
+            ),
+        )
+
+    def test_disconnected_devices_are_kept(self) -> None:
+        cache = DeviceCache(self.path)
+        cache.update([snapshot("AAAAAAA"), snapshot("BBBBBBB")])
+        cache.update([snapshot("BBBBBBB")])
+
+        self.assertEqual([device.uuid for device in cache.connected()], ["BBBBBBB"])
+        self.assertIsNotNone(cache.get("AAAAAAA"))
+
+    def test_cached_and_bootloader_snapshots_are_ignored(self) -> None:
+        cache = DeviceCache(self.path)
+        cache.update([snapshot("AAAAAAA", cached=True), snapshot("BBBBBBB", is_bootloader=True)])
+
+        self.assertIsNone(cache.get("AAAAAAA"))
+        self.assertIsNone(cache.get("BBBBBBB"))
+
+    def test_only_written_on_change(self) -> None:
+        cache = DeviceCache(self.path)
+        with mock.patch.object(cache, "_store", wraps=cache._store) as store:
+            cache.update([snapshot("AAAAAAA")])
+            cache.update([snapshot("AAAAAAA")])
+            self.assertEqual(store.call_count, 1)
+
+            cache.update([snapshot("AAAAAAA", version="v1.8.1")])
+            cache.update([])
+            self.assertEqual(store.call_count, 3)
+
+    def test_most_recent_devices_are_kept(self) -> None:
+        cache = DeviceCache(self.path, max_entries=2)
+        with mock.patch("nitrokeyapp.device_cache.time", side_effect=[1, 2, 3]):
+            for uuid in ["AAAAAAA", "BBBBBBB", "CCCCCCC"]:
+                cache.update([snapshot(uuid)])
+
+        self.assertIsNone(DeviceCache(self.path).get("AAAAAAA"))
+        self.assertIsNotNone(DeviceCache(self.path).get("CCCCCCC"))
+
+    def test_unreadable_cache_is_ignored(self) -> None:
+        self.path.parent.mkdir()
+        for content in ["{", '{"devices": [{"uuid": "A"}], "connected": []}']:
+            with self.subTest(content=content):
+                self.path.write_text(content)
+                with self.assertLogs("nitrokeyapp.device_cache", "WARNING"):
+                    cache = DeviceCache(self.path)
+                self.assertEqual(cache.connected(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
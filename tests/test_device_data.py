@@ -0,0 +1,191 @@
+import threading
+import unittest
+from collections.abc import Callable
+from typing import Any, TypeVar
+from unittest import mock
+
+from fido2.ctap2.base import Ctap2
+from fido2.hid import CAPABILITY
+from helpers import FakeDeviceData, qt_app
+from nitrokey.nk3 import NK3, NK3Bootloader
+from nitrokey.trussed import Model, Uuid, Version
+from nitrokey.trussed.admin_app import InitStatus, Status, Variant
+
+from nitrokeyapp import diagnostics
+from nitrokeyapp.device_data import Ctap2InfoCache, DeviceData, DeviceSnapshot, ctap2_info_cache
+
+T = TypeVar("T")
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def in_thread(f: Callable[[], T]) -> T:
+    results: list[T] = []
+    thread = threading.Thread(target=lambda: results.append(f()))
+    thread.start()
+    thread.join(2)
+    return results[0]
+
+
+def fake_nk3(path: str = "/dev/hidraw0") -> Any:
+    device = mock.Mock(spec=NK3, path=path, model=Model.NK3)
+    device.uuid.return_value = Uuid(0x1234567890)
+    device.admin = mock.Mock()
+    device.admin.version.return_value = Version(1, 8, 0)
+    device.admin.status.return_value = Status(init_status=InitStatus(0), variant=Variant.LPC55)
+    return device
+
+
+class FakeCtapDevice:
+    def __init__(self) -> None:
+        self.ctaphid = mock.Mock(capabilities=CAPABILITY.CBOR)
+
+    def ctaphid_device(self) -> Any:
+        return self.ctaphid
+
+
+class FakeCtapDeviceData(FakeDeviceData):
+    def __init__(self, path: str, uuid: Uuid, version: Version) -> None:
+        super().__init__(path, uuid, FakeCtapDevice())
+        self._version = version
+
+    @property
+    def version(self) -> Version:
+        assert self._version is not None
+        return self._version
+
+
+class Ctap2InfoCacheTest(unittest.TestCase):
+    def test_get_update_invalidate(self) -> None:
+        cache = Ctap2InfoCache()
+        info = mock.Mock()
+        hits, misses = diagnostics.get("ctap2_info.hit"), diagnostics.get("ctap2_info.miss")
+
+        self.assertIsNone(cache.get(("a", "v1.8.0")))
+        cache.update(("a", "v1.7.0"), info)
+        cache.update(("a", "v1.8.0"), info)
+        cache.update(("b", "v1.8.0"), info)
+        self.assertIs(cache.get(("a", "v1.8.0")), info)
+
+        cache.invalidate("a")
+        self.assertIsNone(cache.get(("a", "v1.7.0")))
+        self.assertIsNone(cache.get(("a", "v1.8.0")))
+        self.assertIs(cache.get(("b", "v1.8.0")), info)
+
+        self.assertEqual(diagnostics.get("ctap2_info.hit") - hits, 2)
+        self.assertEqual(diagnostics.get("ctap2_info.miss") - misses, 3)
+
+
+class OpenCtap2Test(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = FakeCtapDeviceData("/dev/hidraw0", Uuid(41), Version(1, 8, 0))
+        self.addCleanup(self.data.invalidate_ctap2_info)
+
+        self.info = mock.Mock(max_msg_size=1024)
+        patcher = mock.patch.object(Ctap2, "get_info", return_value=self.info)
+        self.get_info = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_info_is_queried_once(self) -> None:
+        for _ in range(3):
+            with self.data.open_ctap2() as ctap2:
+                self.assertIs(ctap2.info, self.info)
+
+        self.get_info.assert_called_once_with()
+
+    def test_explicit_get_info_queries_device(self) -> None:
+        with self.data.open_ctap2():
+            pass
+        with self.data.open_ctap2() as ctap2:
+            ctap2.get_info()
+
+        self.assertEqual(self.get_info.call_count, 2)
+
+    def test_invalidate(self) -> None:
+        with self.data.open_ctap2():
+            pass
+        self.data.invalidate_ctap2_info()
+        with self.data.open_ctap2():
+            pass
+
+        self.assertEqual(self.get_info.call_count, 2)
+
+    def test_new_version_is_queried(self) -> None:
+        with self.data.open_ctap2():
+            pass
+        updated = FakeCtapDeviceData("/dev/hidraw1", Uuid(41), Version(1, 8, 1))
+        with updated.open_ctap2():
+            pass
+
+        self.assertEqual(self.get_info.call_count, 2)
+        uuid = str(Uuid(41))
+        self.assertEqual(len([key for key in ctap2_info_cache._entries if key[0] == uuid]), 2)
+
+
+class DeviceSnapshotTest(unittest.TestCase):
+    def test_snapshot(self) -> None:
+        device = fake_nk3()
+        io = diagnostics.get("device_data.gui_thread_io")
+
+        snapshot = in_thread(lambda: DeviceData(device).snapshot())
+
+        self.assertEqual(
+            snapshot,
+            DeviceSnapshot(
+                key=str(Uuid(0x1234567890)),
+                path="/dev/hidraw0",
+                model=Model.NK3,
+                name=f"Nitrokey 3: {str(Uuid(0x1234567890))[:5]}",
+                is_bootloader=False,
+                is_too_old=False,
+                uuid=str(Uuid(0x1234567890)),
+                version=str(Version(1, 8, 0)),
+                variant="LPC55",
+                init_status=InitStatus(0),
+            ),
+        )
+        self.assertEqual(diagnostics.get("device_data.gui_thread_io"), io)
+
+    def test_bootloader_snapshot(self) -> None:
+        device = mock.Mock(spec=NK3Bootloader, path="/dev/hidraw1", model=Model.NK3)
+
+        snapshot = DeviceData(device).snapshot()
+
+        self.assertEqual((snapshot.key, snapshot.name), ("/dev/hidraw1", "Nitrokey 3 (BL)"))
+        self.assertTrue(snapshot.is_bootloader)
+        self.assertIsNone(snapshot.version)
+
+    def test_snapshot_of_old_firmware(self) -> None:
+        device = fake_nk3()
+        device.admin.status.return_value = Status()
+
+        snapshot = in_thread(lambda: DeviceData(device).snapshot())
+
+        self.assertTrue(snapshot.is_too_old)
+        self.assertIsNone(snapshot.variant)
+
+    def test_known_snapshot(self) -> None:
+        data = in_thread(lambda: DeviceData(fake_nk3()))
+        device = mock.Mock(spec=NK3Bootloader, path="/dev/hidraw1", model=Model.NK3)
+
+        snapshot = data.known_snapshot()
+
+        self.assertEqual(snapshot, in_thread(data.snapshot))
+        self.assertIsNone(DeviceData(device).known_snapshot())
+        data._status = None
+        self.assertIsNone(data.known_snapshot())
+
+    def test_gui_thread_io_is_reported(self) -> None:
+        io = diagnostics.get("device_data.gui_thread_io")
+
+        with self.assertLogs("nitrokeyapp.device_data", "WARNING") as logs:
+            DeviceData(fake_nk3())
+
+        self.assertEqual(diagnostics.get("device_data.gui_thread_io"), io + 1)
+        self.assertIn("Device I/O on the GUI thread: enumerate /dev/hidraw0", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import threading
+import unittest
+from unittest import mock
+
+from helpers import FakeDeviceData
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.device_health import DeviceHealth, DeviceHealthService
+
+
+class DeviceHealthTest(unittest.TestCase):
+    def test_properties(self) -> None:
+        health = DeviceHealth(key="1", collected=0)
+        self.assertEqual((health.fido2_compatible, health.fido2_pin_set), (False, False))
+        self.assertFalse(health.secrets_pin_set)
+
+        health = DeviceHealth(
+            key="1",
+            collected=0,
+            fido2_info=mock.Mock(options={"credMgmt": True, "clientPin": True}),
+            secrets=mock.Mock(pin_attempt_counter=0),
+        )
+        self.assertEqual((health.fido2_compatible, health.fido2_pin_set), (True, True))
+        self.assertTrue(health.secrets_pin_set)
+
+
+class DeviceHealthServiceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 100.0
+        patcher = mock.patch("nitrokeyapp.device_health.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = DeviceHealthService(ttl=30)
+        self.collect = mock.patch.object(
+            self.service,
+            "_collect",
+            side_effect=lambda data, _priority: DeviceHealth(data.access_key, self.now),
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.a = FakeDeviceData("/dev/hidraw0", Uuid(1))
+        self.b = FakeDeviceData("/dev/hidraw1", Uuid(2))
+
+    def test_cached(self) -> None:
+        first = self.service.get(self.a)
+        self.now += 30
+        self.assertIs(self.service.get(self.a), first)
+        self.service.get(self.b)
+
+        self.assertEqual(self.collect.call_count, 2)
+
+    def test_expired(self) -> None:
+        first = self.service.get(self.a)
+        self.now += 31
+
+        self.assertIsNot(self.service.get(self.a), first)
+        self.assertEqual(self.collect.call_count, 2)
+
+    def test_invalidate(self) -> None:
+        self.service.get(self.a)
+        self.service.get(self.b)
+        self.service.invalidate(self.a)
+        self.service.get(self.a)
+        self.service.get(self.b)
+        self.assertEqual(self.collect.call_count, 3)
+
+        self.service.clear()
+        self.service.get(self.b)
+        self.assertEqual(self.collect.call_count, 4)
+
+    def test_concurrent_requests_share_collection(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+
+        def collect(data: FakeDeviceData, _priority: object) -> DeviceHealth:
+            started.set()
+            release.wait(2)
+            return DeviceHealth(data.access_key, self.now)
+
+        self.collect.side_effect = collect
+        results: list[DeviceHealth] = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.service.get(self.a)))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(started.wait(2))
+        release.set()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(self.collect.call_count, 1)
+        self.assertIs(results[0], results[1])
+
+
+class CollectTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = mock.Mock()
+        self.device.admin.status.return_value = "status"
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1), self.device)
+        self.service = DeviceHealthService()
+
+    def test_collect(self) -> None:
+        ctap2 = mock.Mock(info=mock.Mock(options={"clientPin": True}))
+        with (
+            mock.patch.object(self.data, "ctap2", return_value=ctap2),
+            mock.patch("nitrokeyapp.device_health.ClientPin") as client_pin,
+        ):
+            client_pin.return_value.get_pin_retries.return_value = (7, None)
+            health = self.service.get(self.data)
+
+        self.assertEqual(self.data.opened, 1)
+        self.assertEqual((health.status, health.fido2_pin_retries), ("status", 7))
+        self.assertIs(health.fido2_info, ctap2.info)
+        # not a Nitrokey 3
+        self.assertIsNone(health.secrets)
+
+    def test_fido2_failure_is_not_fatal(self) -> None:
+        with mock.patch.object(self.data, "ctap2", side_effect=RuntimeError("no CTAPHID")):
+            health = self.service.get(self.data)
+
+        self.assertEqual(health.status, "status")
+        self.assertIsNone(health.fido2_info)
+
+
+if __name__ == "__main__":
+    unittest.main()
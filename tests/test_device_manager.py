@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+from helpers import FakeDeviceData
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.device_data import DeviceData
+from nitrokeyapp.device_manager import DeviceManager
+
+
+def listed(*devices: tuple[str, Uuid | None]) -> mock._patch:  # type: ignore[type-arg]
+    # every enumeration returns new DeviceData instances, like DeviceData.list
+    return mock.patch.object(
+        DeviceData, "list", lambda: [FakeDeviceData(path, uuid) for path, uuid in devices]
+    )
+
+
+class DeviceManagerTest(unittest.TestCase):
+    def test_add_matches_device_without_uuid_by_path(self) -> None:
+        manager = DeviceManager()
+        with listed(("/dev/hidraw0", None)):
+            first = manager.add()
+            second = manager.add()
+
+        self.assertEqual(len(first.added), 1)
+        self.assertFalse(second)
+        self.assertEqual(len(manager), 1)
+
+    def test_add_matches_device_by_uuid(self) -> None:
+        manager = DeviceManager()
+        uuid = Uuid(0x1234)
+        with listed(("/dev/hidraw0", uuid)):
+            manager.add()
+        with listed(("/dev/hidraw1", uuid)):
+            delta = manager.add()
+
+        self.assertEqual(len(delta.changed), 1)
+        self.assertEqual(len(manager), 1)
+        self.assertEqual(manager.snapshot()[0].path, "/dev/hidraw1")
+
+    def test_remove_device_without_uuid(self) -> None:
+        manager = DeviceManager()
+        with listed(("/dev/hidraw0", None)):
+            manager.add()
+            self.assertFalse(manager.remove())
+        with listed():
+            delta = manager.remove()
+
+        self.assertEqual(len(delta.removed), 1)
+        self.assertEqual(len(manager), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
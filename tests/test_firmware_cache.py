@@ -0,0 +1,137 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from helpers import qt_app
+from nitrokey.trussed import Model, Version
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.firmware_cache import INDEX_FILE_NAME, FirmwareCache
+from nitrokeyapp.update import UpdateException, UpdateGUI, UpdateStatus, fetch_firmware
+
+V1 = Version(1, 7, 0)
+V2 = Version(1, 8, 0)
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class FirmwareCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name) / "firmware"
+        self.cache = FirmwareCache(self.directory, max_size=100)
+
+    def test_add_and_get(self) -> None:
+        added = self.cache.add(Model.NK3, V1, b"v1")
+        image = self.cache.get(Model.NK3, V1)
+
+        assert image is not None
+        self.assertEqual(image.path, added.path)
+        self.assertEqual(Path(image.path).name, hashlib.sha256(b"v1").hexdigest() + ".zip")
+        self.assertEqual(Path(image.path).read_bytes(), b"v1")
+        self.assertIsNone(self.cache.get(Model.NKPK, V1))
+
+    def test_miss_does_not_write_index(self) -> None:
+        self.assertIsNone(self.cache.get(Model.NK3, V1))
+        self.assertIsNone(self.cache.latest(Model.NK3))
+        self.assertFalse(self.directory.exists())
+
+        self.cache.add(Model.NK3, V1, b"v1")
+        index = self.directory / INDEX_FILE_NAME
+        mtime = index.stat().st_mtime_ns
+        with mock.patch.object(self.cache, "_store_index") as store:
+            self.assertIsNone(self.cache.get(Model.NK3, V2))
+        store.assert_not_called()
+        self.assertEqual(index.stat().st_mtime_ns, mtime)
+
+    def test_corrupted_file_is_dropped(self) -> None:
+        image = self.cache.add(Model.NK3, V1, b"v1")
+        Path(image.path).write_bytes(b"corrupted")
+
+        self.assertIsNone(self.cache.get(Model.NK3, V1))
+        self.assertFalse(Path(image.path).exists())
+        self.assertIsNone(self.cache.get(Model.NK3, V1))
+
+    def test_latest(self) -> None:
+        self.cache.add(Model.NK3, V2, b"v2")
+        self.cache.add(Model.NK3, V1, b"v1")
+        self.cache.add(Model.NKPK, Version(2, 0, 0), b"pk")
+
+        image = self.cache.latest(Model.NK3)
+
+        assert image is not None
+        self.assertEqual(image.version, V2)
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        with mock.patch("nitrokeyapp.firmware_cache.time", side_effect=[1, 2, 3, 4]):
+            self.cache.add(Model.NK3, V1, b"1" * 40)
+            self.cache.add(Model.NK3, V2, b"2" * 40)
+            self.assertIsNotNone(self.cache.get(Model.NK3, V1))
+            self.cache.add(Model.NK3, Version(1, 9, 0), b"3" * 40)
+
+        self.assertIsNotNone(self.cache.get(Model.NK3, V1))
+        self.assertIsNone(self.cache.get(Model.NK3, V2))
+
+
+class FetchFirmwareTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = FirmwareCache(Path(tmp.name), max_size=100)
+
+        self.dialogs: list[str] = []
+        self.ui = UpdateGUI(CommonUi(), Model.NK3, is_qubesos=False)
+
+        def confirm(title: str, desc: str) -> bool:
+            self.dialogs.append(desc)
+            return True
+
+        repository = mock.Mock()
+        repository.get_latest_release.return_value = mock.Mock(tag="v1.8.0")
+        self.asset = mock.Mock(tag="v1.8.0")
+        self.asset.read.return_value = b"firmware"
+        container = mock.Mock(version=V2)
+
+        for patcher in [
+            mock.patch.object(self.ui, "run_confirm_dialog", side_effect=confirm),
+            mock.patch("nitrokeyapp.update.get_firmware_cache", return_value=self.cache),
+            mock.patch("nitrokeyapp.update.get_firmware_repository", return_value=repository),
+            mock.patch("nitrokeyapp.update.get_firmware_update", return_value=self.asset),
+            mock.patch("nitrokeyapp.update.FirmwareContainer.parse", return_value=container),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_download_is_cached(self) -> None:
+        image = fetch_firmware(self.ui, Model.NK3, V1)
+        again = fetch_firmware(self.ui, Model.NK3, V1)
+
+        self.assertEqual(image.path, again.path)
+        self.assertEqual(self.asset.read.call_count, 1)
+        self.assertEqual(len(self.dialogs), 1)
+
+    def test_downgrade_is_aborted_before_download(self) -> None:
+        with self.assertRaises(UpdateException) as cm:
+            fetch_firmware(self.ui, Model.NK3, Version(1, 9, 0))
+
+        self.assertEqual(cm.exception.status, UpdateStatus.ABORTED)
+        self.assertEqual(self.dialogs, [])
+        self.asset.read.assert_not_called()
+
+    def test_same_version_is_confirmed_before_download(self) -> None:
+        fetch_firmware(self.ui, Model.NK3, V2)
+
+        self.assertEqual(len(self.dialogs), 2)
+        self.assertIn("same as on the device", self.dialogs[0])
+        # the Updater does not ask again for the downloaded container
+        self.ui.confirm_update_same_version(V2)
+        self.assertEqual(len(self.dialogs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
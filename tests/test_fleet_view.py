@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+from PySide6.QtWidgets import QTableWidget
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_health import DeviceHealth
+from nitrokeyapp.fleet_view import COLUMN_RESULT, FleetDevice
+from nitrokeyapp.fleet_view.worker import CheckPinStatus
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def health(
+    client_pin: bool | None = True, fido2_retries: int | None = 8, secrets_retries: int | None = 0
+) -> DeviceHealth:
+    fido2_info = None if client_pin is None else mock.Mock(options={"clientPin": client_pin})
+    secrets = mock.Mock(pin_attempt_counter=secrets_retries)
+    return DeviceHealth(
+        key="1",
+        collected=0,
+        fido2_info=fido2_info,
+        fido2_pin_retries=fido2_retries,
+        secrets=secrets,
+    )
+
+
+class CheckPinStatusTest(unittest.TestCase):
+    def run_job(self, result: DeviceHealth) -> tuple[list[DeviceHealth], list[str]]:
+        common_ui = CommonUi()
+        errors: list[str] = []
+        common_ui.info.error.connect(errors.append)
+        job = CheckPinStatus(common_ui, FakeDeviceData("/dev/hidraw0", Uuid(1)))
+        checked: list[DeviceHealth] = []
+        job.pin_status.connect(checked.append)
+        with mock.patch("nitrokeyapp.fleet_view.worker.health_service") as service:
+            service.get.return_value = result
+            job.run()
+        return checked, errors
+
+    def test_status(self) -> None:
+        snapshot = health()
+        self.assertEqual(self.run_job(snapshot), ([snapshot], []))
+
+    def test_no_status(self) -> None:
+        snapshot = DeviceHealth(key="1", collected=0)
+        checked, errors = self.run_job(snapshot)
+        self.assertEqual(checked, [])
+        self.assertEqual(len(errors), 1)
+
+
+class FleetDeviceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = QTableWidget(1, 4)
+        self.device = FleetDevice(FakeDeviceData("/dev/hidraw0", Uuid(1)), self.table, 0)
+        self.addCleanup(self.device.stop)
+
+    def result(self, snapshot: DeviceHealth) -> str:
+        self.device.handle_pin_status(snapshot)
+        return self.table.item(0, COLUMN_RESULT).text()
+
+    def test_fido2_and_passwords_pin(self) -> None:
+        self.assertEqual(
+            self.result(health()), "FIDO2 PIN set (8 retries), Passwords PIN set (0 retries)"
+        )
+        self.assertEqual(
+            self.result(health(client_pin=False, secrets_retries=None)),
+            "FIDO2 PIN not set, Passwords PIN not set",
+        )
+
+    def test_fido2_only(self) -> None:
+        snapshot = DeviceHealth(key="1", collected=0, fido2_info=mock.Mock(options={}))
+        self.assertEqual(self.result(snapshot), "FIDO2 PIN not set")
+
+    def test_fido2_unknown(self) -> None:
+        self.assertEqual(
+            self.result(health(client_pin=None, secrets_retries=3)),
+            "FIDO2 PIN unknown, Passwords PIN set (3 retries)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
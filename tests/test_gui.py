@@ -0,0 +1,135 @@
+import os
+import signal
+import unittest
+from collections.abc import Callable
+from time import monotonic
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+from PySide6.QtWidgets import QApplication
+
+from nitrokeyapp import diagnostics, gui
+from nitrokeyapp.device_data import DeviceData
+
+
+class FakeBootloaderData(FakeDeviceData):
+    @property
+    def is_bootloader(self) -> bool:
+        return True
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class GuiTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(signal.signal, signal.SIGINT, signal.getsignal(signal.SIGINT))
+        for patcher in [
+            mock.patch.object(gui, "USBMonitor"),
+            mock.patch.object(gui, "check_ccid_config"),
+            mock.patch.object(gui, "get_device_cache"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        app = QApplication.instance()
+        assert isinstance(app, QApplication)
+        self.window = gui.GUI(app, "/tmp/nitrokey-app-test.log")
+        self.addCleanup(self.stop_window)
+        for view in self.window.views:
+            mock.patch.object(view, "refresh").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def stop_window(self) -> None:
+        self.window.teardown_signal_handling()
+        for view in self.window.views:
+            view.worker_thread.quit()
+            view.worker_thread.wait()
+
+
+class DeviceSelectionTest(GuiTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.a = FakeDeviceData("/dev/hidraw0", Uuid(1))
+        self.b = FakeDeviceData("/dev/hidraw1", Uuid(2))
+
+    def update(self, *devices: DeviceData) -> None:
+        self.window.device_manager._devices = list(devices)
+        self.window.update_devices()
+
+    def test_selection_follows_device_through_bootloader(self) -> None:
+        self.update(self.a, self.b)
+        self.window.show_device(self.b)
+
+        bootloader = FakeBootloaderData("/dev/hidraw2")
+        self.update(self.a, bootloader)
+        self.assertIs(self.window.selected_device, bootloader)
+
+        b = FakeDeviceData("/dev/hidraw3", Uuid(2))
+        self.update(self.a, b)
+        self.assertIs(self.window.selected_device, b)
+
+    def test_selection_is_kept_while_no_device_is_connected(self) -> None:
+        self.update(self.a, self.b)
+        self.window.show_device(self.b)
+
+        self.update()
+        self.assertIsNone(self.window.selected_device)
+
+        b = FakeDeviceData("/dev/hidraw3", Uuid(2))
+        self.update(self.a, b)
+        self.assertIs(self.window.selected_device, b)
+
+    def test_fall_back_to_first_device(self) -> None:
+        self.update(self.a, self.b)
+        self.window.show_device(self.b)
+
+        self.update(self.a)
+        self.assertIs(self.window.selected_device, self.a)
+
+    def test_explicit_bootloader_selection(self) -> None:
+        bootloader = FakeBootloaderData("/dev/hidraw2")
+        self.update(self.a, bootloader)
+        self.window.show_device(bootloader)
+
+        self.update(self.a, bootloader, self.b)
+        self.assertIs(self.window.selected_device, bootloader)
+
+
+class SignalHandlingTest(GuiTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.close = mock.patch.object(self.window, "close").start()
+
+    def process_events_until(self, condition: Callable[[], bool]) -> None:
+        deadline = monotonic() + 2
+        while not condition():
+            if monotonic() > deadline:
+                raise AssertionError("timeout")
+            QApplication.processEvents()
+
+    def test_sigint_wakes_up_event_loop(self) -> None:
+        wakeups = diagnostics.get("signal.wakeups")
+
+        os.kill(os.getpid(), signal.SIGINT)
+        self.process_events_until(lambda: diagnostics.get("signal.wakeups") > wakeups)
+
+        self.close.assert_called_once_with()
+        # the wakeup socket is drained
+        with self.assertRaises(BlockingIOError):
+            self.window.signal_socket.recv(1)
+
+    def test_sigint_is_ignored_during_update(self) -> None:
+        wakeups = diagnostics.get("signal.wakeups")
+
+        with mock.patch.object(self.window, "is_update_running", return_value=True):
+            os.kill(os.getpid(), signal.SIGINT)
+            self.process_events_until(lambda: diagnostics.get("signal.wakeups") > wakeups)
+
+        self.close.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import threading
+import unittest
+from collections.abc import Callable
+from time import monotonic, sleep
+
+from nitrokeyapp.hotplug import HotplugBurst, HotplugCoalescer
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = monotonic() + timeout
+    while not condition():
+        if monotonic() > deadline:
+            raise AssertionError("timeout")
+        sleep(0.001)
+
+
+class HotplugCoalescerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bursts: list[HotplugBurst] = []
+
+    def coalescer(self, window: float, max_delay: float = 10.0) -> HotplugCoalescer:
+        coalescer = HotplugCoalescer(self.bursts.append, window=window, max_delay=max_delay)
+        self.addCleanup(coalescer.cancel)
+        return coalescer
+
+    def test_burst_is_coalesced(self) -> None:
+        coalescer = self.coalescer(0.05)
+        coalescer.added("a")
+        coalescer.added("a")
+        coalescer.removed("b")
+        coalescer.added("c")
+
+        wait_until(lambda: len(self.bursts) == 1)
+        sleep(0.1)
+
+        [burst] = self.bursts
+        self.assertEqual((burst.added, burst.removed, burst.events), ({"a", "c"}, {"b"}, 4))
+
+    def test_max_delay(self) -> None:
+        coalescer = self.coalescer(0.05, max_delay=0.1)
+        start = monotonic()
+        while not self.bursts:
+            if monotonic() - start > 2:
+                raise AssertionError("timeout")
+            coalescer.added("a")
+            sleep(0.01)
+
+        self.assertLess(monotonic() - start, 1)
+
+    def test_cancel(self) -> None:
+        coalescer = self.coalescer(0.02)
+        coalescer.added("a")
+        coalescer.cancel()
+        coalescer.added("b")
+
+        sleep(0.1)
+        self.assertEqual(self.bursts, [])
+
+    def test_cancel_while_timer_is_waiting(self) -> None:
+        coalescer = self.coalescer(0.01)
+        fired = threading.Event()
+        flush = coalescer._flush
+
+        def waiting_flush(generation: int) -> None:
+            fired.set()
+            flush(generation)
+
+        coalescer._flush = waiting_flush  # type: ignore[method-assign]
+
+        # a running callback blocks the timer after it fired
+        with coalescer._flush_lock:
+            coalescer.added("a")
+            self.assertTrue(fired.wait(2))
+            coalescer.cancel()
+            coalescer.added("b")
+        sleep(0.05)
+
+        self.assertEqual(self.bursts, [])
+
+    def test_superseded_timer_is_ignored(self) -> None:
+        coalescer = self.coalescer(10, max_delay=60)
+        coalescer.added("a")
+        first = coalescer._generation
+        coalescer.added("b")
+
+        coalescer._flush(first)
+        self.assertEqual(self.bursts, [])
+
+        coalescer._flush(coalescer._generation)
+        self.assertEqual([burst.added for burst in self.bursts], [{"a", "b"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import qt_app
+from PySide6.QtCore import QCoreApplication, Qt
+
+from nitrokeyapp.log_viewer import LogIndex, LogModel
+
+LINES = [
+    "10 INFO nitrokeyapp.gui started",
+    "20 WARNING nitrokeyapp.secrets_tab.worker slow",
+    "30 ERROR nitrokeyapp.update failed",
+    "Traceback (most recent call last):",
+    "40 DEBUG nitrokeyapp.secrets_tab.ui shown",
+]
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class LogTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.index = LogIndex(self.path)
+
+    def write(self, *lines: str, mode: str = "a") -> None:
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+
+    def index_all(self) -> None:
+        while self.index.update()[1]:
+            pass
+
+
+class LogIndexTest(LogTestCase):
+    def test_index(self) -> None:
+        self.write(*LINES)
+        self.assertEqual(self.index.update(), (False, False))
+
+        self.assertEqual([self.index.line(i) for i in range(len(self.index))], LINES)
+        self.assertEqual(list(self.index.levels), [2, 3, 4, 4, 1])
+        modules = [self.index.module_names[i] for i in self.index.modules]
+        # the traceback belongs to the previous record
+        self.assertEqual(modules[2], modules[3])
+        self.assertEqual(modules[4], "nitrokeyapp.secrets_tab.ui")
+
+    def test_json_lines(self) -> None:
+        self.write(
+            json.dumps({"level": "ERROR", "logger": "nitrokeyapp.gui", "message": "x"}),
+            json.dumps({"level": "INFO", "logger": "nitrokeyapp.update", "message": "y"}),
+        )
+        self.index.update()
+
+        self.assertEqual(list(self.index.levels), [4, 2])
+        self.assertEqual(self.index.module_names, ["nitrokeyapp.gui", "nitrokeyapp.update"])
+
+    def test_incomplete_line_is_not_indexed(self) -> None:
+        self.write(LINES[0])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("20 INFO nitrokeyapp.gui unfin")
+        self.index.update()
+        self.assertEqual(len(self.index), 1)
+
+        self.write("ished")
+        self.index.update()
+        self.assertEqual(self.index.line(1), "20 INFO nitrokeyapp.gui unfinished")
+
+    def test_indexed_in_chunks(self) -> None:
+        self.write(*LINES)
+
+        self.assertEqual(self.index.update(max_bytes=40), (False, True))
+        self.assertEqual(len(self.index), 1)
+        self.index_all()
+        self.assertEqual(len(self.index), len(LINES))
+
+    def test_rotated_file_is_reindexed(self) -> None:
+        self.write(*LINES)
+        self.index.update()
+
+        self.write(LINES[0], mode="w")
+        self.assertEqual(self.index.update(), (True, False))
+        self.assertEqual(len(self.index), 1)
+
+
+class LogModelTest(LogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.write(*LINES)
+        self.index_all()
+        self.model = LogModel(self.index)
+
+    def finish_filtering(self) -> None:
+        while self.model.filtering:
+            QCoreApplication.processEvents()
+
+    def displayed(self) -> list[str]:
+        return [
+            self.model.data(self.model.index(row), Qt.ItemDataRole.DisplayRole)
+            for row in range(self.model.rowCount())
+        ]
+
+    def test_filter(self) -> None:
+        self.model.set_filter(3, "")
+        self.assertEqual(self.displayed(), LINES[1:4])
+
+        self.model.set_filter(0, "SECRETS_tab")
+        self.assertEqual(self.displayed(), [LINES[1], LINES[4]])
+
+        self.model.set_filter(4, "secrets_tab")
+        self.assertEqual(self.displayed(), [])
+
+    def test_lines_added(self) -> None:
+        self.model.set_filter(3, "")
+        self.write("50 CRITICAL nitrokeyapp.gui crashed", "60 INFO nitrokeyapp.gui ok")
+        self.index.update()
+
+        inserted: list[tuple[int, int]] = []
+        self.model.rowsInserted.connect(lambda _parent, first, last: inserted.append((first, last)))
+        self.model.lines_added()
+
+        self.assertEqual(inserted, [(3, 3)])
+        self.assertEqual(self.displayed()[-1], "50 CRITICAL nitrokeyapp.gui crashed")
+
+    def test_filtered_in_chunks(self) -> None:
+        steps: list[int] = []
+        self.model.filtered.connect(lambda: steps.append(self.model.rowCount()))
+
+        with mock.patch("nitrokeyapp.log_viewer.FILTER_CHUNK_SIZE", 2):
+            self.model.set_filter(0, "")
+            self.assertTrue(self.model.filtering)
+            self.assertEqual(self.model.rowCount(), 2)
+
+            # lines added while filtering are picked up by the running filter
+            self.write(LINES[0])
+            self.index.update()
+            self.model.lines_added()
+            self.finish_filtering()
+
+        self.assertEqual(steps, [2, 4, 6])
+        self.assertEqual(self.displayed(), LINES + LINES[:1])
+
+    def test_filter_change_restarts_filtering(self) -> None:
+        with mock.patch("nitrokeyapp.log_viewer.FILTER_CHUNK_SIZE", 2):
+            self.model.set_filter(0, "")
+            self.model.set_filter(4, "")
+            self.finish_filtering()
+
+        self.assertEqual(self.displayed(), LINES[2:4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,313 @@
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from time import time
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp import diagnostics
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.logger import (
+    BatchedStreamHandler,
+    DroppingQueueHandler,
+    JobContext,
+    JobContextFilter,
+    JsonFormatter,
+    LogWriter,
+    SegmentedFileHandler,
+    count_device_open,
+    current_job,
+    job_context,
+)
+from nitrokeyapp.worker import Job, Worker
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class CountingStream(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self) -> None:
+        self.flushes += 1
+        super().flush()
+
+
+class LogWriterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stream = CountingStream()
+        self.handler = BatchedStreamHandler(self.stream)
+        self.handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+
+    def start_writer(self, queue_size: int = 100, start: bool = True) -> logging.Logger:
+        self.queue: queue.Queue[object] = queue.Queue(queue_size)
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.writer = LogWriter(self.queue, self.queue_handler, [self.handler])
+        if start:
+            self.start()
+
+        log = logging.getLogger(f"test.{self.id()}")
+        log.propagate = False
+        log.setLevel(logging.DEBUG)
+        log.addHandler(self.queue_handler)
+        self.addCleanup(log.removeHandler, self.queue_handler)
+        return log
+
+    def start(self) -> None:
+        self.writer.start()
+        self.addCleanup(self.writer.stop)
+
+
+class LogWriterTest(LogWriterTestCase):
+    def test_records_are_written(self) -> None:
+        log = self.start_writer()
+        log.info("device %s opened", "/dev/hidraw0")
+        log.debug("done")
+
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(self.stream.getvalue(), "INFO device /dev/hidraw0 opened\nDEBUG done\n")
+
+    def test_handler_is_flushed_once_per_batch(self) -> None:
+        log = self.start_writer(start=False)
+        for i in range(10):
+            log.info(f"record {i}")
+        self.start()
+
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(self.stream.getvalue().count("\n"), 10)
+        # once for the records, and once more if the flush request came in a batch of its own
+        self.assertLessEqual(self.stream.flushes, 2)
+
+    def test_records_are_dropped_if_queue_is_full(self) -> None:
+        dropped = diagnostics.get("logging.dropped")
+        log = self.start_writer(queue_size=2, start=False)
+        for i in range(5):
+            log.info(f"record {i}")
+        self.start()
+
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(
+            self.stream.getvalue().splitlines(),
+            [
+                "INFO record 0",
+                "INFO record 1",
+                "WARNING 3 log records dropped, the log queue was full",
+            ],
+        )
+        self.assertEqual(diagnostics.get("logging.dropped") - dropped, 3)
+
+    def test_stop_writes_pending_records(self) -> None:
+        log = self.start_writer(start=False)
+        self.writer.start()
+        log.info("last record")
+        self.writer.stop()
+
+        self.assertEqual(self.stream.getvalue(), "INFO last record\n")
+        self.assertFalse(self.writer.flush())
+
+
+class JsonFormatterTest(LogWriterTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.handler.setFormatter(JsonFormatter())
+
+    def entries(self) -> list[dict[str, object]]:
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_format(self) -> None:
+        log = self.start_writer()
+        log.warning("took %d ms", 12, extra={"event": {"event": "job_finish", "duration_ms": 12}})
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            log.exception("failed")
+        self.writer.flush()
+
+        first, second = self.entries()
+        self.assertEqual(first["level"], "WARNING")
+        self.assertEqual(first["logger"], f"test.{self.id()}")
+        self.assertEqual(first["message"], "took 12 ms")
+        self.assertEqual((first["event"], first["duration_ms"]), ("job_finish", 12))
+        self.assertNotIn("correlation_id", first)
+        # the exception is kept in the queue for the writer
+        self.assertIn("ValueError: broken", str(second["exception"]))
+
+    def test_correlation_id(self) -> None:
+        log = self.start_writer()
+        self.queue_handler.addFilter(JobContextFilter())
+        context = JobContext("TestJob")
+        with job_context(context):
+            log.info("in job")
+        log.info("outside")
+        self.writer.flush()
+
+        inside, outside = self.entries()
+        self.assertEqual(inside["correlation_id"], context.correlation_id)
+        self.assertNotIn("correlation_id", outside)
+
+
+class JobContextTest(unittest.TestCase):
+    def test_nested_contexts(self) -> None:
+        outer, inner = JobContext("Outer"), JobContext("Inner")
+        with job_context(outer):
+            with job_context(inner):
+                count_device_open()
+                self.assertIs(current_job(), inner)
+            count_device_open()
+            count_device_open()
+        count_device_open()
+
+        self.assertIsNone(current_job())
+        self.assertEqual((outer.opens, inner.opens), (2, 1))
+
+
+class LoggingJob(Job):
+    def __init__(self, common_ui: CommonUi, data: FakeDeviceData, fail: bool) -> None:
+        super().__init__(common_ui)
+        self.data = data
+        self.fail = fail
+
+    def run(self) -> None:
+        count_device_open()
+        logging.getLogger("nitrokeyapp.test").info("running")
+        if self.fail:
+            self.trigger_error("failed")
+        else:
+            self.finished.emit()
+
+
+class WorkerJobContextTest(unittest.TestCase):
+    def run_job(self, fail: bool) -> tuple[LoggingJob, list[logging.LogRecord]]:
+        worker = Worker(CommonUi())
+        job = LoggingJob(worker.common_ui, FakeDeviceData("/dev/hidraw0", Uuid(1)), fail)
+        with self.assertLogs("nitrokeyapp", "INFO") as logs:
+            # the capturing handler of assertLogs
+            for handler in logging.getLogger("nitrokeyapp").handlers:
+                handler.addFilter(JobContextFilter())
+            worker.run(job)
+        return job, logs.records
+
+    def test_job_events(self) -> None:
+        job, records = self.run_job(fail=False)
+        assert job.log_context is not None
+        correlation_id = job.log_context.correlation_id
+
+        start, running, finish = records
+        self.assertEqual(start.event["event"], "job_start")  # type: ignore[attr-defined]
+        self.assertEqual(start.event["device"], str(Uuid(1)))  # type: ignore[attr-defined]
+        self.assertEqual(running.correlation_id, correlation_id)  # type: ignore[attr-defined]
+        self.assertEqual(finish.event["event"], "job_finish")  # type: ignore[attr-defined]
+        self.assertEqual(finish.event["device_opens"], 1)  # type: ignore[attr-defined]
+
+    def test_failed_job(self) -> None:
+        _job, records = self.run_job(fail=True)
+        events = [record.event["event"] for record in records if hasattr(record, "event")]
+        self.assertEqual(events, ["job_start", "job_fail"])
+
+
+class SegmentedFileHandlerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        self.path = self.directory / "app.log"
+
+    def handler(self, **kwargs: object) -> SegmentedFileHandler:
+        handler = SegmentedFileHandler(self.path, **kwargs)  # type: ignore[arg-type]
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.addCleanup(handler.close)
+        return handler
+
+    def log(self, handler: SegmentedFileHandler, message: str) -> None:
+        handler.handle(logging.makeLogRecord({"msg": message}))
+
+    def segments(self) -> list[Path]:
+        return sorted(
+            path for path in self.directory.iterdir() if path.name.startswith("app.log.2")
+        )
+
+    def test_rotated_by_size(self) -> None:
+        handler = self.handler(max_size=15, compress=False)
+        for i in range(4):
+            self.log(handler, f"record {i}")
+
+        [segment] = self.segments()
+        self.assertEqual(segment.read_text().splitlines(), ["record 0", "record 1"])
+        self.assertEqual(self.path.read_text().splitlines(), ["record 2", "record 3"])
+        self.assertEqual(stat.S_IMODE(self.path.stat().st_mode), 0o600)
+
+    def test_segments_are_compressed(self) -> None:
+        handler = self.handler(max_size=10)
+        self.log(handler, "first record")
+        self.log(handler, "second record")
+
+        [segment] = self.segments()
+        self.assertEqual(segment.suffix, ".gz")
+        with gzip.open(segment, "rt") as f:
+            self.assertEqual(f.read(), "first record\n")
+
+    def test_age_is_kept_across_starts(self) -> None:
+        handler = self.handler(max_age=60, compress=False)
+        self.log(handler, "first start")
+        handler.close()
+
+        Path(f"{self.path}.start").write_text(repr(time() - 61))
+        handler = self.handler(max_age=60, compress=False)
+        self.log(handler, "second start")
+
+        [segment] = self.segments()
+        self.assertEqual(segment.read_text(), "first start\n")
+        self.assertEqual(self.path.read_text(), "second start\n")
+
+    def test_size_is_kept_across_starts(self) -> None:
+        self.path.write_text("x" * 100 + "\n")
+        handler = self.handler(max_size=50, compress=False)
+        self.log(handler, "record")
+
+        self.assertEqual(len(self.segments()), 1)
+
+    def test_disk_budget(self) -> None:
+        for i, name in enumerate(["app.log.20000101", "app.log.20000102"]):
+            old = self.directory / name
+            old.write_bytes(b"x" * 100)
+            os.utime(old, (i, i))
+        handler = self.handler(max_size=10, disk_budget=150, compress=False)
+        self.log(handler, "first record")
+        self.log(handler, "second record")
+
+        # the oldest segment is deleted, the new one is kept
+        kept = [path.name for path in self.segments()]
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(kept[0], "app.log.20000102")
+
+    def test_failed_rotation_is_retried_later(self) -> None:
+        handler = self.handler(max_size=10, compress=False)
+        self.log(handler, "first record")
+        with (
+            mock.patch("nitrokeyapp.logger.os.replace", side_effect=OSError("busy")) as replace,
+            self.assertLogs("nitrokeyapp.logger", "WARNING"),
+        ):
+            self.log(handler, "second record")
+            self.log(handler, "third record")
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(self.segments(), [])
+
+        with mock.patch("nitrokeyapp.logger.time", return_value=time() + 61):
+            self.log(handler, "fourth record")
+        self.assertEqual(len(self.segments()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
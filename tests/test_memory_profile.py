@@ -0,0 +1,111 @@
+import os
+import unittest
+from typing import Any
+from unittest import mock
+
+from helpers import qt_app
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import QPushButton, QWidget
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.memory_profile import (
+    COMMON_UI,
+    NKAPP_MEMORY_PROFILE,
+    MemoryProfiler,
+    _count_all_connections,
+    _count_connections,
+    _count_objects,
+    get_memory_profiler,
+)
+from nitrokeyapp.secrets_tab.data import Credential
+
+
+class Emitter(QObject):
+    changed = Signal()
+    value = Signal(int)
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def fake_view(title: str, common_ui: CommonUi) -> Any:
+    widget = QWidget()
+    button = QPushButton(widget)
+    button.clicked.connect(lambda: None)
+    return mock.Mock(title=title, common_ui=common_ui, widget=widget, worker=None)
+
+
+class ConnectionCountTest(unittest.TestCase):
+    def test_count_connections(self) -> None:
+        emitter = Emitter()
+        emitter.value.connect(lambda _: None)
+        emitter.value.connect(lambda _: None)
+        button = QPushButton()
+        # clicked() and clicked(bool) share their connections
+        button.clicked.connect(lambda: None)
+
+        receivers = _count_connections([("emitter", emitter), ("button", button)])
+
+        self.assertEqual((receivers["emitter.value"], receivers["button.clicked"]), (2, 1))
+        self.assertNotIn("emitter.changed", receivers)
+
+    def test_common_ui_is_counted_once(self) -> None:
+        common_ui = CommonUi()
+        common_ui.info.error.connect(lambda _: None)
+        views = [fake_view("Passwords", common_ui), fake_view("Settings", common_ui)]
+
+        connections = _count_all_connections(views)
+
+        self.assertEqual(list(connections), [COMMON_UI, "Passwords", "Settings"])
+        self.assertEqual(connections[COMMON_UI]["info.error"], 1)
+        self.assertEqual(connections["Passwords"]["QPushButton.clicked"], 1)
+
+
+class MemoryProfilerTest(unittest.TestCase):
+    def test_count_objects(self) -> None:
+        before = _count_objects()["Credential"]
+        credential = Credential(b"mail")
+
+        self.assertEqual(_count_objects()["Credential"], before + 1)
+        del credential
+
+    def test_report(self) -> None:
+        profiler = MemoryProfiler(1)
+        profiler.start()
+        self.addCleanup(profiler.stop)
+        common_ui = CommonUi()
+        views = [fake_view("Passwords", common_ui)]
+
+        first = profiler.report(views)
+        credentials = [Credential(b"mail"), Credential(b"bank")]
+        common_ui.info.error.connect(lambda _: None)
+        second = profiler.report(views)
+
+        self.assertIn("allocations since the start", first)
+        # no changes of the objects and connections without a previous report
+        self.assertNotIn("(+", first.split("allocations")[0])
+        self.assertRegex(second, r"\n  Credential: \d+ \(\+2\)\n")
+        self.assertRegex(second, rf"\n  {COMMON_UI}: \d+ \(\+\d+\)\n")
+        self.assertIn("\n    info.error: 1 (+1)\n", second)
+        # unchanged connections are not listed again
+        self.assertNotIn("QPushButton.clicked", second)
+        self.assertIn("allocations since", second.split("signal connections")[1])
+        del credentials
+
+
+class GetMemoryProfilerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        get_memory_profiler.cache_clear()
+        self.addCleanup(get_memory_profiler.cache_clear)
+
+    def test_frames(self) -> None:
+        for value, frames in [("", None), ("25", 25), ("0", 1), ("yes", 10)]:
+            get_memory_profiler.cache_clear()
+            with mock.patch.dict(os.environ, {NKAPP_MEMORY_PROFILE: value}):
+                profiler = get_memory_profiler()
+            self.assertEqual(profiler.frames if profiler else None, frames)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from helpers import qt_app
+
+from nitrokeyapp.secrets_tab.otp_countdown import OtpCountdown
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class OtpCountdownTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = NOW
+        fake_datetime = mock.Mock(wraps=datetime)
+        fake_datetime.now.side_effect = lambda: self.now
+        patcher = mock.patch("nitrokeyapp.secrets_tab.otp_countdown.datetime", fake_datetime)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.countdown = OtpCountdown()
+        self.events: list[str] = []
+        self.countdown.tick.connect(lambda remaining: self.events.append(f"tick {remaining}"))
+        self.countdown.refresh_due.connect(lambda: self.events.append("refresh"))
+        self.countdown.expired.connect(lambda: self.events.append("expired"))
+        self.countdown.finished.connect(lambda: self.events.append("finished"))
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+        self.countdown.wake()
+
+    def test_timer_is_aligned_to_seconds(self) -> None:
+        self.countdown.start(NOW + timedelta(seconds=10.3), 30)
+
+        self.assertEqual(self.events, ["tick 10"])
+        self.assertEqual(self.countdown.timer.interval(), 300)
+        self.assertTrue(self.countdown.timer.isActive())
+
+        self.advance(0.3)
+        self.assertEqual(self.events, ["tick 10", "tick 10"])
+        self.assertEqual(self.countdown.timer.interval(), 1000)
+
+    def test_refresh_is_due_once_before_expiry(self) -> None:
+        self.countdown.start(NOW + timedelta(seconds=3), 30)
+        self.advance(1)
+        self.advance(1)
+
+        self.assertEqual(self.events, ["tick 3", "refresh", "tick 2", "tick 1"])
+
+    def test_expired_code_is_kept_for_one_period(self) -> None:
+        self.countdown.start(NOW + timedelta(seconds=1), 30)
+        self.advance(1)
+
+        self.assertEqual(self.events[-2:], ["expired", "tick 0"])
+        self.assertEqual(self.countdown.timer.interval(), 30000)
+
+        self.advance(30)
+        self.assertEqual(self.events[-1], "finished")
+        self.assertFalse(self.countdown.active)
+        self.assertFalse(self.countdown.timer.isActive())
+
+    def test_next_period_started_on_expiry(self) -> None:
+        self.countdown.expired.connect(
+            lambda: self.countdown.start(self.now + timedelta(seconds=30), 30)
+        )
+        self.countdown.start(NOW + timedelta(seconds=1), 30)
+        self.advance(1)
+
+        self.assertEqual(self.events[-2:], ["expired", "tick 30"])
+        self.assertNotIn("tick 0", self.events)
+
+    def test_pause_and_resume(self) -> None:
+        self.countdown.start(NOW + timedelta(seconds=10), 30)
+        self.countdown.pause()
+        self.assertFalse(self.countdown.timer.isActive())
+        self.assertTrue(self.countdown.active)
+
+        self.now += timedelta(seconds=5)
+        self.countdown.resume()
+        self.assertEqual(self.events[-1], "tick 5")
+        self.assertTrue(self.countdown.timer.isActive())
+
+        self.countdown.stop()
+        self.countdown.resume()
+        self.assertFalse(self.countdown.timer.isActive())
+
+
+if __name__ == "__main__":
+    unittest.main()
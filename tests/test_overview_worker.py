@@ -0,0 +1,81 @@
+import unittest
+import warnings
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.device_data import DeviceSnapshot
+from nitrokeyapp.overview_tab.worker import DeviceSnapshotJob, UpdateDevice, UpdateQueue
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class PromptConnectionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.common_ui = CommonUi()
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1))
+        # e.g. a job of another tab waiting for a confirmation
+        self.confirmed: list[bool] = []
+        self.common_ui.prompt.confirmed.connect(self.confirmed.append)
+
+    def check_cleanup(self, job: UpdateDevice | UpdateQueue) -> None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            # some jobs emit finished twice
+            job.finished.emit()
+            job.finished.emit()
+
+        self.common_ui.prompt.confirmed.emit(True)
+
+        self.assertEqual(self.confirmed, [True])
+        self.assertIsNone(job.update_gui.await_confirmation)
+
+    def test_update_device(self) -> None:
+        job = UpdateDevice(self.common_ui, self.data, is_qubesos=False)
+        self.common_ui.prompt.confirmed.emit(False)
+        self.assertIs(job.update_gui.await_confirmation, False)
+        job.update_gui.await_confirmation = None
+        self.confirmed.clear()
+
+        self.check_cleanup(job)
+
+    def test_update_queue(self) -> None:
+        self.check_cleanup(UpdateQueue(self.common_ui, [self.data], is_qubesos=False))
+
+
+class DeviceSnapshotJobTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.common_ui = CommonUi()
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1))
+        self.errors: list[str] = []
+        self.common_ui.info.error.connect(self.errors.append)
+
+    def run_job(self) -> list[DeviceSnapshot]:
+        job = DeviceSnapshotJob(self.common_ui, self.data)
+        snapshots: list[DeviceSnapshot] = []
+        finished: list[bool] = []
+        job.device_snapshot.connect(snapshots.append)
+        job.finished.connect(lambda: finished.append(True))
+        job.run()
+        self.assertEqual(finished, [True])
+        return snapshots
+
+    def test_snapshot(self) -> None:
+        snapshot = mock.Mock(spec=DeviceSnapshot)
+        with mock.patch.object(self.data, "snapshot", return_value=snapshot):
+            self.assertEqual(self.run_job(), [snapshot])
+        self.assertEqual(self.errors, [])
+
+    def test_error(self) -> None:
+        with mock.patch.object(self.data, "snapshot", side_effect=OSError("gone")):
+            self.assertEqual(self.run_job(), [])
+        self.assertEqual(len(self.errors), 1)
+        self.assertIn("Failed to read device information: gone", self.errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
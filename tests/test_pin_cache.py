@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.pin_cache import SUSPEND_THRESHOLD, PinCache, forget_device
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class Clocks:
+    """Replaces the monotonic and the running clock of the PIN cache."""
+
+    def __init__(self) -> None:
+        self.monotonic = 1000.0
+        self.running = 5000.0
+
+    def advance(self, seconds: float, suspended: float = 0) -> None:
+        self.monotonic += seconds
+        self.running += seconds + suspended
+
+
+class PinCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clocks = Clocks()
+        for patcher in [
+            mock.patch("nitrokeyapp.pin_cache.monotonic", lambda: self.clocks.monotonic),
+            mock.patch("nitrokeyapp.pin_cache._running_time", lambda: self.clocks.running),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.cache = PinCache(max_entries=2, idle_ttl=100, max_ttl=300)
+        self.devices = [FakeDeviceData(f"/dev/hidraw{i}", Uuid(i + 1)) for i in range(3)]
+        self.cleared: list[str] = []
+        self.cache.pin_cleared.connect(self.cleared.append)
+
+    def test_idle_ttl(self) -> None:
+        self.cache.update(self.devices[0], "1234")
+        self.clocks.advance(90)
+        self.assertEqual(self.cache.get(self.devices[0]), "1234")
+        self.clocks.advance(90)
+        self.assertEqual(self.cache.get(self.devices[0]), "1234")
+        self.clocks.advance(101)
+        self.assertIsNone(self.cache.get(self.devices[0]))
+        self.assertEqual(self.cleared, [str(Uuid(1))])
+
+    def test_max_ttl(self) -> None:
+        self.cache.update(self.devices[0], "1234")
+        for _ in range(3):
+            self.clocks.advance(90)
+            self.assertEqual(self.cache.get(self.devices[0]), "1234")
+        self.clocks.advance(31)
+        self.assertIsNone(self.cache.get(self.devices[0]))
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        self.cache.update(self.devices[0], "0")
+        self.cache.update(self.devices[1], "1")
+        self.cache.get(self.devices[0])
+        self.cache.update(self.devices[2], "2")
+
+        self.assertEqual(self.cleared, [str(Uuid(2))])
+        self.assertEqual(self.cache.get(self.devices[0]), "0")
+        self.assertIsNone(self.cache.get(self.devices[1]))
+
+    def test_forget_keeps_other_devices(self) -> None:
+        self.cache.update(self.devices[0], "0")
+        self.cache.update(self.devices[1], "1")
+
+        forget_device(self.devices[0])
+
+        self.assertEqual(self.cleared, [str(Uuid(1))])
+        self.assertFalse(self.cache.contains(self.devices[0]))
+        self.assertTrue(self.cache.contains(self.devices[1]))
+
+    def test_suspend_clears_all(self) -> None:
+        self.cache.update(self.devices[0], "0")
+        self.cache.update(self.devices[1], "1")
+
+        self.clocks.advance(10, suspended=SUSPEND_THRESHOLD + 1)
+        self.cache.expire()
+
+        self.assertEqual(sorted(self.cleared), [str(Uuid(1)), str(Uuid(2))])
+
+    def test_long_check_interval_is_not_a_suspend(self) -> None:
+        # e.g. a busy event loop, both clocks advance
+        self.cache.update(self.devices[0], "0")
+        self.clocks.advance(SUSPEND_THRESHOLD + 30)
+        self.cache.expire()
+        self.clocks.advance(10, suspended=SUSPEND_THRESHOLD - 1)
+        self.cache.expire()
+
+        self.assertEqual(self.cleared, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest import mock
+
+from helpers import qt_app
+
+from PySide6.QtWidgets import QProgressBar
+
+from nitrokeyapp.progress_box import (
+    ProgressBox,
+    ProgressThrottle,
+    ProgressUi,
+    format_duration,
+    format_size,
+)
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class ProgressThrottleTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        patcher = mock.patch("nitrokeyapp.progress_box.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ui = ProgressUi()
+        self.progress: list[tuple[int, int]] = []
+        self.details: list[str] = []
+        self.ui.progress.connect(lambda n, total: self.progress.append((n, total)))
+        self.ui.detail.connect(self.details.append)
+
+    def report(self, throttle: ProgressThrottle, n: int, total: int, at: float) -> None:
+        self.now = at
+        throttle(n, total)
+
+    def test_updates_are_limited(self) -> None:
+        throttle = ProgressThrottle(self.ui, max_rate=10)
+        for i in range(5):
+            self.report(throttle, i * 10, 1000, i * 0.02)
+        self.report(throttle, 100, 1000, 0.1)
+
+        self.assertEqual(self.progress, [(0, 1000), (100, 1000)])
+
+    def test_final_value_is_always_delivered(self) -> None:
+        throttle = ProgressThrottle(self.ui, max_rate=10)
+        self.report(throttle, 0, 100, 0)
+        self.report(throttle, 100, 100, 0.01)
+
+        self.assertEqual(self.progress, [(0, 100), (100, 100)])
+        self.assertEqual(self.details[-1], "")
+
+    def test_held_back_value_is_flushed(self) -> None:
+        with self.ui.throttled("Updating", max_rate=10) as throttle:
+            self.report(throttle, 0, 100, 0)
+            self.report(throttle, 50, 100, 0.01)
+            self.assertEqual(self.progress, [(0, 100)])
+
+        self.assertEqual(self.progress, [(0, 100), (50, 100)])
+
+    def test_throughput_and_remaining_time(self) -> None:
+        throttle = ProgressThrottle(self.ui, unit="B", max_rate=0)
+        self.report(throttle, 0, 10240, 0)
+        self.report(throttle, 2048, 10240, 1)
+
+        self.assertEqual(throttle.rate(), 2048)
+        self.assertEqual(self.details[-1], "2.0 KiB/s, 4 s left")
+
+    def test_rate_uses_recent_samples(self) -> None:
+        throttle = ProgressThrottle(self.ui, unit="blocks", max_rate=0)
+        self.report(throttle, 0, 1000, 0)
+        self.report(throttle, 10, 1000, 1)
+        # faster after the window of the first samples
+        for i in range(1, 5):
+            self.report(throttle, 10 + i * 100, 1000, 1 + i)
+
+        self.assertEqual(throttle.rate(), 100)
+        self.assertEqual(self.details[-1], "100.0 blocks/s, 6 s left")
+
+
+class ProgressBoxTest(unittest.TestCase):
+    def test_detail(self) -> None:
+        bar = QProgressBar()
+        box = ProgressBox(bar)
+        box.show("Updating")
+
+        box.set_detail("1.0 KiB/s, 4 s left")
+        self.assertEqual(bar.format(), "Updating: %p% (1.0 KiB/s, 4 s left)")
+        box.set_detail("")
+        self.assertEqual(bar.format(), "Updating: %p%")
+
+
+class FormatTest(unittest.TestCase):
+    def test_format_size(self) -> None:
+        self.assertEqual(format_size(512), "512 B")
+        self.assertEqual(format_size(1536), "1.5 KiB")
+        self.assertEqual(format_size(3 * 1024 * 1024), "3.0 MiB")
+        self.assertEqual(format_size(2 * 1024**3), "2.0 GiB")
+
+    def test_format_duration(self) -> None:
+        self.assertEqual(format_duration(4.4), "4 s")
+        self.assertEqual(format_duration(125), "2 min 05 s")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from helpers import (
+    FakeDeviceData,
+    FakePinUi,
+    FakeSecretsDevice,
+    StoredCredential,
+    fake_secrets_app,
+    qt_app,
+)
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.pin_cache import PinCache
+from nitrokeyapp.secrets_tab.data import Credential
+from nitrokeyapp.secrets_tab.export import (
+    FRAME_OVERHEAD,
+    ExportFormatError,
+    ExportWriter,
+    ImportSummary,
+    empty_export_size,
+    encoded_size,
+    read_export,
+)
+from nitrokeyapp.secrets_tab.worker import ImportCredentialsJob
+
+PASSPHRASE = "correct horse battery"
+
+CREDENTIALS = [
+    Credential(b"mail", login=b"me", password=b"secret", comment=b"work", loaded=True),
+    Credential(b"bank", password=b"1234", protected=True, loaded=True),
+    Credential(b"vpn", password=b"\x00\xff", touch_required=True, loaded=True),
+]
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def export(credentials: list[Credential], passphrase: str = PASSPHRASE) -> bytes:
+    stream = BytesIO()
+    with ExportWriter(stream, passphrase) as writer:
+        for credential in credentials:
+            writer.write(credential)
+    return stream.getvalue()
+
+
+class ExportFormatTest(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        data = export(CREDENTIALS)
+
+        self.assertEqual(list(read_export(BytesIO(data), PASSPHRASE)), CREDENTIALS)
+
+    def test_sizes(self) -> None:
+        self.assertEqual(len(export([])), empty_export_size())
+        self.assertEqual(
+            len(export(CREDENTIALS)),
+            empty_export_size() + sum(encoded_size(c) for c in CREDENTIALS),
+        )
+
+    def test_wrong_passphrase(self) -> None:
+        data = export(CREDENTIALS)
+
+        with self.assertRaisesRegex(ExportFormatError, "Wrong passphrase"):
+            list(read_export(BytesIO(data), "wrong passphrase"))
+
+    def test_truncated(self) -> None:
+        data = export(CREDENTIALS)
+        # cut inside the header, inside a record, inside and before the end marker
+        for length in [10, len(data) // 2, len(data) - 1, len(data) - FRAME_OVERHEAD]:
+            with self.subTest(length=length):
+                with self.assertRaises(ExportFormatError):
+                    list(read_export(BytesIO(data[:length]), PASSPHRASE))
+
+    def test_not_an_export(self) -> None:
+        with self.assertRaisesRegex(ExportFormatError, "not a Passwords export"):
+            list(read_export(BytesIO(b"x" * 100), PASSPHRASE))
+
+
+class ImportCredentialsJobTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = FakeSecretsDevice(
+            [StoredCredential(b"mail", password=b"other")], pin="123456"
+        )
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1), self.device)
+        self.common_ui = CommonUi()
+        self.errors: list[str] = []
+        self.common_ui.info.error.connect(self.errors.append)
+
+        patcher = fake_secrets_app()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+        fd, self.path = tempfile.mkstemp()
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(export(CREDENTIALS))
+
+    def run_import(self, pin_ui: FakePinUi, passphrase: str = PASSPHRASE) -> list[ImportSummary]:
+        job = ImportCredentialsJob(
+            self.common_ui, PinCache(), pin_ui, self.data, self.path, passphrase
+        )
+        summaries: list[ImportSummary] = []
+        job.credentials_imported.connect(summaries.append)
+        job.run()
+        return summaries
+
+    def test_import(self) -> None:
+        [summary] = self.run_import(FakePinUi("123456"))
+
+        self.assertEqual(summary.imported, 2)
+        self.assertEqual(summary.skipped, [("mail", "already exists on device")])
+        self.assertEqual(self.device.credentials[b"mail"].password, b"other")
+        bank = self.device.credentials[b"bank"]
+        self.assertEqual((bank.password, bank.protected), (b"1234", True))
+        self.assertEqual(self.device.credentials[b"vpn"].password, b"\x00\xff")
+
+    def test_import_without_pin(self) -> None:
+        [summary] = self.run_import(FakePinUi(None))
+
+        self.assertEqual(summary.imported, 1)
+        self.assertIn(("bank", "PIN not available"), summary.skipped)
+        self.assertNotIn(b"bank", self.device.credentials)
+
+    def test_wrong_passphrase_does_not_touch_device(self) -> None:
+        summaries = self.run_import(FakePinUi(), "wrong passphrase")
+
+        self.assertEqual(summaries, [])
+        self.assertEqual(len(self.errors), 1)
+        self.assertIn("Wrong passphrase", self.errors[0])
+        self.assertEqual(self.data.opened, 0)
+
+    def test_truncated_file_is_not_imported_partially(self) -> None:
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+
+        summaries = self.run_import(FakePinUi("123456"))
+
+        self.assertEqual(summaries, [])
+        self.assertEqual(list(self.device.credentials), [b"mail"])
+        self.assertEqual(self.data.opened, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
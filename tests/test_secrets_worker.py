@@ -0,0 +1,252 @@
+import unittest
+from datetime import datetime
+
+from helpers import (
+    FakeDeviceData,
+    FakePinUi,
+    FakeSecretsDevice,
+    StoredCredential,
+    fake_secrets_app,
+    qt_app,
+)
+from nitrokey.nk3.secrets_app import Kind
+from nitrokey.trussed import Uuid
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.pin_cache import PinCache
+from nitrokeyapp.secrets_tab.data import CloneSummary, Credential, OtpData, OtpKind
+from nitrokeyapp.secrets_tab.worker import (
+    CloneCredentialsJob,
+    DeleteCredentialJob,
+    GenerateOtpJob,
+    GetCredentialJob,
+    ListCredentialsJob,
+)
+from nitrokeyapp.worker import Job
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class FakeSecretsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = FakeSecretsDevice(
+            [
+                StoredCredential(b"mail", login=b"me", password=b"secret"),
+                StoredCredential(b"bank", protected=True, password=b"1234"),
+                StoredCredential(b"vpn", touch_required=True, password=b"vpn"),
+                StoredCredential(b"totp", kind=Kind.Totp),
+            ],
+            pin="123456",
+        )
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1), self.device)
+        self.common_ui = CommonUi()
+        self.pin_cache = PinCache()
+        self.errors: list[str] = []
+        self.touches = 0
+        self.common_ui.info.error.connect(self.errors.append)
+        self.common_ui.touch.start.connect(self._touched)
+
+        patcher = fake_secrets_app()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+    def _touched(self) -> None:
+        self.touches += 1
+
+    def run_job(self, job: Job) -> None:
+        finished: list[bool] = []
+        job.finished.connect(lambda: finished.append(True))
+        job.run()
+        self.assertEqual(len(finished), 1)
+
+
+class SecretsJobTest(FakeSecretsTestCase):
+    def test_list_without_pin(self) -> None:
+        pin_ui = FakePinUi()
+        job = ListCredentialsJob(self.common_ui, self.pin_cache, pin_ui, self.data, False)
+        listed: list[list[Credential]] = []
+        job.credentials_listed.connect(listed.append)
+
+        self.run_job(job)
+
+        self.assertEqual([c.name for c in listed[0]], ["mail", "vpn", "totp"])
+        self.assertEqual(pin_ui.queries, 0)
+
+    def test_list_protected_in_one_session(self) -> None:
+        pin_ui = FakePinUi("123456")
+        job = ListCredentialsJob(self.common_ui, self.pin_cache, pin_ui, self.data, True)
+        listed: list[list[Credential]] = []
+        job.credentials_listed.connect(listed.append)
+
+        self.run_job(job)
+
+        self.assertEqual([c.name for c in listed[0]], ["mail", "bank", "vpn", "totp"])
+        self.assertEqual(self.pin_cache.get(self.data), "123456")
+        # queried before the PIN was entered, then verified and listed in one session
+        self.assertEqual(self.data.opened, 2)
+
+        # the next job uses the cached PIN
+        self.run_job(ListCredentialsJob(self.common_ui, self.pin_cache, pin_ui, self.data, True))
+        self.assertEqual(pin_ui.queries, 1)
+        self.assertEqual(self.data.opened, 3)
+
+    def test_list_protected_cancelled(self) -> None:
+        job = ListCredentialsJob(self.common_ui, self.pin_cache, FakePinUi(None), self.data, True)
+        listed: list[list[Credential]] = []
+        unchecked: list[bool] = []
+        job.credentials_listed.connect(listed.append)
+        job.uncheck_checkbox.connect(unchecked.append)
+
+        self.run_job(job)
+
+        self.assertEqual(unchecked, [True])
+        self.assertEqual([c.name for c in listed[0]], ["mail", "vpn", "totp"])
+        self.assertEqual(self.errors, [])
+
+    def test_list_protected_wrong_pin(self) -> None:
+        self.pin_cache.update(self.data, "000000")
+        job = ListCredentialsJob(self.common_ui, self.pin_cache, FakePinUi(), self.data, True)
+        listed: list[list[Credential]] = []
+        job.credentials_listed.connect(listed.append)
+
+        self.run_job(job)
+
+        self.assertEqual(self.errors, ["Incorrect PIN. Please try again."])
+        self.assertIsNone(self.pin_cache.get(self.data))
+        self.assertEqual([c.name for c in listed[0]], ["mail", "vpn", "totp"])
+
+    def test_delete_protected(self) -> None:
+        credential = Credential(b"bank", protected=True)
+        job = DeleteCredentialJob(
+            self.common_ui, self.pin_cache, FakePinUi("123456"), self.data, credential
+        )
+        deleted: list[Credential] = []
+        job.credential_deleted.connect(deleted.append)
+
+        self.run_job(job)
+
+        self.assertEqual(deleted, [credential])
+        self.assertNotIn(b"bank", self.device.credentials)
+
+    def test_delete_protected_cancelled(self) -> None:
+        credential = Credential(b"bank", protected=True)
+        job = DeleteCredentialJob(
+            self.common_ui, self.pin_cache, FakePinUi(None), self.data, credential
+        )
+        deleted: list[Credential] = []
+        job.credential_deleted.connect(deleted.append)
+
+        self.run_job(job)
+
+        self.assertEqual(deleted, [])
+        self.assertIn(b"bank", self.device.credentials)
+
+    def test_delete_missing_fails(self) -> None:
+        job = DeleteCredentialJob(
+            self.common_ui, self.pin_cache, FakePinUi(), self.data, Credential(b"gone")
+        )
+        failed: list[bool] = []
+        job.failed.connect(lambda: failed.append(True))
+
+        self.run_job(job)
+
+        self.assertEqual(failed, [True])
+        self.assertEqual(len(self.errors), 1)
+
+    def test_generate_totp(self) -> None:
+        at = datetime.fromtimestamp(1_000_000_015)
+        credential = Credential(b"totp", otp=OtpKind.TOTP)
+        job = GenerateOtpJob(
+            self.common_ui, self.pin_cache, FakePinUi(), self.data, credential, 30, at
+        )
+        generated: list[OtpData] = []
+        job.otp_generated.connect(generated.append)
+
+        self.run_job(job)
+
+        self.assertEqual(generated[0].otp, "123456")
+        self.assertEqual(
+            generated[0].validity,
+            (datetime.fromtimestamp(999_999_990), datetime.fromtimestamp(1_000_000_020)),
+        )
+        self.assertIn(f"calculate totp {1_000_000_015 // 30}", self.device.calls)
+
+    def test_get_credential_touch_only_if_required(self) -> None:
+        received: list[Credential] = []
+        for name in [b"mail", b"vpn"]:
+            credential = Credential(name, touch_required=name == b"vpn")
+            job = GetCredentialJob(
+                self.common_ui, self.pin_cache, FakePinUi(), self.data, credential
+            )
+            job.received_credential.connect(received.append)
+            self.run_job(job)
+
+        self.assertEqual([c.password for c in received], [b"secret", b"vpn"])
+        self.assertEqual(received[0].login, b"me")
+        self.assertEqual(self.touches, 1)
+
+    def test_get_protected_credential(self) -> None:
+        credential = Credential(b"bank", protected=True)
+        job = GetCredentialJob(
+            self.common_ui, self.pin_cache, FakePinUi("123456"), self.data, credential
+        )
+        received: list[Credential] = []
+        job.received_credential.connect(received.append)
+
+        self.run_job(job)
+
+        self.assertEqual(received[0].password, b"1234")
+
+
+class CloneCredentialsJobTest(FakeSecretsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.target_device = FakeSecretsDevice(
+            [StoredCredential(b"mail", password=b"other")], pin="654321"
+        )
+        self.target = FakeDeviceData("/dev/hidraw1", Uuid(2), self.target_device)
+
+    def clone(self, pin_ui: FakePinUi) -> CloneSummary:
+        job = CloneCredentialsJob(self.common_ui, self.pin_cache, pin_ui, self.data, self.target)
+        summaries: list[CloneSummary] = []
+        job.credentials_cloned.connect(summaries.append)
+        self.run_job(job)
+        return summaries[0]
+
+    def test_clone_without_pins(self) -> None:
+        summary = self.clone(FakePinUi(None, None))
+
+        self.assertEqual(summary.copied, 1)
+        self.assertEqual(
+            summary.skipped,
+            [("mail", "already exists on target"), ("totp", "secret is not exportable")],
+        )
+        copied = self.target_device.credentials[b"vpn"]
+        self.assertEqual((copied.password, copied.touch_required), (b"vpn", True))
+        # the existing credential is not overwritten
+        self.assertEqual(self.target_device.credentials[b"mail"].password, b"other")
+        # the touch button is only needed to read and write the touch protected credential
+        self.assertEqual(self.touches, 2)
+
+    def test_clone_protected(self) -> None:
+        self.pin_cache.update(self.data, "123456")
+        summary = self.clone(FakePinUi("654321"))
+
+        self.assertEqual(summary.copied, 2)
+        copied = self.target_device.credentials[b"bank"]
+        self.assertEqual((copied.password, copied.protected), (b"1234", True))
+        self.assertEqual(self.errors, [])
+
+    def test_clone_protected_without_target_pin(self) -> None:
+        self.pin_cache.update(self.data, "123456")
+        summary = self.clone(FakePinUi(None))
+
+        self.assertEqual(summary.copied, 1)
+        self.assertIn(("bank", "target PIN not available"), summary.skipped)
+        self.assertNotIn(b"bank", self.target_device.credentials)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import unittest
+from time import monotonic, sleep
+from unittest import mock
+
+from helpers import qt_app
+from PySide6.QtCore import QCoreApplication, QTimer
+
+from nitrokeyapp import watchdog
+from nitrokeyapp.watchdog import NKAPP_WATCHDOG, StallWatchdog, get_watchdog
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+def blocking_slot() -> None:
+    sleep(0.3)
+
+
+class StallWatchdogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.object(watchdog, "HEARTBEAT_INTERVAL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.watchdog = StallWatchdog(0.1)
+        self.addCleanup(self.watchdog.stop)
+
+    def test_no_stalls(self) -> None:
+        self.watchdog.start()
+        deadline = monotonic() + 0.2
+        while monotonic() < deadline:
+            QCoreApplication.processEvents()
+            sleep(0.005)
+
+        self.assertEqual(list(self.watchdog.stalls), [])
+        self.assertEqual(self.watchdog.report(), "No stalls of the event loop recorded")
+
+    def test_stall_is_captured(self) -> None:
+        self.watchdog.start()
+        QTimer.singleShot(0, blocking_slot)
+        deadline = monotonic() + 2
+        while not self.watchdog.stalls or self.watchdog.stalls[0].duration is None:
+            self.assertLess(monotonic(), deadline)
+            QCoreApplication.processEvents()
+            sleep(0.005)
+
+        [stall] = self.watchdog.stalls
+        self.assertTrue(stall.entry.startswith("blocking_slot ("))
+        self.assertGreaterEqual(stall.duration or 0, 0.1)
+        self.assertIn("sleep(0.3)", "\n".join(stall.stack))
+        self.assertIn("stall of", self.watchdog.report())
+
+
+class GetWatchdogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        get_watchdog.cache_clear()
+        self.addCleanup(get_watchdog.cache_clear)
+
+    def test_disabled_by_default(self) -> None:
+        with mock.patch.dict(os.environ, {NKAPP_WATCHDOG: ""}):
+            self.assertIsNone(get_watchdog())
+
+    def test_threshold(self) -> None:
+        for value, threshold in [("200", 0.2), ("yes", 0.5)]:
+            get_watchdog.cache_clear()
+            with mock.patch.dict(os.environ, {NKAPP_WATCHDOG: value}):
+                instance = get_watchdog()
+            assert instance is not None
+            self.assertEqual(instance.threshold, threshold)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+from typing import Any
+from unittest import mock
+
+from helpers import FakeDeviceData, qt_app
+from nitrokey.trussed import Uuid
+from PySide6.QtCore import QObject, Signal
+
+from nitrokeyapp.common_ui import CommonUi
+from nitrokeyapp.worker import CoroutineJob, JobCancelled, JobError, Steps, Worker
+
+
+class Answers(QObject):
+    answered = Signal(str)
+    declined = Signal()
+
+
+class ScriptedJob(CoroutineJob):
+    """Runs `script`, a generator function taking the job, as its steps."""
+
+    def __init__(self, script: Any) -> None:
+        super().__init__(CommonUi())
+        self.script = script
+        self.events: list[str] = []
+        self.finished_count = 0
+        self.failed_count = 0
+        self.errors: list[str] = []
+
+        self.finished.connect(self._count_finished)
+        self.failed.connect(self._count_failed)
+        self.common_ui.info.error.connect(self.errors.append)
+
+    def _count_finished(self) -> None:
+        self.finished_count += 1
+
+    def _count_failed(self) -> None:
+        self.failed_count += 1
+
+    def steps(self) -> Steps[None]:
+        yield from self.script(self)
+
+
+def setUpModule() -> None:
+    qt_app()
+
+
+class CoroutineJobTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = object()
+        self.data = FakeDeviceData("/dev/hidraw0", Uuid(1), self.device)
+        self.answers = Answers()
+
+    def test_steps_share_one_device_session(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            first = yield from job.open(self.data)
+            second = yield from job.open(self.data)
+            job.events.append(f"same={first is second is self.device}")
+            job.events.append(f"open={self.data.opened - self.data.closed}")
+
+        job = ScriptedJob(script)
+        job.run()
+
+        self.assertEqual(job.events, ["same=True", "open=1"])
+        self.assertEqual((self.data.opened, self.data.closed), (1, 1))
+        self.assertEqual((job.finished_count, job.failed_count), (1, 0))
+
+    def test_wait_closes_session_and_resumes_with_signal(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            yield from job.open(self.data)
+            result = yield from job.wait(self.answers.answered, self.answers.declined)
+            job.events.append(f"{result.index}:{result.args}")
+            yield from job.open(self.data)
+
+        job = ScriptedJob(script)
+        job.run()
+
+        self.assertTrue(job.waiting)
+        self.assertEqual((self.data.opened, self.data.closed), (1, 1))
+        self.assertEqual(job.finished_count, 0)
+
+        self.answers.answered.emit("1234")
+
+        self.assertFalse(job.waiting)
+        self.assertEqual(job.events, ["0:('1234',)"])
+        self.assertEqual((self.data.opened, self.data.closed), (2, 2))
+        self.assertEqual(job.finished_count, 1)
+
+        # the relays are detached, later emissions are ignored
+        self.answers.declined.emit()
+        self.assertEqual(job.finished_count, 1)
+
+    def test_wait_calls_request_once_listening(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            result = yield from job.wait(
+                self.answers.answered, request=lambda: self.answers.answered.emit("now")
+            )
+            job.events.append(result.args[0])
+
+        job = ScriptedJob(script)
+        job.run()
+
+        self.assertEqual(job.events, ["now"])
+        self.assertEqual(job.finished_count, 1)
+
+    def test_cancel_while_waiting(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            try:
+                yield from job.open(self.data)
+                yield from job.wait(self.answers.answered)
+                job.events.append("resumed")
+            finally:
+                job.events.append("cleanup")
+
+        job = ScriptedJob(script)
+        job.run()
+        job.cancel()
+
+        self.assertEqual(job.events, ["cleanup"])
+        self.assertEqual((job.finished_count, job.failed_count), (1, 0))
+        self.assertEqual(self.data.opened, self.data.closed)
+
+        # cancelling a finished job does nothing
+        job.cancel()
+        self.assertEqual(job.finished_count, 1)
+
+    def test_cancel_while_running_is_raised_at_next_step(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            job.cancel()
+            job.events.append("still running")
+            try:
+                yield from job.open(self.data)
+            except JobCancelled:
+                job.events.append("cancelled")
+                raise
+
+        job = ScriptedJob(script)
+        job.run()
+
+        self.assertEqual(job.events, ["still running", "cancelled"])
+        self.assertEqual((job.finished_count, job.failed_count), (1, 0))
+
+    def test_job_error_fails_with_message(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            yield from job.open(self.data)
+            raise JobError("no luck")
+
+        job = ScriptedJob(script)
+        job.run()
+
+        self.assertEqual((job.finished_count, job.failed_count), (1, 1))
+        self.assertEqual(job.errors, ["ScriptedJob: no luck"])
+        self.assertEqual(self.data.opened, self.data.closed)
+
+    def test_open_error_is_raised_into_steps(self) -> None:
+        def script(job: ScriptedJob) -> Steps[None]:
+            try:
+                yield from job.open(self.data)
+            except OSError as e:
+                job.events.append(str(e))
+
+        job = ScriptedJob(script)
+        with mock.patch.object(self.data, "open", side_effect=OSError("gone")):
+            job.run()
+
+        self.assertEqual(job.events, ["gone"])
+        self.assertEqual((job.finished_count, job.failed_count), (1, 0))
+
+    def test_abstract_job_cannot_be_created(self) -> None:
+        with self.assertRaises(TypeError):
+            CoroutineJob(CommonUi())  # type: ignore[abstract]
+
+
+class WorkerTest(unittest.TestCase):
+    def test_job_finishing_twice(self) -> None:
+        worker = Worker(CommonUi())
+        answers = Answers()
+
+        def script(job: ScriptedJob) -> Steps[None]:
+            yield from job.wait(answers.answered)
+
+        job = ScriptedJob(script)
+        worker.run(job)
+        self.assertEqual(worker._coroutine_jobs, {job})
+
+        answers.answered.emit("done")
+        job.finished.emit()
+
+        self.assertEqual(job.finished_count, 2)
+        self.assertEqual(worker._coroutine_jobs, set())
+        assert job.log_context is not None
+        self.assertTrue(job.log_context.done)
+
+    def test_cancel_cancels_running_jobs(self) -> None:
+        worker = Worker(CommonUi())
+        answers = Answers()
+
+        def script(job: ScriptedJob) -> Steps[None]:
+            yield from job.wait(answers.answered)
+
+        jobs = [ScriptedJob(script), ScriptedJob(script)]
+        for job in jobs:
+            worker.run(job)
+        worker.cancel()
+
+        self.assertEqual([job.finished_count for job in jobs], [1, 1])
+        self.assertEqual(worker._coroutine_jobs, set())
+
+
+if __name__ == "__main__":
+    unittest.main()